@@ -2,19 +2,116 @@
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import and_, cast, func, or_, REAL
+from typing import List, Literal, Optional
+import re
 
 from db import models
 from db.session import get_db
-from schemas.analytics import AnalyticsRead
+from core.pagination import encode_cursor, decode_cursor
+from core.streaming import ndjson_response, csv_response
+from core.facets import facet_cache, filter_key
+from core.etag import conditional_get
+from schemas.analytics import AnalyticsRead, AnalyticsSearchPage
 
 router = APIRouter()
 
+TS_CONFIG = "english"
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2"
+
+
+def _build_tsquery(q: str, mode: str):
+    """
+    words  → websearch syntax ("quoted phrases", -excluded, or)
+    phrase → all terms adjacent and in order
+    prefix → every term matched as a prefix (as-you-type)
+    """
+    if mode == "phrase":
+        return func.phraseto_tsquery(TS_CONFIG, q)
+    if mode == "prefix":
+        terms = re.findall(r"\w+", q)
+        if not terms:
+            raise HTTPException(status_code=400, detail="Query has no searchable terms")
+        return func.to_tsquery(TS_CONFIG, " & ".join(f"{t}:*" for t in terms))
+    return func.websearch_to_tsquery(TS_CONFIG, q)
+
+
+ANALYTICS_EXPORT_COLUMNS = [
+    "id", "barcode", "alternative_call_number", "title", "location_code",
+    "item_policy", "call_number", "description", "status", "has_item_link",
+]
+
+
+ANALYTICS_FACETS = {
+    "item_policy":   models.Analytics.item_policy,
+    "location_code": models.Analytics.location_code,
+    "status":        models.Analytics.status,
+    "has_item_link": models.Analytics.has_item_link,
+}
+
+
+def _analytics_search_criteria(
+    title: Optional[str],
+    barcode: Optional[str],
+    alternative_call_number: Optional[str],
+    call_number: Optional[str],
+    item_policy: Optional[str],
+    location_code: Optional[str],
+    status: Optional[str],
+    has_item_link: Optional[bool],
+) -> list:
+    A = models.Analytics
+    criteria = []
+    if title:
+        criteria.append(A.title.ilike(f"%{title}%"))
+    if barcode:
+        criteria.append(A.barcode.ilike(f"%{barcode}%"))
+    if alternative_call_number:
+        criteria.append(A.alternative_call_number.ilike(f"%{alternative_call_number}%"))
+    if call_number:
+        criteria.append(A.call_number.ilike(f"%{call_number}%"))
+    if item_policy:
+        criteria.append(A.item_policy == item_policy)
+    if location_code:
+        criteria.append(A.location_code == location_code)
+    if status:
+        criteria.append(A.status == status)
+    if has_item_link is not None:
+        criteria.append(A.has_item_link == has_item_link)
+    return criteria
+
+
+def _analytics_search_query(db: Session, *filters):
+    """
+    Analytics rows matching the filters, ordered by id. A missing alternative
+    call number is back-filled from the linked Item (barcode is unique on
+    items) via LEFT JOIN + COALESCE rather than a lookup per row.
+    """
+    A, I = models.Analytics, models.Item
+    query = (
+        db.query(
+            A.id,
+            A.barcode,
+            func.coalesce(A.alternative_call_number, I.alternative_call_number)
+                .label("alternative_call_number"),
+            A.title,
+            A.location_code,
+            A.item_policy,
+            A.call_number,
+            A.description,
+            A.status,
+            A.has_item_link,
+        )
+        .outerjoin(I, and_(A.has_item_link, I.barcode == A.barcode))
+        .filter(*_analytics_search_criteria(*filters))
+    )
+    return query.order_by(A.id)
+
 
 @router.get(
     "/search/analytics",
-    response_model=List[AnalyticsRead],
     summary="Search analytics by title, barcode, call numbers, policy, location or status",
+    dependencies=[conditional_get("analytics", "items")],
 )
 def search_analytics(
     title: Optional[str]                = Query(None, description="substring match on title"),
@@ -28,63 +125,160 @@ def search_analytics(
     location_code: Optional[str]        = Query(None, description="exact match on location_code"),
     status: Optional[str]               = Query(None, description="exact match on status"),
     has_item_link: Optional[bool]       = Query(None, description="filter by item link status"),
+    limit: int                          = Query(100, ge=1, le=1000, description="page size"),
+    cursor: Optional[str]               = Query(None, description="next_cursor from the previous page"),
+    format: Literal["json", "ndjson", "csv"]
+                                        = Query("json", description="ndjson/csv stream every match, ignoring limit/cursor"),
+    facets: bool                        = Query(False, description="also return per-value counts of policy, location, status and link state"),
     db: Session                         = Depends(get_db),
 ):
-    query = db.query(models.Analytics)
-    if title:
-        query = query.filter(models.Analytics.title.ilike(f"%{title}%"))
-    if barcode:
-        query = query.filter(models.Analytics.barcode.ilike(f"%{barcode}%"))
-    if alternative_call_number:
-        query = query.filter(
-            models.Analytics.alternative_call_number.ilike(f"%{alternative_call_number}%")
+    """
+    Returns {"items": [AnalyticsRead...], "next_cursor": ...} ordered by id.
+    Exports that really need every row should use format=ndjson or csv, which
+    stream from a server-side cursor instead of building one response.
+    facets=true adds "facets": counts per value of item_policy, location_code,
+    status and has_item_link over the whole match set, computed in one
+    GROUPING SETS aggregate and cached per filter set.
+    """
+    filters = (title, barcode, alternative_call_number, call_number,
+               item_policy, location_code, status, has_item_link)
+
+    if format == "ndjson":
+        return ndjson_response(
+            lambda stream_db: _analytics_search_query(stream_db, *filters),
+            lambda row: row._asdict(),
+            filename="analytics-search",
+        )
+    if format == "csv":
+        return csv_response(
+            lambda stream_db: _analytics_search_query(stream_db, *filters),
+            lambda row: row._asdict(),
+            columns=ANALYTICS_EXPORT_COLUMNS,
+            filename="analytics-search",
         )
-    if call_number:
-        query = query.filter(models.Analytics.call_number.ilike(f"%{call_number}%"))
-    if item_policy:
-        query = query.filter(models.Analytics.item_policy == item_policy)
-    if location_code:
-        query = query.filter(models.Analytics.location_code == location_code)
-    if status:
-        query = query.filter(models.Analytics.status == status)
-    if has_item_link is not None:
-        query = query.filter(models.Analytics.has_item_link == has_item_link)
 
-    results = query.all()
-    # back-fill missing alt call numbers from Items if needed
-    for rec in results:
-        if rec.alternative_call_number is None and rec.has_item_link:
-            item = (
-                db.query(models.Item)
-                  .filter(models.Item.barcode == rec.barcode)
-                  .first()
-            )
-            if item:
-                rec.alternative_call_number = item.alternative_call_number
+    query = _analytics_search_query(db, *filters)
+    after = decode_cursor(cursor, 1)
+    if after:
+        query = query.filter(models.Analytics.id > after[0])
 
-    return results
+    rows = query.limit(limit + 1).all()
+    items = [AnalyticsRead.model_validate(r) for r in rows[:limit]]
+    next_cursor = encode_cursor(items[-1].id) if len(rows) > limit else None
+
+    result = {"items": items, "next_cursor": next_cursor}
+    if facets:
+        key = filter_key(
+            substring={"title": title, "barcode": barcode,
+                       "alternative_call_number": alternative_call_number,
+                       "call_number": call_number},
+            exact={"item_policy": item_policy, "location_code": location_code,
+                   "status": status, "has_item_link": has_item_link},
+        )
+        result["facets"] = facet_cache.search_counts(
+            db, models.Analytics, key, _analytics_search_criteria(*filters), ANALYTICS_FACETS
+        )
+    return result
 
 
 @router.get(
     "/search/analytics/filters",
     summary="Get distinct item_policy, location_code, and status values from analytics",
+    dependencies=[conditional_get("analytics")],
 )
-def get_analytics_filters(db: Session = Depends(get_db)):
-    policies = db.query(models.Analytics.item_policy).distinct().all()
-    locations = db.query(models.Analytics.location_code).distinct().all()
-    statuses = db.query(models.Analytics.status).distinct().all()
-
-    return {
-        "item_policies":  sorted([p[0] for p in policies  if p[0]]),
-        "location_codes": sorted([l[0] for l in locations if l[0]]),
-        "status":         sorted([s[0] for s in statuses  if s[0]]),
+def get_analytics_filters(
+    counts: bool = Query(False, description="Also return the number of records per value"),
+    db: Session = Depends(get_db),
+):
+    facets = {
+        "item_policies":  models.Analytics.item_policy,
+        "location_codes": models.Analytics.location_code,
+        "status":         models.Analytics.status,
     }
+    result = {
+        name: sorted(v for v in facet_cache.values(db, col) if v)
+        for name, col in facets.items()
+    }
+    if counts:
+        result["counts"] = {name: facet_cache.counts(db, col) for name, col in facets.items()}
+    return result
+
+
+@router.get(
+    "/search/analytics/fulltext",
+    response_model=AnalyticsSearchPage,
+    summary="Ranked full-text search over analytics title and description",
+    dependencies=[conditional_get("analytics")],
+)
+def search_analytics_fulltext(
+    q: str                              = Query(..., min_length=1, description="search terms"),
+    mode: Literal["words", "phrase", "prefix"]
+                                        = Query("words", description="how q is interpreted"),
+    item_policy: Optional[str]          = Query(None, description="exact match on item_policy"),
+    location_code: Optional[str]        = Query(None, description="exact match on location_code"),
+    status: Optional[str]               = Query(None, description="exact match on status"),
+    limit: int                          = Query(50, ge=1, le=200),
+    cursor: Optional[str]               = Query(None, description="next_cursor from the previous page"),
+    db: Session                         = Depends(get_db),
+):
+    """
+    Matches against the GIN-indexed `search_vector` (title weighted above
+    description), orders by ts_rank and pages with a (rank, id) keyset so deep
+    pages cost the same as the first. Snippets are only built for the rows
+    actually returned.
+    """
+    A = models.Analytics
+    tsq = _build_tsquery(q, mode)
+    rank = func.ts_rank(A.search_vector, tsq)
+
+    page = db.query(A.id.label("id"), rank.label("rank")).filter(A.search_vector.op("@@")(tsq))
+    if item_policy:
+        page = page.filter(A.item_policy == item_policy)
+    if location_code:
+        page = page.filter(A.location_code == location_code)
+    if status:
+        page = page.filter(A.status == status)
+
+    after = decode_cursor(cursor, 2)
+    if after:
+        last_rank, last_id = cast(after[0], REAL), after[1]
+        page = page.filter(or_(rank < last_rank, and_(rank == last_rank, A.id > last_id)))
+
+    page = page.order_by(rank.desc(), A.id).limit(limit + 1).subquery()
+
+    rows = (
+        db.query(
+            A,
+            page.c.rank,
+            func.ts_headline(TS_CONFIG, func.coalesce(A.title, ""), tsq, HEADLINE_OPTIONS),
+            func.ts_headline(TS_CONFIG, func.coalesce(A.description, ""), tsq, HEADLINE_OPTIONS),
+        )
+        .join(page, page.c.id == A.id)
+        .order_by(page.c.rank.desc(), A.id)
+        .all()
+    )
+
+    items = [
+        {
+            **AnalyticsRead.model_validate(rec).model_dump(),
+            "rank": rnk,
+            "title_snippet": title_hl or None,
+            "description_snippet": desc_hl or None,
+        }
+        for rec, rnk, title_hl, desc_hl in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(items[-1]["rank"], items[-1]["id"])
+
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @router.get(
     "/analytics/{barcode}",
     response_model=AnalyticsRead,
     summary="Get a single analytics record by barcode",
+    dependencies=[conditional_get("analytics")],
 )
 def get_analytics_by_barcode(barcode: str, db: Session = Depends(get_db)):
     rec = db.query(models.Analytics).filter(models.Analytics.barcode == barcode).first()
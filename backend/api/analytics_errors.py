@@ -1,33 +1,154 @@
 # backend/api/analytics_errors.py
 
-from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import func, literal, or_, select, union
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
 from db.session import get_db
 from db import models
-from schemas.analytics import AnalyticsErrorRead
+from schemas.analytics import AnalyticsErrorPage, AnalyticsErrorRead
 from schemas.item import ItemRead
+from core.etag import conditional_get
+from core.error_detection import (
+    OTHER_REASON_KIND, REASON_KINDS, detect_all_missing_items, reason_kind, reason_kind_criterion,
+    reconcile_all,
+)
+from core.facets import facet_cache, filter_key
+from core.pagination import encode_cursor, decode_cursor, keyset_after
+from core.streaming import ndjson_response, csv_response
+from core.shelf_range import shelf_ranges
 
 router = APIRouter()
 
+ERROR_EXPORT_COLUMNS = [
+    "id", "barcode", "alternative_call_number", "title", "call_number", "status", "error_reason",
+]
+
+ERROR_FACETS = {
+    "reason_kind": reason_kind(models.AnalyticsError.error_reason),
+    "status":      models.AnalyticsError.status,
+}
+
+
+def _error_list_criteria(
+    error_reason: Optional[str],
+    kind: Optional[str],
+    status: Optional[str],
+    barcode: Optional[str],
+    location: Optional[str],
+    alternative_call_number: Optional[str],
+    call_number: Optional[str],
+) -> list:
+    E = models.AnalyticsError
+    criteria = []
+    if error_reason:
+        criteria.append(E.error_reason == error_reason)
+    if kind:
+        criteria.append(reason_kind_criterion(E.error_reason, kind))
+    if status:
+        criteria.append(E.status == status)
+    if barcode:
+        criteria.append(E.barcode.ilike(f"%{barcode}%"))
+    if location:
+        # Prefix such as S-3-01A-02: a range scan on the pattern index
+        criteria.append(E.alternative_call_number.startswith(location, autoescape=True))
+    if alternative_call_number:
+        criteria.append(E.alternative_call_number.ilike(f"%{alternative_call_number}%"))
+    if call_number:
+        criteria.append(E.call_number.ilike(f"%{call_number}%"))
+    return criteria
+
+
+def _error_list_query(db: Session, *filters):
+    """Errors matching the filters in shelf order (alternative call number, then id)."""
+    E = models.AnalyticsError
+    return (
+        db.query(E.id, E.barcode, E.alternative_call_number, E.title,
+                 E.call_number, E.status, E.error_reason)
+        .filter(*_error_list_criteria(*filters))
+        .order_by(E.alternative_call_number, E.id)
+    )
+
+
 @router.get(
-    "/",  
-    response_model=List[AnalyticsErrorRead],
-    summary="List all analytics error records"
+    "/",
+    response_model=AnalyticsErrorPage,
+    summary="List analytics error records, a page at a time",
+    dependencies=[conditional_get("analytics_errors")],
 )
-def list_analytics_errors(db: Session = Depends(get_db)):
+def list_analytics_errors(
+    error_reason: Optional[str]         = Query(None, description="exact match on error_reason"),
+    kind: Optional[str]                 = Query(None, description="kind of error reason, e.g. barcode_mismatch or other"),
+    status: Optional[str]               = Query(None, description="exact match on status"),
+    barcode: Optional[str]              = Query(None, description="substring match on barcode"),
+    location: Optional[str]             = Query(None, description="alt call# prefix, e.g. S-3-01A-02"),
+    alternative_call_number: Optional[str]
+                                        = Query(None, description="substring match on alt call#"),
+    call_number: Optional[str]          = Query(None, description="substring match on permanent call#"),
+    limit: int                          = Query(200, ge=1, le=1000, description="page size"),
+    cursor: Optional[str]               = Query(None, description="next_cursor from the previous page"),
+    format: Literal["json", "ndjson", "csv"]
+                                        = Query("json", description="ndjson/csv stream every match, ignoring limit/cursor"),
+    facets: bool                        = Query(False, description="also return counts per reason kind and status"),
+    db: Session                         = Depends(get_db),
+):
     """
-    Retrieve all rows from the analytics_errors table.
+    Returns {"items": [AnalyticsErrorRead...], "next_cursor": ...} ordered by
+    alternative call number, keyset-paginated on (alternative_call_number, id).
+    format=ndjson or csv streams every match from a server-side cursor.
+    facets=true adds "facets": counts per reason kind and status over the
+    whole match set (one GROUPING SETS aggregate, cached per filter set).
     """
-    return db.query(models.AnalyticsError).all()
+    if kind and kind not in REASON_KINDS and kind != OTHER_REASON_KIND:
+        raise HTTPException(status_code=400, detail=f"Unknown error kind: {kind}")
+    filters = (error_reason, kind, status, barcode, location, alternative_call_number, call_number)
+
+    if format == "ndjson":
+        return ndjson_response(
+            lambda stream_db: _error_list_query(stream_db, *filters),
+            lambda row: row._asdict(),
+            filename="analytics-errors",
+        )
+    if format == "csv":
+        return csv_response(
+            lambda stream_db: _error_list_query(stream_db, *filters),
+            lambda row: row._asdict(),
+            columns=ERROR_EXPORT_COLUMNS,
+            filename="analytics-errors",
+        )
+
+    E = models.AnalyticsError
+    query = _error_list_query(db, *filters)
+    after = decode_cursor(cursor, 2)
+    if after:
+        query = query.filter(keyset_after(E.alternative_call_number, E.id, after))
+
+    rows = query.limit(limit + 1).all()
+    items = [AnalyticsErrorRead.model_validate(r) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(items[-1].alternative_call_number, items[-1].id)
+
+    result = {"items": items, "next_cursor": next_cursor}
+    if facets:
+        key = filter_key(
+            substring={"barcode": barcode, "alternative_call_number": alternative_call_number,
+                       "call_number": call_number},
+            exact={"error_reason": error_reason, "kind": kind, "status": status, "location": location},
+        )
+        result["facets"] = facet_cache.search_counts(
+            db, E, key, _error_list_criteria(*filters), ERROR_FACETS
+        )
+    return result
 
 
 @router.get(
     "/location-items",
     response_model=List[ItemRead],
-    summary="Get items in a specific location"
+    summary="Get items in a specific location",
+    dependencies=[conditional_get("items")],
 )
 def get_items_by_location(
     location: Optional[str] = Query(None, description="Location code or alternative call number pattern"),
@@ -102,38 +223,30 @@ def clear_all_analytics_errors(db: Session = Depends(get_db)):
 
 @router.get(
     "/debug-range",
-    summary="Debug: Show the accessioned shelf range"
+    summary="Debug: Show the accessioned shelf range",
+    dependencies=[conditional_get("items")],
 )
 def debug_range(db: Session = Depends(get_db)):
     """
-    Debug endpoint to show what shelf range is being used for error detection.
+    Debug endpoint to show what shelf range is being used for error detection,
+    globally and per floor/range.
     """
-    import re
-    
-    items = db.query(models.Item).filter(
-        models.Item.alternative_call_number.isnot(None)
-    ).all()
-    
-    if not items:
+    accessioned = shelf_ranges.get(db)
+
+    if not accessioned.total_items:
         return {"message": "No items found"}
-    
-    call_pattern = re.compile(r'^S-([^-]+)-([^-]+)-(\d+)-(\d+)-(\d+)$')
-    shelves_with_items = set()
-    
-    for item in items:
-        match = call_pattern.match(item.alternative_call_number)
-        if match:
-            floor, range_code, ladder, shelf, position = match.groups()
-            shelf_key = f"{floor}-{range_code}-{ladder}-{shelf}"
-            shelves_with_items.add(shelf_key)
-    
-    sorted_shelves = sorted(shelves_with_items)
-    
+
+    sorted_shelves = accessioned.shelves
+
     return {
-        "total_items": len(items),
-        "total_shelves_with_items": len(shelves_with_items),
-        "min_shelf": sorted_shelves[0] if sorted_shelves else None,
-        "max_shelf": sorted_shelves[-1] if sorted_shelves else None,
+        "total_items": accessioned.total_items,
+        "total_shelves_with_items": len(sorted_shelves),
+        "min_shelf": accessioned.min_shelf,
+        "max_shelf": accessioned.max_shelf,
+        "ranges": {
+            r: {"min_shelf": lo, "max_shelf": hi}
+            for r, (lo, hi) in sorted(accessioned.ranges.items())
+        },
         "first_10_shelves": sorted_shelves[:10],
         "last_10_shelves": sorted_shelves[-10:]
     }
@@ -148,89 +261,147 @@ def detect_missing_items(db: Session = Depends(get_db)):
     Find analytics records that fall within the range of accessioned shelves but don't have
     matching physical items. Uses the same logic as the shelf viewer.
     
-    Creates AnalyticsError records for these mismatches.
+    Creates AnalyticsError records for these mismatches in a single
+    INSERT ... SELECT; records already flagged are left alone, and
+    missing-item errors that no longer apply are deleted.
     """
-    import re
-    from schemas.analytics import AnalyticsErrorCreate
-    from db import crud
-    
-    # Get all items with valid call numbers
-    items = db.query(models.Item).filter(
-        models.Item.alternative_call_number.isnot(None)
-    ).all()
-    
-    if not items:
+    accessioned = shelf_ranges.get(db)
+
+    if not accessioned.total_items:
         return {"message": "No items found", "errors_created": 0}
-    
-    # Parse items to get shelf ranges (floor-range-ladder-shelf)
-    shelf_pattern = re.compile(r'^S-([^-]+)-([^-]+)-(\d+)-(\d+)')
-    shelves_with_items = set()
-    item_barcodes = {item.barcode for item in items}
-    
-    for item in items:
-        shelf_match = shelf_pattern.match(item.alternative_call_number)
-        if shelf_match:
-            f, r, ladder, shelf = shelf_match.groups()
-            shelves_with_items.add(f"{f}-{r}-{ladder}-{shelf}")
-    
-    if not shelves_with_items:
+
+    counts = detect_all_missing_items(db)
+    if counts is None:
         return {"message": "No valid shelves found", "errors_created": 0}
-    
-    # Get min and max shelf keys
-    sorted_shelves = sorted(shelves_with_items)
-    min_shelf = sorted_shelves[0]
-    max_shelf = sorted_shelves[-1]
-    
-    # Get all analytics records
-    analytics_records = db.query(models.Analytics).filter(
-        models.Analytics.alternative_call_number.isnot(None)
-    ).all()
-    
-    errors_created = 0
-    skipped_outside_range = 0
-    skipped_has_item = 0
-    
-    for analytics in analytics_records:
-        shelf_match = shelf_pattern.match(analytics.alternative_call_number)
-        if not shelf_match:
-            continue
-        
-        f, r, ladder, shelf = shelf_match.groups()
-        shelf_key = f"{f}-{r}-{ladder}-{shelf}"
-        
-        # Check if this shelf is within the range of accessioned shelves
-        if shelf_key < min_shelf or shelf_key > max_shelf:
-            skipped_outside_range += 1
-            continue  # Outside accessioned range
-        
-        # Skip if barcode matches an item (this analytics has a physical item)
-        if analytics.barcode in item_barcodes:
-            skipped_has_item += 1
-            continue
-        
-        # This analytics is on a shelf within the accessioned range but has no matching item
-        # Create an error record
-        err_in = AnalyticsErrorCreate(
-            barcode=analytics.barcode,
-            alternative_call_number=analytics.alternative_call_number,
-            title=analytics.title,
-            call_number=analytics.call_number,
-            status=analytics.status,
-            error_reason=f"Within accessioned range ({min_shelf} to {max_shelf}) but no matching physical item"
-        )
-        try:
-            crud.create_analytics_error(db, err_in)
-            errors_created += 1
-        except Exception:
-            # Ignore duplicate constraint errors
-            pass
-    
+
     return {
-        "message": f"Scanned analytics records on shelves between {min_shelf} and {max_shelf}",
-        "errors_created": errors_created,
-        "skipped_outside_range": skipped_outside_range,
-        "skipped_has_item": skipped_has_item,
-        "min_shelf": min_shelf,
-        "max_shelf": max_shelf,
-        "total_shelves_with_items": len(shelves_with_items)
+        "message": f"Scanned analytics records on shelves between {counts['min_shelf']} and {counts['max_shelf']}",
+        **counts,
     }
+
+
+@router.post(
+    "/reconcile",
+    summary="Run every reconciliation rule over the whole building",
+)
+def reconcile_errors(db: Session = Depends(get_db)):
+    """
+    One pass over column snapshots of items, analytics and weeded items runs
+    every rule (barcode mismatch, missing item, duplicate position, barcode at
+    two locations, weeded but still in analytics); the errors they own are
+    then brought in line in bulk.
+    """
+    counts = reconcile_all(db)
+    return {"rules": list(REASON_KINDS), **counts}
+
+
+# ── Conflict report ──────────────────────────────────────────────────────────
+# Live GROUP BY ... HAVING count > 1 queries, keyset-paginated on the group
+# key. The keyset bound is applied before grouping, so a page starts at the
+# cursor rather than the top of the table, but HAVING only drops groups after
+# they are counted: when conflicts are sparse one page may still aggregate
+# everything from the cursor to the end. Both reports look at shelf
+# locations (S-...) only. The matching duplicate_position /
+# multiple_locations errors are kept current per upload by the
+# reconciliation rules.
+
+def _shelf_location(column):
+    return column.like("S-%")
+
+
+@router.get(
+    "/conflicts/positions",
+    summary="Positions that hold more than one item, building-wide",
+    dependencies=[conditional_get("items")],
+)
+def duplicate_positions(
+    location: Optional[str] = Query(None, description="alt call# prefix, e.g. S-3-01A"),
+    limit: int              = Query(200, ge=1, le=1000),
+    cursor: Optional[str]   = Query(None, description="next_cursor from the previous page"),
+    db: Session             = Depends(get_db),
+):
+    """
+    Returns {"items": [{"alternative_call_number", "item_count", "barcodes"}],
+    "next_cursor": ...} in call-number order.
+    """
+    I = models.Item
+    query = (
+        db.query(
+            I.alternative_call_number,
+            func.count().label("item_count"),
+            func.array_agg(aggregate_order_by(I.barcode, I.barcode)).label("barcodes"),
+        )
+        .filter(_shelf_location(I.alternative_call_number))
+        .group_by(I.alternative_call_number)
+        .having(func.count() > 1)
+        .order_by(I.alternative_call_number)
+    )
+    if location:
+        query = query.filter(I.alternative_call_number.startswith(location, autoescape=True))
+    after = decode_cursor(cursor, 1)
+    if after:
+        query = query.filter(I.alternative_call_number > after[0])
+
+    rows = query.limit(limit + 1).all()
+    items = [row._asdict() for row in rows[:limit]]
+    next_cursor = encode_cursor(items[-1]["alternative_call_number"]) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get(
+    "/conflicts/barcodes",
+    summary="Barcodes recorded at more than one location across items and analytics",
+    dependencies=[conditional_get("items", "analytics")],
+)
+def multi_location_barcodes(
+    barcode: Optional[str] = Query(None, description="barcode prefix"),
+    limit: int             = Query(200, ge=1, le=1000),
+    cursor: Optional[str]  = Query(None, description="next_cursor from the previous page"),
+    db: Session            = Depends(get_db),
+):
+    """
+    Returns {"items": [{"barcode", "location_count", "locations": [{"alternative_call_number",
+    "source"}]}], "next_cursor": ...} in barcode order. source is "item" or "analytics".
+    """
+    I, A = models.Item, models.Analytics
+    after = decode_cursor(cursor, 1)
+
+    def located(Model, source: str):
+        stmt = select(
+            Model.barcode.label("barcode"),
+            Model.alternative_call_number.label("acn"),
+            literal(source).label("source"),
+        ).where(_shelf_location(Model.alternative_call_number))
+        if barcode:
+            stmt = stmt.where(Model.barcode.startswith(barcode, autoescape=True))
+        if after:
+            stmt = stmt.where(Model.barcode > after[0])
+        return stmt
+
+    placed = union(located(I, "item"), located(A, "analytics")).subquery()
+    rows = db.execute(
+        select(
+            placed.c.barcode,
+            func.count(placed.c.acn.distinct()).label("location_count"),
+            func.array_agg(aggregate_order_by(placed.c.acn, placed.c.acn, placed.c.source)).label("acns"),
+            func.array_agg(aggregate_order_by(placed.c.source, placed.c.acn, placed.c.source)).label("sources"),
+        )
+        .group_by(placed.c.barcode)
+        .having(func.count(placed.c.acn.distinct()) > 1)
+        .order_by(placed.c.barcode)
+        .limit(limit + 1)
+    ).all()
+
+    items = [
+        {
+            "barcode": row.barcode,
+            "location_count": row.location_count,
+            "locations": [
+                {"alternative_call_number": acn, "source": source}
+                for acn, source in zip(row.acns, row.sources)
+            ],
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = encode_cursor(items[-1]["barcode"]) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
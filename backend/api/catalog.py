@@ -2,23 +2,107 @@
 
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, text
-from typing import List, Optional
+from sqlalchemy import or_, select, text, true
+from typing import List, Literal, Optional
 
 from db import models
 from db.session import get_db
+from core.pagination import encode_cursor, decode_cursor
+from core.streaming import ndjson_response
+from core.facets import facet_cache, filter_key
+from core.typeahead import typeahead_index
 from schemas.analytics import AnalyticsRead
 from schemas.item import ItemRead
 from schemas.emptyslots import EmptySlotDetail
+from core.etag import conditional_get
 
 router = APIRouter()
 
 
 # ──────────── Item Search Endpoint ────────────
 
+ITEM_FACETS = {
+    "floor": models.Item.floor,
+    "range_code": models.Item.range_code,
+    "ladder": models.Item.ladder,
+    "shelf": models.Item.shelf,
+}
+
+
+def _item_search_criteria(
+    barcode: Optional[str],
+    alternative_call_number: Optional[str],
+    floor: Optional[str],
+    range_code: Optional[str],
+    ladder: Optional[str],
+    shelf: Optional[str],
+) -> list:
+    criteria = []
+
+    or_conditions = []
+    if barcode:
+        or_conditions.append(models.Item.barcode.ilike(f"%{barcode}%"))
+    if alternative_call_number:
+        or_conditions.append(models.Item.alternative_call_number.ilike(f"%{alternative_call_number}%"))
+
+    if or_conditions:
+        criteria.append(or_(*or_conditions))
+
+    if floor:
+        criteria.append(models.Item.floor == floor)
+    if range_code:
+        criteria.append(models.Item.range_code == range_code)
+    if ladder:
+        criteria.append(models.Item.ladder == ladder)
+    if shelf:
+        criteria.append(models.Item.shelf == shelf)
+
+    return criteria
+
+
+def _item_search_query(db: Session, *filters):
+    """
+    Items matching the filters, each paired with the title/status of one
+    analytics row sharing its barcode and alternative_call_number. The
+    analytics side is a LATERAL ... LIMIT 1 probe on the barcode index, so the
+    whole result comes back from a single statement.
+    """
+    analytics_match = (
+        select(models.Analytics.id, models.Analytics.title, models.Analytics.status)
+        .where(
+            models.Analytics.barcode == models.Item.barcode,
+            models.Analytics.alternative_call_number == models.Item.alternative_call_number,
+        )
+        .limit(1)
+        .lateral("analytics_match")
+    )
+    return (
+        db.query(models.Item, analytics_match.c.id, analytics_match.c.title, analytics_match.c.status)
+        .outerjoin(analytics_match, true())
+        .filter(*_item_search_criteria(*filters))
+        .order_by(models.Item.id)
+    )
+
+
+def _item_search_row(row) -> dict:
+    item, analytics_id, title, status = row
+    return {
+        "id": item.id,
+        "barcode": item.barcode,
+        "alternative_call_number": item.alternative_call_number,
+        "floor": item.floor,
+        "range_code": item.range_code,
+        "ladder": item.ladder,
+        "shelf": item.shelf,
+        "position": item.position,
+        "analytics": {"title": title, "status": status} if analytics_id is not None else None,
+    }
+
+
 @router.get(
     "/search/items",
     summary="Search items by barcode, alternative_call_number, floor, range_code, ladder, or shelf (includes analytics title/status)",
+    dependencies=[conditional_get("items", "analytics")],
 )
 def search_items(
     barcode: Optional[str] = Query(None, description="Exact or partial match on Item.barcode"),
@@ -27,92 +111,98 @@ def search_items(
     range_code: Optional[str] = Query(None, description="Exact match on Item.range_code"),
     ladder: Optional[str] = Query(None, description="Exact match on Item.ladder"),
     shelf: Optional[str] = Query(None, description="Exact match on Item.shelf"),
+    limit: int = Query(100, ge=1, le=1000, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams every match, ignoring limit/cursor"),
+    facets: bool = Query(False, description="Also return per-value counts of floor, range_code, ladder and shelf for the whole match set"),
     db: Session = Depends(get_db),
 ):
     """
-    Returns a list of items matching any of the provided filters. Each item
-    includes an embedded 'analytics' object with 'title' and 'status' if
-    a matching analytics row exists (matching both barcode and alternative_call_number).
+    Returns a page of items matching any of the provided filters, ordered by
+    id, as {"items": [...], "next_cursor": ...}. Each item includes an
+    embedded 'analytics' object with 'title' and 'status' if a matching
+    analytics row exists (matching both barcode and alternative_call_number).
+
+    With format=ndjson the full result set is streamed one item per line.
+    With facets=true a "facets" object gives, for each location facet, the
+    number of matching items per value.
     """
-    query = db.query(models.Item)
+    filters = (barcode, alternative_call_number, floor, range_code, ladder, shelf)
 
-    or_conditions = []
-    if barcode:
-        or_conditions.append(models.Item.barcode.ilike(f"%{barcode}%"))
-    if alternative_call_number:
-        or_conditions.append(models.Item.alternative_call_number.ilike(f"%{alternative_call_number}%"))
+    if format == "ndjson":
+        return ndjson_response(
+            lambda stream_db: _item_search_query(stream_db, *filters),
+            _item_search_row,
+            filename="item-search",
+        )
 
-    if or_conditions:
-        query = query.filter(or_(*or_conditions))
+    query = _item_search_query(db, *filters)
+    after = decode_cursor(cursor, 1)
+    if after:
+        query = query.filter(models.Item.id > after[0])
 
-    if floor:
-        query = query.filter(models.Item.floor == floor)
-    if range_code:
-        query = query.filter(models.Item.range_code == range_code)
-    if ladder:
-        query = query.filter(models.Item.ladder == ladder)
-    if shelf:
-        query = query.filter(models.Item.shelf == shelf)
-
-    items = query.all()
-
-    # Build result list with embedded analytics data
-    results = []
-    for item in items:
-        analytics_match = (
-            db.query(models.Analytics)
-            .filter(
-                models.Analytics.barcode == item.barcode,
-                models.Analytics.alternative_call_number == item.alternative_call_number,
-            )
-            .first()
-        )
+    rows = query.limit(limit + 1).all()
+    items = [_item_search_row(r) for r in rows[:limit]]
+    next_cursor = encode_cursor(items[-1]["id"]) if len(rows) > limit else None
 
-        analytics_data = None
-        if analytics_match:
-            analytics_data = {
-                "title": analytics_match.title,
-                "status": analytics_match.status,
-            }
+    result = {"items": items, "next_cursor": next_cursor}
+    if facets:
+        key = filter_key(
+            substring={"barcode": barcode, "alternative_call_number": alternative_call_number},
+            exact={"floor": floor, "range_code": range_code, "ladder": ladder, "shelf": shelf},
+        )
+        result["facets"] = facet_cache.search_counts(
+            db, models.Item, key, _item_search_criteria(*filters), ITEM_FACETS
+        )
+    return result
 
-        results.append({
-            "id": item.id,
-            "barcode": item.barcode,
-            "alternative_call_number": item.alternative_call_number,
-            "floor": item.floor,
-            "range_code": item.range_code,
-            "ladder": item.ladder,
-            "shelf": item.shelf,
-            "position": item.position,
-            "analytics": analytics_data,
-        })
 
-    return results
+@router.get(
+    "/typeahead",
+    summary="Prefix completion for barcodes and alternative call numbers",
+)
+def typeahead(
+    q: str = Query(..., min_length=1, description="Prefix typed so far (case-insensitive)"),
+    field: Literal["barcode", "alternative_call_number", "all"] = Query("all"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Served from the in-memory prefix index (core/typeahead.py), so no query
+    reaches the database. Values are returned upper-cased.
+    """
+    fields = ("barcode", "alternative_call_number") if field == "all" else (field,)
+    return {f: typeahead_index.lookup(q, f, limit) for f in fields}
 
 
 @router.get(
     "/search/item-filters",
     summary="Get distinct floor, range_code, ladder, and shelf values from items",
+    dependencies=[conditional_get("items")],
 )
-def get_item_filters(db: Session = Depends(get_db)):
-    
-    floors = db.query(models.Item.floor).distinct().all()
-    ranges = db.query(models.Item.range_code).distinct().all()
-    ladders = db.query(models.Item.ladder).distinct().all()
-    shelves = db.query(models.Item.shelf).distinct().all()
-
-    return {
-        "floors": sorted([f[0] for f in floors if f[0]]),
-        "ranges": sorted([r[0] for r in ranges if r[0]]),
-        "ladders": sorted([l[0] for l in ladders if l[0]]),
-        "shelves": sorted([s[0] for s in shelves if s[0]]),
+def get_item_filters(
+    counts: bool = Query(False, description="Also return the number of items per value"),
+    db: Session = Depends(get_db),
+):
+    facets = {
+        "floors": models.Item.floor,
+        "ranges": models.Item.range_code,
+        "ladders": models.Item.ladder,
+        "shelves": models.Item.shelf,
+    }
+    result = {
+        name: sorted(v for v in facet_cache.values(db, col) if v)
+        for name, col in facets.items()
     }
+    if counts:
+        result["counts"] = {name: facet_cache.counts(db, col) for name, col in facets.items()}
+    return result
 
 
 @router.get(
     "/search/empty-slot-details",
     response_model=List[EmptySlotDetail],
     summary="Get a list of every empty slot per shelf",
+    dependencies=[conditional_get("items")],
 )
 def get_empty_slot_details(db: Session = Depends(get_db)):
     rows = db.execute(text("""
@@ -7,11 +7,16 @@ from sqlalchemy import func
 from db.session import get_db
 from db import models
 from api.catalog import get_empty_slot_details
+from core.etag import conditional_get
 
 router = APIRouter()
 
 
-@router.get("/stats", summary="Get dashboard statistics")
+@router.get(
+    "/stats",
+    summary="Get dashboard statistics",
+    dependencies=[conditional_get("items", "analytics", "analytics_errors", "weeded_items")],
+)
 def get_dashboard_stats(db: Session = Depends(get_db)):
     """
     Get overview statistics for the dashboard.
@@ -70,7 +75,7 @@ def get_dashboard_stats(db: Session = Depends(get_db)):
     }
 
 
-@router.get("/recent-activity", summary="Get recent system activity")
+@router.get("/recent-activity", summary="Get recent system activity", dependencies=[conditional_get("items", "analytics_errors")])
 def get_recent_activity(db: Session = Depends(get_db)):
     """
     Get recent activity summary.
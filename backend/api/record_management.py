@@ -1,10 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Any, Dict, Optional, List
+from sqlalchemy import Boolean, Integer, delete, func, or_, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, Literal, Optional, List
+import time
 
 import db.models as models
-from core.auth import get_current_user
-from db.session import get_db
+from core.auth import get_current_user, require_admin
+from core.etag import check_not_modified, conditional_get
+from core.facets import facet_cache
+from core.pagination import encode_cursor, decode_cursor, keyset_after
+from core.streaming import ndjson_response, csv_response
+from core.copy_export import copy_export_response
+from db.session import get_db, SessionLocal
+from schemas.record_management import BulkSelection, BulkUpdateRequest, BulkDeleteRequest
 
 router = APIRouter()
 
@@ -15,11 +26,167 @@ model_map = {
     'analytics_errors': models.AnalyticsError,
 }
 
-# Helper to serialize SQLAlchemy models
+# ETag/304 for the per-table read endpoints, keyed on that table's version
+def _table_not_modified(table: str, request: Request, response: Response) -> None:
+    check_not_modified(request, response, table)
+
+# Helper to serialize SQLAlchemy models (generated columns such as
+# analytics.search_vector are internal and never round-tripped to the UI)
 def serialize_model(obj: Any) -> Dict[str, Any]:
-    return {col.name: getattr(obj, col.name) for col in obj.__table__.columns}
+    return {
+        col.name: getattr(obj, col.name)
+        for col in obj.__table__.columns
+        if col.computed is None
+    }
+
+# Columns each table is matched on by the unified search
+unified_search_columns = {
+    'items':            [models.Item.barcode, models.Item.alternative_call_number],
+    'analytics':        [models.Analytics.barcode, models.Analytics.alternative_call_number],
+    'weeded_items':     [models.WeededItem.barcode, models.WeededItem.alternative_call_number,
+                         models.WeededItem.scanned_barcode],
+    'analytics_errors': [models.AnalyticsError.barcode, models.AnalyticsError.alternative_call_number],
+}
+
+# Two searches' worth of workers: each search submits one task per table, so
+# two can run side by side. A search that times out abandons its tasks, which
+# hold their workers until statement_timeout cancels them; later searches that
+# overlap those stragglers queue behind them rather than start more queries.
+# Tasks still queued when their search gives up are cancelled, and a task
+# that starts late only gets what is left of its search's deadline.
+_unified_pool = ThreadPoolExecutor(max_workers=2 * len(unified_search_columns),
+                                   thread_name_prefix="unified-search")
+
+
+def _search_one_table(table: str, q: str, per_table: int, deadline: float) -> Dict[str, Any]:
+    Model = model_map[table]
+    term = f"%{q}%"
+    # Time spent queued counts against the search's deadline
+    remaining_ms = int((deadline - time.monotonic()) * 1000)
+    if remaining_ms <= 0:
+        raise TimeoutError("search deadline passed before the query started")
+    with SessionLocal() as db:
+        # Let Postgres cancel the query too, so an abandoned search frees its connection
+        db.execute(text("SELECT set_config('statement_timeout', :ms, true)"), {"ms": str(remaining_ms)})
+        rows = (
+            db.query(Model)
+            .filter(or_(*(col.ilike(term) for col in unified_search_columns[table])))
+            .order_by(Model.id)
+            .limit(per_table + 1)
+            .all()
+        )
+    return {
+        "rows": [serialize_model(r) for r in rows[:per_table]],
+        "truncated": len(rows) > per_table,
+    }
+
+
+@router.get("/search", dependencies=[conditional_get(*model_map)])
+def unified_search(
+    q: str = Query(..., min_length=1, description="Barcode or call number fragment"),
+    per_table: int = Query(25, ge=1, le=200, description="Maximum rows returned per table"),
+    timeout_ms: int = Query(3000, ge=100, le=30000, description="Give up on a table after this long"),
+) -> Dict[str, Any]:
+    """
+    Look a barcode/call number up in items, analytics, weeded_items and
+    analytics_errors at once. Each table is queried concurrently on its own
+    connection, so latency is that of the slowest table rather than the sum.
+    Tables that miss the deadline are reported as 'timeout' and the rest are
+    returned; every result row carries its 'source' table.
+    """
+    deadline = time.monotonic() + timeout_ms / 1000
+    futures = {
+        _unified_pool.submit(_search_one_table, table, q, per_table, deadline): table
+        for table in unified_search_columns
+    }
+    done, not_done = wait(futures, timeout=timeout_ms / 1000)
+    for future in not_done:
+        # Drop tasks still queued behind stragglers; running ones end at statement_timeout
+        future.cancel()
+
+    results: List[Dict[str, Any]] = []
+    tables: Dict[str, Dict[str, Any]] = {}
+    for future, table in futures.items():
+        if future not in done:
+            tables[table] = {"status": "timeout"}
+            continue
+        try:
+            found = future.result()
+        except Exception as e:
+            tables[table] = {"status": "error", "detail": str(e)}
+            continue
+        tables[table] = {"status": "ok", "count": len(found["rows"]), "truncated": found["truncated"]}
+        results.extend({"source": table, **row} for row in found["rows"])
+
+    return {"results": results, "tables": tables}
+
+
+# Filters accepted by the per-table search: parameter name -> match kind.
+# "ilike" is a case-insensitive substring match, "eq" an exact match.
+search_filters = {
+    'items': {
+        'id': 'eq', 'barcode': 'ilike', 'alternative_call_number': 'ilike',
+        'location': 'ilike', 'floor': 'eq', 'range_code': 'eq', 'ladder': 'eq',
+        'shelf': 'eq', 'position': 'eq',
+    },
+    'analytics': {
+        'id': 'eq', 'barcode': 'ilike', 'alternative_call_number': 'ilike',
+        'title': 'ilike', 'call_number': 'ilike', 'item_policy': 'eq',
+        'location_code': 'eq', 'description': 'ilike', 'status': 'eq',
+    },
+    'weeded_items': {
+        'id': 'eq', 'barcode': 'ilike', 'alternative_call_number': 'ilike',
+        'scanned_barcode': 'ilike', 'is_weeded': 'eq',
+    },
+    'analytics_errors': {
+        'id': 'eq', 'barcode': 'ilike', 'alternative_call_number': 'ilike',
+        'title': 'ilike', 'call_number': 'ilike', 'status': 'eq', 'error_reason': 'eq',
+    },
+}
+
+
+def _record_columns(Model) -> Dict[str, Any]:
+    return {col.name: col for col in Model.__table__.columns if col.computed is None}
+
+
+def _projection(Model, fields: Optional[str], sort: str) -> List[Any]:
+    """
+    Columns to SELECT: every column by default, or the comma-separated
+    `fields` plus id and the sort column, which the cursor is built from.
+    """
+    columns = _record_columns(Model)
+    if not fields:
+        return list(columns.values())
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [n for n in names if n not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+    wanted = {"id", sort, *names}
+    return [col for name, col in columns.items() if name in wanted]
 
-@router.get("/{table}/search")
+
+def _filter_criteria(table: str, filters: Dict[str, Any]) -> List[Any]:
+    """WHERE criteria for the set (non-empty) filters that apply to this table."""
+    Model = model_map[table]
+    criteria = []
+    for name, kind in search_filters[table].items():
+        value = filters.get(name)
+        if value is None or value == "":
+            continue
+        col = getattr(Model, name)
+        criteria.append(col.ilike(f"%{value}%") if kind == "ilike" else col == value)
+    return criteria
+
+
+def _search_query(db: Session, table: str, filters: Dict[str, Any], columns: List[Any], sort_col, descending: bool):
+    Model = model_map[table]
+    query = db.query(*columns).filter(*_filter_criteria(table, filters))
+
+    order = [Model.id] if sort_col.name == "id" else [sort_col, Model.id]
+    return query.order_by(*(c.desc() for c in order) if descending else order)
+
+
+@router.get("/{table}/search", dependencies=[Depends(_table_not_modified)])
 def search_records(
     table: str,
     id: Optional[int] = Query(None),
@@ -40,102 +207,261 @@ def search_records(
     scanned_barcode: Optional[str] = Query(None),
     is_weeded: Optional[bool] = Query(None),
     error_reason: Optional[str] = Query(None),
-    skip: int = Query(0),
-    limit: int = Query(100),
+    sort: str = Query("id", description="Column to order by; ties are broken by id"),
+    order: Literal["asc", "desc"] = Query("asc"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (id and the sort column are always included)"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    format: Literal["json", "ndjson", "csv"] = Query("json", description="ndjson/csv stream every match, ignoring limit/cursor"),
     db: Session = Depends(get_db)
-) -> List[Dict[str, Any]]:
-
-    if table == "items":
-        query = db.query(models.Item)
-        if id is not None:
-            query = query.filter(models.Item.id == id)
-        if barcode:
-            query = query.filter(models.Item.barcode.ilike(f"%{barcode}%"))
-        if alternative_call_number:
-            query = query.filter(models.Item.alternative_call_number.ilike(f"%{alternative_call_number}%"))
-        if location:
-            query = query.filter(models.Item.location.ilike(f"%{location}%"))
-        if floor:
-            query = query.filter(models.Item.floor == floor)
-        if range_code:
-            query = query.filter(models.Item.range_code == range_code)
-        if ladder:
-            query = query.filter(models.Item.ladder == ladder)
-        if shelf:
-            query = query.filter(models.Item.shelf == shelf)
-        if position:
-            query = query.filter(models.Item.position == position)
-        results = query.offset(skip).limit(limit).all()
-
-    elif table == "analytics":
-        query = db.query(models.Analytics)
-        if id is not None:
-            query = query.filter(models.Analytics.id == id)
-        if barcode:
-            query = query.filter(models.Analytics.barcode.ilike(f"%{barcode}%"))
-        if alternative_call_number:
-            query = query.filter(models.Analytics.alternative_call_number.ilike(f"%{alternative_call_number}%"))
-        if title:
-            query = query.filter(models.Analytics.title.ilike(f"%{title}%"))
-        if call_number:
-            query = query.filter(models.Analytics.call_number.ilike(f"%{call_number}%"))
-        if item_policy:
-            query = query.filter(models.Analytics.item_policy == item_policy)
-        if location_code:
-            query = query.filter(models.Analytics.location_code == location_code)
-        if description:
-            query = query.filter(models.Analytics.description.ilike(f"%{description}%"))
-        if status:
-            query = query.filter(models.Analytics.status == status)
-        results = query.offset(skip).limit(limit).all()
-
-    elif table == "weeded_items":
-        query = db.query(models.WeededItem)
-        if id is not None:
-            query = query.filter(models.WeededItem.id == id)
-        if barcode:
-            query = query.filter(models.WeededItem.barcode.ilike(f"%{barcode}%"))
-        if alternative_call_number:
-            query = query.filter(models.WeededItem.alternative_call_number.ilike(f"%{alternative_call_number}%"))
-        if scanned_barcode:
-            query = query.filter(models.WeededItem.scanned_barcode.ilike(f"%{scanned_barcode}%"))
-        if is_weeded is not None:
-            query = query.filter(models.WeededItem.is_weeded == is_weeded)
-        results = query.offset(skip).limit(limit).all()
-
-    elif table == "analytics_errors":
-        query = db.query(models.AnalyticsError)
-        if id is not None:
-            query = query.filter(models.AnalyticsError.id == id)
-        if barcode:
-            query = query.filter(models.AnalyticsError.barcode.ilike(f"%{barcode}%"))
-        if alternative_call_number:
-            query = query.filter(models.AnalyticsError.alternative_call_number.ilike(f"%{alternative_call_number}%"))
-        if title:
-            query = query.filter(models.AnalyticsError.title.ilike(f"%{title}%"))
-        if call_number:
-            query = query.filter(models.AnalyticsError.call_number.ilike(f"%{call_number}%"))
-        if status:
-            query = query.filter(models.AnalyticsError.status == status)
-        if error_reason:
-            query = query.filter(models.AnalyticsError.error_reason == error_reason)
-        results = query.offset(skip).limit(limit).all()
-
-    else:
+) -> Any:
+    """
+    Returns {"items": [...], "next_cursor": ...}. Pages are keyset-paginated
+    on (sort, id), so a deep page costs the same as the first one; pass
+    next_cursor back with the same filters, sort and order to continue.
+    """
+    Model = model_map.get(table)
+    if not Model:
         raise HTTPException(status_code=404, detail="Table not found")
 
-    return [serialize_model(r) for r in results]
+    columns = _record_columns(Model)
+    if sort not in columns:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by: {sort}")
+    sort_col = columns[sort]
+    descending = order == "desc"
+    projection = _projection(Model, fields, sort)
+    filters = {
+        'id': id, 'barcode': barcode, 'alternative_call_number': alternative_call_number,
+        'location': location, 'floor': floor, 'range_code': range_code, 'ladder': ladder,
+        'shelf': shelf, 'position': position, 'title': title, 'call_number': call_number,
+        'item_policy': item_policy, 'location_code': location_code,
+        'description': description, 'status': status, 'scanned_barcode': scanned_barcode,
+        'is_weeded': is_weeded, 'error_reason': error_reason,
+    }
+
+    def build_query(session: Session):
+        return _search_query(session, table, filters, projection, sort_col, descending)
+
+    if format == "ndjson":
+        return ndjson_response(build_query, lambda row: row._asdict(), filename=f"{table}-search")
+    if format == "csv":
+        return csv_response(
+            build_query,
+            lambda row: row._asdict(),
+            columns=[col.name for col in projection],
+            filename=f"{table}-search",
+        )
 
-@router.get("/{table}/{record_id}")
+    query = build_query(db)
+    by_id = sort == "id"
+    after = decode_cursor(cursor, 1 if by_id else 2)
+    if after:
+        query = query.filter(keyset_after(sort_col, columns["id"], after, descending))
+
+    rows = query.limit(limit + 1).all()
+    items = [row._asdict() for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last["id"]) if by_id else encode_cursor(last[sort], last["id"])
+
+    return {"items": items, "next_cursor": next_cursor}
+
+def _coerce_filter(column, value: str) -> Any:
+    """Query-string filter value to the column's Python type."""
+    if isinstance(column.type, Boolean):
+        if value.lower() not in ("true", "false", "1", "0"):
+            raise HTTPException(status_code=400, detail=f"{column.name} must be true or false")
+        return value.lower() in ("true", "1")
+    if isinstance(column.type, Integer):
+        try:
+            return int(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"{column.name} must be an integer")
+    return value
+
+
+@router.get("/{table}/export", dependencies=[Depends(require_admin)])
+def export_table(
+    table: str,
+    request: Request,
+    format: Literal["csv", "csv.gz", "parquet"] = Query("csv"),
+) -> StreamingResponse:
+    """
+    Admin dump of a whole table, or the rows matching the same filters as
+    GET /{table}/search (passed as query parameters), streamed through
+    Postgres COPY ... TO STDOUT as CSV, gzip'd CSV or Parquet.
+    """
+    Model = model_map.get(table)
+    if not Model:
+        raise HTTPException(status_code=404, detail="Table not found")
+    columns = list(_record_columns(Model).values())
+    filters = {
+        name: _coerce_filter(Model.__table__.columns[name], value)
+        for name, value in request.query_params.items()
+        if name in search_filters[table]
+    }
+    statement = (
+        select(*columns)
+        .where(*_filter_criteria(table, filters))
+        .order_by(Model.id)
+    )
+    return copy_export_response(statement, columns, format, filename=table)
+
+
+@router.get("/{table}/{record_id}", dependencies=[Depends(_table_not_modified)])
 def read_record(
     table: str,
     record_id: int,
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
-    recs = search_records(table, id=record_id, skip=0, limit=1, db=db)
-    if not recs:
+    Model = model_map.get(table)
+    if not Model:
+        raise HTTPException(status_code=404, detail="Table not found")
+    rec = db.query(Model).get(record_id)
+    if not rec:
         raise HTTPException(status_code=404, detail="Record not found")
-    return recs[0]
+    return serialize_model(rec)
+
+BULK_CHUNK_SIZE = 1000
+BULK_PREVIEW_ROWS = 20
+
+
+def _bulk_criteria(table: str, body: BulkSelection) -> List[Any]:
+    """
+    WHERE criteria for a bulk selection; refuses an empty (whole-table) one.
+    Filters match exactly (col = value), never by substring, so a value like
+    "%" selects only rows that literally hold it.
+    """
+    filters = {k: v for k, v in (body.filters or {}).items() if v is not None and v != ""}
+    if not body.ids and not filters:
+        raise HTTPException(status_code=400, detail="Provide ids or at least one filter")
+    unknown = [k for k in filters if k not in search_filters[table]]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown filter(s) for {table}: {', '.join(unknown)}")
+    Model = model_map[table]
+    return [getattr(Model, name) == value for name, value in filters.items()]
+
+
+def _confirm_filter_only(db: Session, Model, criteria: List[Any], body: BulkSelection):
+    """
+    A write selected by filters alone must carry the `matched` count its
+    preview returned; refuse it if that is missing or the selection has
+    changed since.
+    """
+    if body.ids:
+        return
+    if body.expected_count is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Filter-only selections need expected_count (the matched count from a preview)",
+        )
+    matched = db.query(func.count(Model.id)).filter(*criteria).scalar()
+    if matched != body.expected_count:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Selection now matches {matched} rows, not {body.expected_count}; preview again",
+        )
+
+
+def _id_chunks(ids: Optional[List[int]]):
+    """The id list in BULK_CHUNK_SIZE slices, or one unrestricted pass without ids."""
+    if not ids:
+        yield None
+        return
+    unique = sorted(set(ids))
+    for i in range(0, len(unique), BULK_CHUNK_SIZE):
+        yield unique[i:i + BULK_CHUNK_SIZE]
+
+
+def _bulk_preview(db: Session, Model, criteria: List[Any], ids: Optional[List[int]]) -> Dict[str, Any]:
+    matched, sample = 0, []
+    for chunk in _id_chunks(ids):
+        where = criteria + ([Model.id.in_(chunk)] if chunk else [])
+        matched += db.query(func.count(Model.id)).filter(*where).scalar()
+        if len(sample) < BULK_PREVIEW_ROWS:
+            rows = db.query(Model).filter(*where).order_by(Model.id).limit(BULK_PREVIEW_ROWS - len(sample)).all()
+            sample.extend(serialize_model(r) for r in rows)
+    return {"preview": True, "matched": matched, "sample": sample}
+
+
+@router.post("/{table}/bulk-update")
+def bulk_update_records(
+    table: str,
+    body: BulkUpdateRequest,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Apply one patch to every selected row with UPDATE ... WHERE, in id chunks
+    inside a single transaction (all or nothing). preview=true returns the
+    match count and a sample of the current rows without writing; a
+    filter-only update then needs that count back as expected_count.
+    """
+    Model = model_map.get(table)
+    if not Model:
+        raise HTTPException(status_code=404, detail="Table not found")
+    columns = _record_columns(Model)
+    bad = [k for k in body.patch if k not in columns or k == "id"]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Cannot patch field(s): {', '.join(bad)}")
+    criteria = _bulk_criteria(table, body)
+
+    if body.preview:
+        return {**_bulk_preview(db, Model, criteria, body.ids), "patch": body.patch}
+    _confirm_filter_only(db, Model, criteria, body)
+
+    updated = 0
+    try:
+        for chunk in _id_chunks(body.ids):
+            where = criteria + ([Model.id.in_(chunk)] if chunk else [])
+            result = db.execute(
+                update(Model).where(*where).values(**body.patch)
+                .execution_options(synchronize_session=False)
+            )
+            updated += result.rowcount
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Bulk update failed: {getattr(e, 'orig', e)}")
+
+    return {"updated": updated}
+
+
+@router.post("/{table}/bulk-delete")
+def bulk_delete_records(
+    table: str,
+    body: BulkDeleteRequest,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Delete every selected row with DELETE ... WHERE, in id chunks inside a
+    single transaction. preview=true returns the match count and a sample;
+    a filter-only delete then needs that count back as expected_count.
+    """
+    Model = model_map.get(table)
+    if not Model:
+        raise HTTPException(status_code=404, detail="Table not found")
+    criteria = _bulk_criteria(table, body)
+
+    if body.preview:
+        return _bulk_preview(db, Model, criteria, body.ids)
+    _confirm_filter_only(db, Model, criteria, body)
+
+    deleted = 0
+    try:
+        for chunk in _id_chunks(body.ids):
+            where = criteria + ([Model.id.in_(chunk)] if chunk else [])
+            result = db.execute(
+                delete(Model).where(*where).execution_options(synchronize_session=False)
+            )
+            deleted += result.rowcount
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Bulk delete failed: {getattr(e, 'orig', e)}")
+
+    return {"deleted": deleted}
+
 
 @router.post("/{table}/create", status_code=201)
 def create_record(
@@ -187,21 +513,17 @@ def delete_record(
     db.commit()
     return serialize_model(rec)
 
-@router.get("/{table}/distinct/{field}")
+@router.get("/{table}/distinct/{field}", dependencies=[Depends(_table_not_modified)])
 def get_distinct_field(
     table: str,
     field: str,
+    counts: bool = Query(False, description="Return {value: count} instead of a list"),
     db: Session = Depends(get_db)
-) -> List[Any]:
-    model_map = {
-        'items': models.Item,
-        'analytics': models.Analytics,
-        'weeded_items': models.WeededItem,
-        'analytics_errors': models.AnalyticsError,
-    }
+) -> Any:
     model = model_map.get(table)
-    if not model or not hasattr(model, field):
+    if not model or field not in model.__table__.columns:
         raise HTTPException(status_code=404, detail=f"Unknown table or field: {table}.{field}")
     col = getattr(model, field)
-    vals = db.query(col).distinct().all()
-    return [v[0] for v in vals if v[0] is not None]
+    if counts:
+        return facet_cache.counts(db, col)
+    return facet_cache.values(db, col)
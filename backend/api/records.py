@@ -2,7 +2,10 @@
 # Comprehensive Record Management API
 # Handles viewing, editing, and deleting records across all tables
 
+import re
+from collections import defaultdict
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, or_, select, union
 from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any, List
 from datetime import datetime
@@ -10,16 +13,71 @@ from datetime import datetime
 from db.session import get_db
 from db import models
 from core.auth import require_viewer, require_book_worm, require_cataloger, require_admin
+from core.etag import conditional_get
+from core.error_detection import marks_misplaced
+from core.shelf_range import SHELF_KEY_PATTERN, shelf_ranges
 
 router = APIRouter()
 
+# Tables the detail and shelf views read; their ETags follow these versions
+SHELF_TABLES = ("items", "analytics", "weeded_items", "analytics_errors")
+
+# S-floor-range-ladder-shelf-position
+CALL_NUMBER_PATTERN = re.compile(r'S-([^-]+)-([^-]+)-(\d+)-(\d+)-(\d+)')
+
+
+class RequestLookups:
+    """
+    Per-request memo of by-barcode lookups. Titles for a whole list of
+    barcodes are resolved with one IN query, and a barcode resolved once is
+    not queried again for the rest of the request.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._titles: Dict[str, Optional[str]] = {}
+
+    def titles(self, barcodes) -> Dict[str, Optional[str]]:
+        barcodes = [b for b in barcodes if b]
+        missing = {b for b in barcodes if b not in self._titles}
+        if missing:
+            rows = (
+                self.db.query(models.Analytics.barcode, models.Analytics.title)
+                .filter(models.Analytics.barcode.in_(missing))
+                .order_by(models.Analytics.id)
+            )
+            for barcode, title in rows:
+                self._titles.setdefault(barcode, title)
+            for barcode in missing:
+                self._titles.setdefault(barcode, None)
+        return {b: self._titles[b] for b in barcodes}
+
+
+def get_lookups(db: Session = Depends(get_db)) -> RequestLookups:
+    # FastAPI resolves a dependency once per request, so every user of
+    # get_lookups in the same request shares this instance.
+    return RequestLookups(db)
+
+
+def _physical_items(items, titles: Dict[str, Optional[str]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            'id': item.id,
+            'title': titles.get(item.barcode),
+            'barcode': item.barcode,
+            'call_number': item.alternative_call_number,
+            'position': item.position
+        } for item in items
+    ]
+
 
 # ==================== ANALYTICS RECORDS ====================
 
-@router.get("/analytics/{record_id}")
+@router.get("/analytics/{record_id}", dependencies=[conditional_get(*SHELF_TABLES)])
 def get_analytics_record(
     record_id: int,
     db: Session = Depends(get_db),
+    lookups: RequestLookups = Depends(get_lookups),
     current_user: models.User = Depends(require_viewer)
 ):
     """
@@ -54,8 +112,7 @@ def get_analytics_record(
     shelf_context = None
     if analytics.alternative_call_number:
         # Parse shelf from call number (S-floor-range-ladder-shelf-position)
-        import re
-        match = re.match(r'S-([^-]+)-([^-]+)-(\d+)-(\d+)-(\d+)', analytics.alternative_call_number)
+        match = CALL_NUMBER_PATTERN.match(analytics.alternative_call_number)
         if match:
             floor, range_code, ladder, shelf, position = match.groups()
             shelf_base = f"S-{floor}-{range_code}-{ladder}-{shelf}"
@@ -66,30 +123,12 @@ def get_analytics_record(
                 models.Analytics.id != record_id
             ).limit(20).all()
             
-            # Also check Items table and get their titles from analytics
+            # Also check Items table; their titles come from analytics in one IN lookup
             shelf_physical_items = db.query(models.Item).filter(
                 models.Item.alternative_call_number.like(f"{shelf_base}-%")
             ).limit(20).all()
-            
-            # Build physical items list with titles from analytics
-            physical_items_list = []
-            for item in shelf_physical_items:
-                # Get title from related analytics
-                title = None
-                if item.barcode:
-                    related_analytics = db.query(models.Analytics).filter(
-                        models.Analytics.barcode == item.barcode
-                    ).first()
-                    if related_analytics:
-                        title = related_analytics.title
-                
-                physical_items_list.append({
-                    'id': item.id,
-                    'title': title,
-                    'barcode': item.barcode,
-                    'call_number': item.alternative_call_number,
-                    'position': item.position
-                })
+            titles = lookups.titles(item.barcode for item in shelf_physical_items)
+            physical_items_list = _physical_items(shelf_physical_items, titles)
             
             shelf_context = {
                 'shelf_call_number': shelf_base,
@@ -247,10 +286,11 @@ def delete_analytics_record(
 
 # ==================== ITEM RECORDS ====================
 
-@router.get("/item/{record_id}")
+@router.get("/item/{record_id}", dependencies=[conditional_get(*SHELF_TABLES)])
 def get_item_record(
     record_id: int,
     db: Session = Depends(get_db),
+    lookups: RequestLookups = Depends(get_lookups),
     current_user: models.User = Depends(require_viewer)
 ):
     """
@@ -275,8 +315,7 @@ def get_item_record(
     # Get shelf context
     shelf_context = None
     if item.alternative_call_number:
-        import re
-        match = re.match(r'S-([^-]+)-([^-]+)-(\d+)-(\d+)-(\d+)', item.alternative_call_number)
+        match = CALL_NUMBER_PATTERN.match(item.alternative_call_number)
         if match:
             floor, range_code, ladder, shelf, position = match.groups()
             shelf_base = f"S-{floor}-{range_code}-{ladder}-{shelf}"
@@ -287,24 +326,9 @@ def get_item_record(
                 models.Item.id != record_id
             ).limit(20).all()
             
-            # Build physical items with titles from analytics
-            physical_items_list = []
-            for neighbor in shelf_items:
-                title = None
-                if neighbor.barcode:
-                    neighbor_analytics = db.query(models.Analytics).filter(
-                        models.Analytics.barcode == neighbor.barcode
-                    ).first()
-                    if neighbor_analytics:
-                        title = neighbor_analytics.title
-                
-                physical_items_list.append({
-                    'id': neighbor.id,
-                    'title': title,
-                    'barcode': neighbor.barcode,
-                    'call_number': neighbor.alternative_call_number,
-                    'position': neighbor.position
-                })
+            # Build physical items with titles from analytics (one IN lookup)
+            titles = lookups.titles(neighbor.barcode for neighbor in shelf_items)
+            physical_items_list = _physical_items(shelf_items, titles)
             
             # Also check Analytics
             shelf_analytics = db.query(models.Analytics).filter(
@@ -467,113 +491,105 @@ def delete_item_record(
 
 # ==================== SHELF RECORDS ====================
 
-@router.get("/shelf/{call_number}")
-def get_shelf_records(
-    call_number: str,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_viewer)
-):
+# S-floor-range-ladder-shelf, the shelf part of a full call number
+SHELF_BASE_PATTERN = re.compile(r'(S-[^-]+-[^-]+-\d+-\d+)')
+# Ladder and range spans are prefix-matched, so their floor and range must be
+# plain alphanumerics (LIKE wildcards are escaped in any case)
+LADDER_PATTERN = re.compile(r'S-[A-Za-z0-9]+-[A-Za-z0-9]+-\d+')
+RANGE_PATTERN = re.compile(r'S-[A-Za-z0-9]+-[A-Za-z0-9]+')
+MAX_BATCH_SHELVES = 200
+
+
+def _shelf_sort_key(shelf_base: str):
+    _, floor, range_code, ladder, shelf = shelf_base.split('-')
+    return (floor, range_code, int(ladder), int(shelf))
+
+
+def _fetch_shelf_rows(db: Session, prefixes: List[str]):
     """
-    Get all records on a specific shelf.
-    Returns items, analytics, weeded items, and errors for the shelf.
-    
-    call_number format: S-3-01A-02-03 (full) or S-3-01A-02-03 (shelf base)
+    Items, analytics, weeded items and errors whose call number starts with
+    any of the prefixes: four queries however many shelves the prefixes span.
     """
-    import re
-    
-    # Parse the call number to get shelf base
-    # Full format: S-floor-range-ladder-shelf-position
-    # Shelf format: S-floor-range-ladder-shelf
-    match = re.match(r'(S-[^-]+-[^-]+-\d+-\d+)', call_number)
-    if not match:
-        raise HTTPException(status_code=400, detail="Invalid call number format")
-    
-    shelf_base = match.group(1)
-    
-    # Parse components
-    parts = shelf_base.split('-')
-    if len(parts) != 5:
-        raise HTTPException(status_code=400, detail="Invalid shelf call number")
-    
-    _, floor, range_code, ladder, shelf = parts
-    
-    # Get all items from Items table on this shelf
-    items = db.query(models.Item).filter(
-        models.Item.alternative_call_number.like(f"{shelf_base}-%")
-    ).all()
-    
+    def starts_with_any(column):
+        return or_(*(column.startswith(p, autoescape=True) for p in prefixes))
+
+    items = db.query(models.Item).filter(starts_with_any(models.Item.alternative_call_number)).all()
+    analytics = db.query(models.Analytics).filter(starts_with_any(models.Analytics.alternative_call_number)).all()
+    weeded = db.query(models.WeededItem).filter(starts_with_any(models.WeededItem.alternative_call_number)).all()
+    errors = db.query(models.AnalyticsError).filter(starts_with_any(models.AnalyticsError.alternative_call_number)).all()
+    return items, analytics, weeded, errors
+
+
+def _count_span_shelves(db: Session, prefix: str, cap: int) -> int:
+    """
+    Distinct shelves with any record under a span prefix, counting no
+    further than cap + 1. Reads only call numbers, so an oversized span is
+    refused before its rows are loaded.
+    """
+    shelf_key = lambda column: func.substring(column, f"{SHELF_KEY_PATTERN}-")
+    keys = union(*(
+        select(shelf_key(Model.alternative_call_number).label("shelf"))
+        .where(Model.alternative_call_number.startswith(prefix, autoescape=True))
+        for Model in (models.Item, models.Analytics, models.WeededItem, models.AnalyticsError)
+    )).subquery()
+    capped = select(keys.c.shelf).where(keys.c.shelf.isnot(None)).limit(cap + 1).subquery()
+    return db.execute(select(func.count()).select_from(capped)).scalar()
+
+
+def _group_by_shelf(rows) -> Dict[str, list]:
+    grouped = defaultdict(list)
+    for row in rows:
+        match = SHELF_BASE_PATTERN.match(row.alternative_call_number or '')
+        if match and row.alternative_call_number.startswith(f"{match.group(1)}-"):
+            grouped[match.group(1)].append(row)
+    return grouped
+
+
+def _item_barcodes_among(db: Session, barcodes) -> set:
+    """Which of these barcodes belong to a physical item (one IN lookup)."""
+    barcodes = {b for b in barcodes if b}
+    if not barcodes:
+        return set()
+    return {b for (b,) in db.query(models.Item.barcode).filter(models.Item.barcode.in_(barcodes))}
+
+
+def _build_shelf_view(shelf_base: str, items, analytics, weeded, errors, item_barcodes: set, accessioned) -> Dict[str, Any]:
+    """Assemble the shelf viewer payload for one shelf from already-fetched rows."""
+    _, floor, range_code, ladder, shelf = shelf_base.split('-')
+    errors = list(errors)
+
     # Detect duplicates - items with same call number
     call_number_counts = {}
     for item in items:
         call_num = item.alternative_call_number
         call_number_counts[call_num] = call_number_counts.get(call_num, 0) + 1
     duplicate_call_numbers = {cn for cn, count in call_number_counts.items() if count > 1}
-    
-    # Get all analytics on this shelf
-    analytics = db.query(models.Analytics).filter(
-        models.Analytics.alternative_call_number.like(f"{shelf_base}-%")
-    ).all()
-    
-    # Get weeded items from this shelf
-    weeded = db.query(models.WeededItem).filter(
-        models.WeededItem.alternative_call_number.like(f"{shelf_base}-%")
-    ).all()
-    
-    # Get errors for this shelf from database
-    errors = db.query(models.AnalyticsError).filter(
-        models.AnalyticsError.alternative_call_number.like(f"{shelf_base}-%")
-    ).all()
-    
+
     # Dynamically detect additional errors: analytics within accessioned range but no matching item
-    # Get min/max call numbers from all items in database
-    all_items = db.query(models.Item).filter(
-        models.Item.alternative_call_number.isnot(None)
-    ).all()
-    
-    if all_items:
-        # Parse to get shelf range
-        shelf_pattern = re.compile(r'^S-([^-]+)-([^-]+)-(\d+)-(\d+)')
-        shelves_with_items = set()
-        item_barcodes = {item.barcode for item in all_items}
-        
-        for item in all_items:
-            shelf_match = shelf_pattern.match(item.alternative_call_number)
-            if shelf_match:
-                f, r, ladder, shelf = shelf_match.groups()
-                shelves_with_items.add(f"{f}-{r}-{ladder}-{shelf}")
-        
-        # Check if current shelf is within accessioned range
-        current_shelf_match = shelf_pattern.match(shelf_base)
-        if current_shelf_match and shelves_with_items:
-            current_shelf_key = f"{current_shelf_match.group(1)}-{current_shelf_match.group(2)}-{current_shelf_match.group(3)}-{current_shelf_match.group(4)}"
-            sorted_shelves = sorted(shelves_with_items)
-            min_shelf = sorted_shelves[0]
-            max_shelf = sorted_shelves[-1]
-            
-            # If this shelf is within the range, check for missing items
-            if min_shelf <= current_shelf_key <= max_shelf:
-                # Add dynamic errors for analytics without matching items
-                error_barcodes_in_db = {(e.barcode, e.alternative_call_number) for e in errors}
-                
-                for a in analytics:
-                    # Skip if already in errors table
-                    if (a.barcode, a.alternative_call_number) in error_barcodes_in_db:
-                        continue
-                    
-                    # Skip if has matching item
-                    if a.barcode in item_barcodes:
-                        continue
-                    
-                    # This analytics is in accessioned range but has no item - add as dynamic error
-                    dynamic_error = type('obj', (object,), {
-                        'id': f"dynamic_{a.id}",
-                        'barcode': a.barcode,
-                        'alternative_call_number': a.alternative_call_number,
-                        'title': a.title,
-                        'error_reason': f"Within accessioned range ({min_shelf} to {max_shelf}) but no matching physical item"
-                    })()
-                    errors.append(dynamic_error)
-    
+    current_shelf_key = shelf_base[len("S-"):]
+    if accessioned.contains(current_shelf_key):
+        min_shelf, max_shelf = accessioned.min_shelf, accessioned.max_shelf
+        error_barcodes_in_db = {(e.barcode, e.alternative_call_number) for e in errors}
+
+        for a in analytics:
+            # Skip if already in errors table
+            if (a.barcode, a.alternative_call_number) in error_barcodes_in_db:
+                continue
+
+            # Skip if has matching item
+            if a.barcode in item_barcodes:
+                continue
+
+            # This analytics is in accessioned range but has no item - add as dynamic error
+            dynamic_error = type('obj', (object,), {
+                'id': f"dynamic_{a.id}",
+                'barcode': a.barcode,
+                'alternative_call_number': a.alternative_call_number,
+                'title': a.title,
+                'error_reason': f"Within accessioned range ({min_shelf} to {max_shelf}) but no matching physical item"
+            })()
+            errors.append(dynamic_error)
+
     # Build position map
     position_map = {}
     call_pattern = re.compile(r'S-[^-]+-[^-]+-\d+-\d+-(\d+)')
@@ -600,9 +616,11 @@ def get_shelf_records(
             })
     
     # Add analytics
-    error_set = {(e.barcode, e.alternative_call_number) for e in errors}
+    # Conflict errors (duplicate position, ...) leave the analytics row in
+    # place: it is still the right record for that position
+    error_set = {(e.barcode, e.alternative_call_number) for e in errors if marks_misplaced(e.error_reason)}
     for a in analytics:
-        # Skip if this analytics has an error
+        # Skip if this analytics row is flagged as misplaced
         if (a.barcode, a.alternative_call_number) in error_set:
             continue
         
@@ -619,13 +637,21 @@ def get_shelf_records(
                 'has_item_link': a.has_item_link
             })
     
+    range_bounds = accessioned.range_bounds(current_shelf_key)
+
     return {
         'shelf_info': {
             'call_number': shelf_base,
             'floor': floor,
             'range': range_code,
             'ladder': int(ladder),
-            'shelf': int(shelf)
+            'shelf': int(shelf),
+            'accessioned_range': {
+                'min_shelf': accessioned.min_shelf,
+                'max_shelf': accessioned.max_shelf,
+                'range_min_shelf': range_bounds[0] if range_bounds else None,
+                'range_max_shelf': range_bounds[1] if range_bounds else None,
+            }
         },
         'summary': {
             'total_items': len(items),
@@ -680,3 +706,126 @@ def get_shelf_records(
             } for e in errors
         ]
     }
+
+
+@router.get("/shelf/{call_number}", dependencies=[conditional_get(*SHELF_TABLES)])
+def get_shelf_records(
+    call_number: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_viewer)
+):
+    """
+    Get all records on a specific shelf.
+    Returns items, analytics, weeded items, and errors for the shelf.
+    
+    call_number format: S-3-01A-02-03 (full) or S-3-01A-02-03 (shelf base)
+    """
+    # Parse the call number to get shelf base
+    # Full format: S-floor-range-ladder-shelf-position
+    # Shelf format: S-floor-range-ladder-shelf
+    match = SHELF_BASE_PATTERN.match(call_number)
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid call number format")
+    
+    shelf_base = match.group(1)
+    
+    # Parse components
+    parts = shelf_base.split('-')
+    if len(parts) != 5:
+        raise HTTPException(status_code=400, detail="Invalid shelf call number")
+
+    items, analytics, weeded, errors = _fetch_shelf_rows(db, [f"{shelf_base}-"])
+
+    accessioned = shelf_ranges.get(db)
+    item_barcodes = (
+        _item_barcodes_among(db, (a.barcode for a in analytics))
+        if accessioned.contains(shelf_base[len("S-"):]) else set()
+    )
+
+    return _build_shelf_view(shelf_base, items, analytics, weeded, errors, item_barcodes, accessioned)
+
+
+@router.get("/shelves", dependencies=[conditional_get(*SHELF_TABLES)])
+def get_shelves_batch(
+    ladder: Optional[str] = Query(None, description="Every shelf on a ladder, e.g. S-3-01A-02"),
+    range_code: Optional[str] = Query(None, alias="range", description="Every shelf in a range, e.g. S-3-01A"),
+    shelves: Optional[List[str]] = Query(None, alias="shelf", description="Explicit shelves, repeatable"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_viewer)
+):
+    """
+    Shelf viewer payloads for many shelves at once: a whole ladder, a whole
+    range or an explicit list (pass exactly one). The span is read with a
+    fixed number of queries and split into shelves in memory, so the UI can
+    prefetch neighbouring shelves cheaply.
+
+    Returns {"shelves": [...]} in shelf order, each entry shaped like
+    /shelf/{call_number}. Ladder and range spans list shelves that have any
+    record; an explicit list returns every requested shelf.
+    """
+    if sum(x is not None for x in (ladder, range_code, shelves)) != 1:
+        raise HTTPException(status_code=400, detail="Pass exactly one of ladder, range or shelf")
+
+    if ladder is not None:
+        if not LADDER_PATTERN.fullmatch(ladder):
+            raise HTTPException(status_code=400, detail="Invalid ladder call number")
+        prefixes = [f"{ladder}-"]
+        span = True
+    elif range_code is not None:
+        if not RANGE_PATTERN.fullmatch(range_code):
+            raise HTTPException(status_code=400, detail="Invalid range call number")
+        prefixes = [f"{range_code}-"]
+        span = True
+    else:
+        bases = []
+        for cn in shelves:
+            match = SHELF_BASE_PATTERN.match(cn)
+            if not match:
+                raise HTTPException(status_code=400, detail=f"Invalid call number format: {cn}")
+            bases.append(match.group(1))
+        if len(set(bases)) > MAX_BATCH_SHELVES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SHELVES} shelves per request")
+        prefixes = [f"{b}-" for b in dict.fromkeys(bases)]
+        span = False
+
+    if span:
+        shelf_count = _count_span_shelves(db, prefixes[0], MAX_BATCH_SHELVES)
+        if shelf_count > MAX_BATCH_SHELVES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Span covers more than {MAX_BATCH_SHELVES} shelves; request a ladder or explicit shelves",
+            )
+
+    items, analytics, weeded, errors = _fetch_shelf_rows(db, prefixes)
+    items_by_shelf = _group_by_shelf(items)
+    analytics_by_shelf = _group_by_shelf(analytics)
+    weeded_by_shelf = _group_by_shelf(weeded)
+    errors_by_shelf = _group_by_shelf(errors)
+
+    if shelves is not None:
+        shelf_bases = [p[:-1] for p in prefixes]
+    else:
+        shelf_bases = {*items_by_shelf, *analytics_by_shelf, *weeded_by_shelf, *errors_by_shelf}
+
+    accessioned = shelf_ranges.get(db)
+    item_barcodes = _item_barcodes_among(db, (
+        a.barcode
+        for base, rows in analytics_by_shelf.items()
+        if accessioned.contains(base[len("S-"):])
+        for a in rows
+    ))
+
+    return {
+        'shelves': [
+            _build_shelf_view(
+                base,
+                items_by_shelf.get(base, []),
+                analytics_by_shelf.get(base, []),
+                weeded_by_shelf.get(base, []),
+                errors_by_shelf.get(base, []),
+                item_barcodes,
+                accessioned,
+            )
+            for base in sorted(shelf_bases, key=_shelf_sort_key)
+        ]
+    }
@@ -1,10 +1,9 @@
 # backend/api/sudoc.py
 
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from fastapi import APIRouter, HTTPException, Query, Body, Path, Depends
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import sqlite3
 import os
 import zipfile
 from io import BytesIO
@@ -12,7 +11,7 @@ from datetime import datetime
 from pymarc import Record, Field, Subfield, MARCWriter, MARCReader
 
 from core.sudoc import (
-    search_records, get_marc_by_id, get_record_fields,
+    search_records, browse_records, get_marc_by_id, get_record_fields,
     get_title_from_record, get_control_number, get_oclc_number,
     create_government_series_host_record, add_holdings_and_item_fields,
     _preferred_control_number, _strip_existing_link_fields,
@@ -23,6 +22,8 @@ from core.sudoc import (
 )
 from schemas.sudoc import (
     SudocSummary, 
+    SudocSearchPage,
+    SudocBrowsePage,
     MarcFieldOut,
     SudocCartRead,
     SudocCartCreate
@@ -35,12 +36,17 @@ from db.models import SudocCart, SudocCartItem
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func
 import re
+from core.etag import OVERLAY_TABLES, conditional_get
+from core.marc_cache import marc_cache
+from core.sudoc_index import sudoc_index
 
 router = APIRouter()
 
+# Record pages read the Postgres overlays and, for originals, the SQLite index
+SUDOC_RECORD_ETAG = conditional_get(*OVERLAY_TABLES, sources=(sudoc_index.identity,))
+
 # Base directory path
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-SQLITE_PATH = os.path.join(BASE_DIR, "cgp_sudoc_index.db")
 RECORDS_DIR = os.path.join(BASE_DIR, "Record_sets")
 
 class ExportRequest(BaseModel):
@@ -82,18 +88,36 @@ class BoundwithPreviewResponse(BaseModel):
     subjects: List[str] = []
     lines_774: List[Dict[str, str]] = []
 
-@router.get("/search", response_model=List[SudocSummary])
+@router.get("/search", response_model=SudocSearchPage)
 def search_sudoc(
-    query: str = Query(..., description="SuDoc call number (or fragment)"),
-    title: Optional[str] = Query(None, description="Substring of title"),
-    limit: int = Query(20),
-    page: int  = Query(1),
+    query: str = Query("", description="SuDoc call number (or fragment)"),
+    title: Optional[str] = Query(None, description="Title words"),
+    mode: Literal["prefix", "token", "phrase", "substring"] = Query(
+        "prefix",
+        description="prefix: SuDoc/title starting with these words; token: all words, any order; "
+                    "phrase: words adjacent and in order; substring: unindexed LIKE scan",
+    ),
+    limit: int = Query(20, ge=1, le=200),
+    page: int  = Query(1, ge=1),
 ):
+    """Returns {"total": n, "items": [...]}, ranked by relevance in the indexed modes."""
     offset = (page - 1) * limit
-    rows = search_records(query, title, limit=limit, offset=offset)
-    if not rows:
-        return []
-    return rows
+    return search_records(query, title, limit=limit, offset=offset, mode=mode)
+
+@router.get("/browse", response_model=SudocBrowsePage)
+def browse_sudoc(
+    sudoc: str = Query(..., min_length=1, description="SuDoc to browse around; need not exist in the index"),
+    before: int = Query(10, ge=0, le=100),
+    after: int = Query(10, ge=0, le=100),
+):
+    """Shelf list around a SuDoc: `before` records ahead of it, then `after` from it onwards."""
+    page = browse_records(sudoc, before=before, after=after)
+    if page is None:
+        raise HTTPException(
+            status_code=503,
+            detail="SuDoc index has no sort keys; run scripts/build_index.py --sort-keys",
+        )
+    return page
 
 # Cart routes
 @router.post("/cart", response_model=SudocCartRead)
@@ -144,11 +168,8 @@ def add_record_to_cart(
     if not record:
         # Not found via our resolver, check SQLite directly as fallback
         try:
-            with sqlite3.connect(SQLITE_PATH) as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT rowid FROM records WHERE rowid = ?", (record_id,))
-                if not cur.fetchone():
-                    raise HTTPException(status_code=404, detail="Record not found")
+            if not sudoc_index.execute("SELECT rowid FROM records WHERE rowid = ?", (record_id,)).fetchone():
+                raise HTTPException(status_code=404, detail="Record not found")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error checking record: {str(e)}")
             
@@ -278,19 +299,14 @@ async def get_cart_records(
         sqlite_records = {}
         
         if remaining_ids:
-            with sqlite3.connect(SQLITE_PATH) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                placeholders = ','.join('?' for _ in remaining_ids)
-                query = f"""
-                    SELECT rowid as id, sudoc, title, oclc 
-                    FROM records 
-                    WHERE rowid IN ({placeholders})
-                """
-                
-                cursor.execute(query, remaining_ids)
-                rows = cursor.fetchall()
+            placeholders = ','.join('?' for _ in remaining_ids)
+            query = f"""
+                SELECT rowid as id, sudoc, title, oclc 
+                FROM records 
+                WHERE rowid IN ({placeholders})
+            """
+            
+            rows = sudoc_index.execute(query, remaining_ids).fetchall()
             
             # Convert to dictionary for faster lookups
             sqlite_records = {row['id']: {
@@ -347,7 +363,13 @@ async def remove_from_cart(
         raise HTTPException(status_code=500, detail=str(e))
 
 # Record retrieval with direct byte offset access
-@router.get("/{record_id}", response_model=List[MarcFieldOut])
+@router.get("/cache/stats")
+def marc_cache_stats():
+    """Hit/miss counts and occupancy of the MARC record cache"""
+    return marc_cache.metrics()
+
+
+@router.get("/{record_id}", response_model=List[MarcFieldOut], dependencies=[SUDOC_RECORD_ETAG])
 def fetch_sudoc_record(record_id: int):
     print(f"Looking for record ID: {record_id}")
     fields = get_record_fields(record_id, preserve_order=False)  # Return sorted fields
@@ -706,6 +728,7 @@ def delete_boundwith_host(
     # Delete the host record
     db.delete(row)
     db.commit()
+    marc_cache.invalidate(host_id)
     
     return {"message": f"Host record {host_id} deleted successfully"}
 
@@ -752,7 +775,7 @@ def add_host_to_cart(
         raise HTTPException(status_code=500, detail=str(e))
 
 # Replace the existing lookup endpoint with this enhanced version
-@router.get("/lookup/{record_id}")
+@router.get("/lookup/{record_id}", dependencies=[SUDOC_RECORD_ETAG])
 async def lookup_record_info(
     record_id: int,
     include_children: bool = Query(False, description="Include child records for hosts"),
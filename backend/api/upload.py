@@ -10,8 +10,9 @@ import re
 
 from db import crud, models
 from schemas.item import ItemCreate, ItemRead
-from schemas.analytics import AnalyticsCreate, AnalyticsErrorCreate, AnalyticsRead
+from schemas.analytics import AnalyticsCreate, AnalyticsRead
 from db.session import get_db
+from core.error_detection import ErrorScope, refresh_errors_after_upload
 
 router = APIRouter()
 
@@ -54,6 +55,7 @@ async def upload_items_file(file: UploadFile = File(...), db: Session = Depends(
     inserted = 0
     updated = 0
     errors = []
+    scope = ErrorScope(db)
 
     for idx, row in df.iterrows():
         barcode = str(row["barcode"]).strip()
@@ -65,7 +67,10 @@ async def upload_items_file(file: UploadFile = File(...), db: Session = Depends(
 
         location, floor, range_code, ladder, shelf, position = parts
         existing_item = crud.get_item_by_barcode(db, barcode)
+        scope.touch(alternative_call_number, barcode)
         if existing_item:
+            # The shelf it is leaving needs re-checking too
+            scope.touch(existing_item.alternative_call_number)
             existing_item.alternative_call_number = alternative_call_number
             existing_item.location = location
             existing_item.floor = floor
@@ -97,12 +102,16 @@ async def upload_items_file(file: UploadFile = File(...), db: Session = Depends(
                 db.rollback()
                 errors.append({"row": idx + 2, "barcode": barcode, "error": str(e)})
 
+    # The rows are committed; a failed refresh is reported, not raised
+    error_refresh = refresh_errors_after_upload(db, scope)
+
     return {
         "filename": file.filename,
         "total_rows": int(df.shape[0]),
         "inserted": inserted,
         "updated": updated,
-        "errors": errors
+        "errors": errors,
+        "error_refresh": error_refresh,
     }
 
 
@@ -177,6 +186,7 @@ async def process_analytics_stream(contents: bytes, filename: str, db: Session):
     error_inserted = 0
     skipped_out_of_range = 0
     errors = []
+    scope = ErrorScope(db)
     
     # Send initial progress
     yield json.dumps({
@@ -211,7 +221,9 @@ async def process_analytics_stream(contents: bytes, filename: str, db: Session):
             models.Analytics.barcode == barcode
         ).first()
         
+        scope.touch(alternative_call_number)
         if existing_analytics:
+            scope.touch(existing_analytics.alternative_call_number)
             # Update existing analytics record
             existing_analytics.alternative_call_number = alternative_call_number
             existing_analytics.title = title
@@ -247,32 +259,6 @@ async def process_analytics_stream(contents: bytes, filename: str, db: Session):
                 db.rollback()
                 errors.append({"row": idx + 2, "barcode": barcode, "error": str(e)})
         
-        # Create analytics error when:
-        # An item exists at this alternative_call_number location, but has a different barcode
-        # This indicates a shelving error or mislabeled item
-        if alternative_call_number and alternative_call_number != "nan":
-            item_at_location = db.query(models.Item).filter(
-                models.Item.alternative_call_number == alternative_call_number
-            ).first()
-            
-            if item_at_location and item_at_location.barcode != barcode:
-                # Found an item at this location with a different barcode - this is an error!
-                err_in = AnalyticsErrorCreate(
-                    barcode=barcode,
-                    alternative_call_number=alternative_call_number,
-                    title=title,
-                    call_number=call_number,
-                    status=status,
-                    error_reason=f"Barcode mismatch: Item at location has barcode {item_at_location.barcode}"
-                )
-                try:
-                    crud.create_analytics_error(db, err_in)
-                    error_inserted += 1
-                except Exception as e:
-                    db.rollback()
-                    # Ignore duplicate constraint errors for analytics_errors
-                    pass
-
         batch_count += 1
         
         # Send progress updates every BATCH_SIZE rows
@@ -289,6 +275,19 @@ async def process_analytics_stream(contents: bytes, filename: str, db: Session):
             }) + "\n"
             batch_count = 0
 
+    # Error rules run once, set-based, over just the shelves this file touched
+    yield json.dumps({
+        "status": "processing",
+        "stage": "checking_errors",
+        "progress": 100,
+        "total": total_rows,
+        "processed": total_rows,
+        "inserted": inserted,
+        "shelves": len(scope.shelves),
+    }) + "\n"
+    refresh = refresh_errors_after_upload(db, scope)
+    error_inserted = refresh["errors_created"]
+
     # Send final result
     yield json.dumps({
         "status": "complete",
@@ -296,6 +295,8 @@ async def process_analytics_stream(contents: bytes, filename: str, db: Session):
         "total_rows": total_rows,
         "inserted": inserted,
         "errors_inserted": error_inserted,
+        "errors_removed": refresh["errors_deleted"],
+        "error_refresh_failed": refresh["failed"],
         "skipped_out_of_range": skipped_out_of_range,
         "errors": errors,
         "progress": 100
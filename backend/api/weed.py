@@ -7,6 +7,7 @@ import pandas as pd
 from db.session            import get_db
 from db                     import crud
 from core.auth              import require_cataloger
+from core.error_detection   import ErrorScope, refresh_errors_after_upload
 from schemas.weeded_item    import WeededItemCreate, WeededItem
 
 router = APIRouter()
@@ -59,5 +60,9 @@ def upload_weed_list(
     if not wis:
         return []
 
+    scope = ErrorScope(db)
     created = crud.bulk_create_weeded_items(db, wis)
+    for w in created:
+        scope.touch(w.alternative_call_number, w.barcode)
+    refresh_errors_after_upload(db, scope)
     return created
@@ -0,0 +1,205 @@
+# backend/core/copy_export.py
+#
+# Whole-table (or filtered) dumps through Postgres COPY ... TO STDOUT.
+# psycopg2's copy_expert pushes the server's CSV output into a file-like
+# object; here that object is a bounded queue drained by the response
+# generator, so data moves from the database socket to the client in chunks
+# and memory stays flat whatever the table size. The COPY runs on a worker
+# thread with its own raw connection.
+#
+# Parquet is produced by feeding the same CSV stream through pyarrow's
+# incremental CSV reader into a ParquetWriter, one record batch at a time.
+
+import gzip
+import io
+import os
+import queue
+import threading
+from typing import Iterator
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Boolean, DateTime, Integer
+from sqlalchemy.dialects import postgresql
+
+from db.session import engine
+
+EXPORT_FORMATS = {
+    # format: (media type, file extension)
+    "csv":     ("text/csv", "csv"),
+    "csv.gz":  ("application/gzip", "csv.gz"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+QUEUE_DEPTH = 64          # chunks buffered between the COPY and the client
+PARQUET_BLOCK_SIZE = 1 << 20
+
+_DONE = object()
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _put(chunks: queue.Queue, cancelled: threading.Event, item) -> None:
+    """Blocking put that gives up once the consumer has gone away."""
+    while True:
+        if cancelled.is_set():
+            raise _Cancelled()
+        try:
+            chunks.put(item, timeout=1)
+            return
+        except queue.Full:
+            continue
+
+
+class _QueueSink(io.RawIOBase):
+    """Write-only file whose chunks are handed to the response generator."""
+
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event):
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        _put(self._chunks, self._cancelled, data)
+        self._written += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._written
+
+
+def _copy_sql(cursor, statement) -> str:
+    compiled = statement.compile(dialect=postgresql.dialect())
+    query = cursor.mogrify(str(compiled), compiled.params).decode()
+    return f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+
+
+def _arrow_type(pa, column):
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    return pa.string()
+
+
+def _copy_to_parquet(cursor, sql: str, columns, sink):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    read_fd, write_fd = os.pipe()
+    copy_error = []
+
+    def produce():
+        try:
+            with os.fdopen(write_fd, "wb") as pipe:
+                cursor.copy_expert(sql, pipe)
+        except BaseException as e:
+            copy_error.append(e)
+
+    producer = threading.Thread(target=produce, name="copy-export-csv", daemon=True)
+    producer.start()
+    try:
+        with os.fdopen(read_fd, "rb") as pipe:
+            reader = pa_csv.open_csv(
+                pipe,
+                read_options=pa_csv.ReadOptions(block_size=PARQUET_BLOCK_SIZE),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={c.name: _arrow_type(pa, c) for c in columns},
+                    true_values=["t"],
+                    false_values=["f"],
+                    strings_can_be_null=True,
+                    quoted_strings_can_be_null=False,
+                ),
+            )
+            with pq.ParquetWriter(sink, reader.schema, compression="snappy") as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+    finally:
+        producer.join()
+    if copy_error:
+        raise copy_error[0]
+
+
+def _copy(raw, statement, columns, fmt: str, sink) -> None:
+    cursor = raw.cursor()
+    sql = _copy_sql(cursor, statement)
+    if fmt == "csv":
+        cursor.copy_expert(sql, sink)
+    elif fmt == "csv.gz":
+        with gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=6) as gz:
+            cursor.copy_expert(sql, gz)
+    else:
+        _copy_to_parquet(cursor, sql, columns, sink)
+
+
+def _run_copy(statement, columns, fmt: str, chunks: queue.Queue, cancelled: threading.Event):
+    raw, error = None, None
+    try:
+        raw = engine.raw_connection()
+        _copy(raw, statement, columns, fmt, _QueueSink(chunks, cancelled))
+        raw.rollback()
+    except BaseException as e:
+        error = e
+    finally:
+        if raw is not None:
+            # A COPY abandoned half way leaves the connection unusable
+            raw.invalidate() if error is not None else raw.close()
+    try:
+        if error is not None and not isinstance(error, _Cancelled):
+            _put(chunks, cancelled, error)
+        _put(chunks, cancelled, _DONE)
+    except _Cancelled:
+        pass
+
+
+def copy_export_response(statement, columns, fmt: str, filename: str) -> StreamingResponse:
+    """
+    Stream `statement` (a SQLAlchemy select over `columns`) as CSV, gzip'd
+    CSV or Parquet via COPY ... TO STDOUT.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown export format: {fmt}")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export needs pyarrow installed")
+
+    media_type, extension = EXPORT_FORMATS[fmt]
+
+    def generate() -> Iterator[bytes]:
+        chunks: queue.Queue = queue.Queue(maxsize=QUEUE_DEPTH)
+        cancelled = threading.Event()
+        worker = threading.Thread(
+            target=_run_copy,
+            args=(statement, columns, fmt, chunks, cancelled),
+            name="copy-export",
+            daemon=True,
+        )
+        worker.start()
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _DONE:
+                    return
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                yield chunk
+        finally:
+            # Client went away (or we're done): let the worker stop writing
+            cancelled.set()
+
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'},
+    )
@@ -0,0 +1,238 @@
+# backend/core/error_detection.py
+#
+# Applying the reconciliation rules (core/reconciliation.py) to
+# analytics_errors:
+#
+#   detect_all_missing_items  building-wide missing-item pass, one set-based
+#                             INSERT ... SELECT plus a cleanup DELETE
+#   refresh_errors            every rule, but only for the shelves an upload
+#                             touched (ErrorScope); adds errors that now
+#                             apply and deletes ones that no longer do
+#   reconcile_all             every rule over the whole building, one pass
+#
+# Only errors whose reason starts with a rule's prefix are managed here;
+# anything else in analytics_errors is left alone.
+
+import re
+from typing import Any, Dict, Optional, Set
+
+from sqlalchemy import and_, case, not_, text
+from sqlalchemy.orm import Session
+
+from core.reconciliation import RULES, reconcile
+from core.shelf_range import SHELF_KEY_PATTERN, shelf_ranges
+from db import models
+from db.versions import bump
+
+MISSING_ITEM_PREFIX = RULES["missing_item"].prefix
+
+# Short names for the managed reasons, used to group and filter error lists
+# (the full reason text embeds barcodes and shelf keys)
+REASON_KINDS = {kind: r.prefix for kind, r in RULES.items()}
+OTHER_REASON_KIND = "other"
+
+# Kinds saying the analytics row itself is misplaced. The conflict kinds
+# (duplicate_position, multiple_locations, weeded_in_analytics) flag a row
+# that is still the right record for its position.
+PLACEMENT_KINDS = ("barcode_mismatch", "missing_item")
+_CONFLICT_PREFIXES = tuple(p for k, p in REASON_KINDS.items() if k not in PLACEMENT_KINDS)
+
+_SHELF_BASE = re.compile(r'^(S-[^-]+-[^-]+-[0-9]+-[0-9]+)-')
+
+
+def missing_item_reason(min_shelf: str, max_shelf: str) -> str:
+    return f"{MISSING_ITEM_PREFIX}{min_shelf} to {max_shelf}) but no matching physical item"
+
+
+def shelf_base(alternative_call_number: Optional[str]) -> Optional[str]:
+    """'S-3-01A-02-03-07' -> 'S-3-01A-02-03'."""
+    match = _SHELF_BASE.match(alternative_call_number or "")
+    return match.group(1) if match else None
+
+
+def marks_misplaced(error_reason: Optional[str]) -> bool:
+    """
+    Whether an error means its analytics row is not where it says it is
+    (placement kinds, and unmanaged reasons as before the rule engine).
+    """
+    return not (error_reason or "").startswith(_CONFLICT_PREFIXES)
+
+
+def reason_kind(column):
+    """SQL expression naming the REASON_KINDS entry an error_reason falls under."""
+    return case(
+        *((column.startswith(prefix), kind) for kind, prefix in REASON_KINDS.items()),
+        else_=OTHER_REASON_KIND,
+    )
+
+
+def reason_kind_criterion(column, kind: str):
+    if kind in REASON_KINDS:
+        return column.startswith(REASON_KINDS[kind])
+    return and_(*(not_(column.startswith(prefix)) for prefix in REASON_KINDS.values()))
+
+
+# ── Building-wide missing-item pass ──────────────────────────────────────────
+
+# One statement: classify every analytics row with a shelf call number,
+# insert an error for those inside the accessioned range that have no item
+# (skipping ones already recorded), and count each outcome. Shelf keys are
+# compared with COLLATE "C" so the range matches the byte-wise ordering the
+# shelf viewer uses.
+DETECT_MISSING_ITEMS_SQL = text("""
+WITH candidates AS (
+    SELECT a.barcode, a.alternative_call_number, a.title, a.call_number, a.status,
+           substring(a.alternative_call_number FROM :pattern) COLLATE "C"
+               BETWEEN :min_shelf AND :max_shelf AS in_range,
+           EXISTS (SELECT 1 FROM items i WHERE i.barcode = a.barcode) AS has_item
+    FROM analytics a
+    WHERE substring(a.alternative_call_number FROM :pattern) IS NOT NULL
+),
+inserted AS (
+    INSERT INTO analytics_errors
+        (barcode, alternative_call_number, title, call_number, status, error_reason)
+    SELECT barcode, alternative_call_number, title, call_number, status, :reason
+    FROM candidates
+    WHERE in_range AND NOT has_item
+    ON CONFLICT ON CONSTRAINT uq_analytics_error_all_fields DO NOTHING
+    RETURNING 1
+)
+SELECT
+    (SELECT count(*) FROM inserted)                        AS errors_created,
+    count(*) FILTER (WHERE in_range AND NOT has_item)      AS missing_items,
+    count(*) FILTER (WHERE NOT in_range)                   AS skipped_outside_range,
+    count(*) FILTER (WHERE in_range AND has_item)          AS skipped_has_item
+FROM candidates
+""")
+
+# Missing-item errors that no longer hold: recorded against an older range,
+# the barcode has since been accessioned, or the shelf is now out of range.
+DELETE_STALE_MISSING_ITEMS_SQL = text("""
+DELETE FROM analytics_errors e
+WHERE e.error_reason LIKE :prefix
+  AND (
+      e.error_reason <> :reason
+      OR EXISTS (SELECT 1 FROM items i WHERE i.barcode = e.barcode)
+      OR NOT coalesce(
+          substring(e.alternative_call_number FROM :pattern) COLLATE "C"
+              BETWEEN :min_shelf AND :max_shelf,
+          false)
+  )
+""")
+
+
+def detect_all_missing_items(db: Session) -> Optional[Dict[str, int]]:
+    """
+    Re-evaluate the missing-item rule for the whole building. Returns the
+    outcome counts, or None when no shelf holds items yet.
+    """
+    accessioned = shelf_ranges.get(db)
+    if not accessioned.shelves:
+        return None
+
+    min_shelf, max_shelf = accessioned.min_shelf, accessioned.max_shelf
+    params = {
+        "pattern": SHELF_KEY_PATTERN,
+        "min_shelf": min_shelf,
+        "max_shelf": max_shelf,
+        "reason": missing_item_reason(min_shelf, max_shelf),
+    }
+    deleted = db.execute(
+        DELETE_STALE_MISSING_ITEMS_SQL, {**params, "prefix": f"{MISSING_ITEM_PREFIX}%"}
+    ).rowcount
+    counts = db.execute(DETECT_MISSING_ITEMS_SQL, params).one()
+    db.commit()
+    bump(models.AnalyticsError.__tablename__)
+
+    return {
+        "errors_created": counts.errors_created,
+        "errors_deleted": deleted,
+        "already_recorded": counts.missing_items - counts.errors_created,
+        "skipped_outside_range": counts.skipped_outside_range,
+        "skipped_has_item": counts.skipped_has_item,
+        "min_shelf": min_shelf,
+        "max_shelf": max_shelf,
+        "total_shelves_with_items": len(accessioned.shelves),
+    }
+
+
+# ── Scope-limited refresh ────────────────────────────────────────────────────
+
+class ErrorScope:
+    """
+    Shelves (and barcodes) an upload wrote to. Create it before the upload
+    starts so a change in the accessioned range can be noticed afterwards.
+    """
+
+    def __init__(self, db: Session):
+        accessioned = shelf_ranges.get(db)
+        self.bounds_before = (accessioned.min_shelf, accessioned.max_shelf)
+        self.shelves: Set[str] = set()
+        self.barcodes: Set[str] = set()
+
+    def touch(self, alternative_call_number: Optional[str] = None, barcode: Optional[str] = None):
+        base = shelf_base(alternative_call_number)
+        if base:
+            self.shelves.add(base)
+        if barcode:
+            self.barcodes.add(barcode)
+
+
+def refresh_errors(db: Session, scope: ErrorScope) -> Dict[str, int]:
+    """
+    Re-evaluate every rule for the shelves in scope (plus the shelves of
+    analytics rows whose barcode was touched) and bring analytics_errors in
+    line: add errors that now apply, delete managed errors that no longer do.
+
+    If the upload moved the accessioned range, missing-item errors change
+    outside the scope too, so that rule is re-run building-wide instead.
+    """
+    shelves = set(scope.shelves)
+    barcodes = list(scope.barcodes)
+    for i in range(0, len(barcodes), 5000):
+        shelves.update(
+            base for (acn,) in db.query(models.Analytics.alternative_call_number)
+            .filter(models.Analytics.barcode.in_(barcodes[i:i + 5000]))
+            if (base := shelf_base(acn))
+        )
+
+    accessioned = shelf_ranges.get(db)
+    range_changed = (accessioned.min_shelf, accessioned.max_shelf) != scope.bounds_before
+
+    summary = {"shelves": len(shelves), "errors_created": 0, "errors_deleted": 0, "range_changed": range_changed}
+    if shelves:
+        kinds = [k for k in RULES if not (range_changed and k == "missing_item")]
+        counts = reconcile(db, accessioned, shelves=shelves, kinds=kinds)
+        summary["errors_created"] += counts["errors_created"]
+        summary["errors_deleted"] += counts["errors_deleted"]
+        db.commit()
+
+    if range_changed:
+        full = detect_all_missing_items(db)
+        if full:
+            summary["errors_created"] += full["errors_created"]
+            summary["errors_deleted"] += full["errors_deleted"]
+
+    return summary
+
+
+def refresh_errors_after_upload(db: Session, scope: ErrorScope) -> Dict[str, Any]:
+    """
+    refresh_errors for callers whose own rows are already committed: a
+    failure is rolled back and reported in the summary ({"failed": True,
+    "detail": ...}) rather than raised, so the upload itself still succeeds.
+    The errors catch up on the next upload or POST .../reconcile.
+    """
+    try:
+        return {**refresh_errors(db, scope), "failed": False}
+    except Exception as e:
+        db.rollback()
+        print(f"Error refresh failed: {e}")
+        return {"failed": True, "detail": str(e), "errors_created": 0, "errors_deleted": 0}
+
+
+def reconcile_all(db: Session) -> Dict[str, int]:
+    """Run every rule over the whole building in one pass."""
+    counts = reconcile(db, shelf_ranges.get(db))
+    db.commit()
+    return counts
@@ -0,0 +1,63 @@
+# backend/core/etag.py
+#
+# Conditional GET for read endpoints. A response's ETag is derived from the
+# write versions (db/versions.py) of the tables it reads plus the request
+# URL, so it changes exactly when one of those tables has been written.
+# A request whose If-None-Match still matches is answered 304 from the
+# dependency, before the endpoint body (and its queries) runs.
+#
+# Data kept outside Postgres (the SQLite SuDoc index) has no write counter;
+# routes reading it pass `sources`, callables returning that data's current
+# identity, which is mixed into the tag the same way.
+
+import hashlib
+import uuid
+
+from fastapi import Depends, HTTPException, Request, Response
+
+from db.versions import get_versions
+
+# Counters restart at zero with the process; mixing in a per-process token
+# keeps an ETag handed out before a restart from matching after it.
+_PROCESS_TOKEN = uuid.uuid4().hex
+
+OVERLAY_TABLES = ("sudoc_edited_records", "sudoc_created_records")
+
+
+def compute_etag(request: Request, tables, sources=()) -> str:
+    raw = "|".join((
+        _PROCESS_TOKEN,
+        request.url.path,
+        repr(sorted(request.query_params.multi_items())),
+        repr(get_versions(*tables)),
+        repr([source() for source in sources]),
+    ))
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()[:20]}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same representation
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def check_not_modified(request: Request, response: Response, *tables: str, sources=()) -> None:
+    """Raise 304 if the client's copy is current, otherwise tag the response."""
+    etag = compute_etag(request, tables, sources)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        raise HTTPException(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+def conditional_get(*tables: str, sources=()):
+    """
+    Route dependency: conditional_get("items", "analytics"), optionally with
+    sources=(callable, ...) for data outside Postgres.
+    """
+    def dependency(request: Request, response: Response):
+        check_not_modified(request, response, *tables, sources=sources)
+    return Depends(dependency)
@@ -0,0 +1,167 @@
+# backend/core/facets.py
+#
+# Distinct-value ("facet") lists for the filter dropdowns, and per-facet counts
+# for a search's current filter set. Results are cached in-process and keyed
+# on the owning table's write version (db/versions.py), so they are
+# recomputed only after that table has actually changed.
+
+import threading
+from typing import Any, Dict, Hashable, List, Sequence
+
+from cachetools import LRUCache
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from db.versions import get_version
+
+
+def _is_indexed(column) -> bool:
+    """True when a btree index leads with this column, so a loose scan can use it."""
+    if column.primary_key or column.index or column.unique:
+        return True
+    return any(
+        list(ix.columns)[0] is column
+        for ix in column.table.indexes
+        if ix.columns and not ix.dialect_options["postgresql"].get("using")
+    )
+
+
+def _loose_index_scan(db: Session, column) -> List[Any]:
+    """
+    Emulated skip scan: hop from one distinct value to the next through the
+    index with a recursive CTE. Costs one index probe per distinct value
+    instead of a read of the whole table.
+    """
+    table = column.table
+    first = (
+        select(column.label("v"))
+        .where(column.isnot(None))
+        .order_by(column)
+        .limit(1)
+        .cte("facet_walk", recursive=True)
+    )
+    walk = first.alias("t")
+    step = select(
+        select(column).where(column > walk.c.v).order_by(column).limit(1).scalar_subquery()
+    ).where(walk.c.v.isnot(None))
+    facet_walk = first.union_all(step)
+    rows = db.execute(select(facet_walk.c.v).where(facet_walk.c.v.isnot(None))).all()
+    return [r[0] for r in rows]
+
+
+def _plain_distinct(db: Session, column) -> List[Any]:
+    rows = db.execute(select(column).where(column.isnot(None)).distinct()).all()
+    return [r[0] for r in rows]
+
+
+def _grouped_counts(db: Session, column) -> Dict[Any, int]:
+    rows = db.execute(
+        select(column, func.count()).where(column.isnot(None)).group_by(column)
+    ).all()
+    return {value: count for value, count in rows}
+
+
+def _grouping_set_counts(db: Session, table, criteria: Sequence, columns: Dict[str, Any]) -> Dict[str, Dict[Any, int]]:
+    """
+    Counts per value of every facet column under one WHERE clause, in a single
+    aggregate: GROUP BY GROUPING SETS ((c1), (c2), ...). GROUPING(c) is 0 on
+    the rows produced by c's own set, which tells the sets apart.
+    """
+    names = list(columns)
+    cols = [columns[n] for n in names]
+    stmt = (
+        select(*cols, *(func.grouping(c) for c in cols), func.count())
+        .select_from(table)
+        .where(*criteria)
+        .group_by(func.grouping_sets(*cols))
+    )
+    result: Dict[str, Dict[Any, int]] = {n: {} for n in names}
+    width = len(cols)
+    for row in db.execute(stmt).all():
+        values, flags, count = row[:width], row[width:2 * width], row[-1]
+        for name, value, flag in zip(names, values, flags):
+            if flag == 0 and value is not None:
+                result[name][value] = count
+    return result
+
+
+def filter_key(substring: Dict[str, Any], exact: Dict[str, Any]) -> tuple:
+    """
+    Normalised, hashable identity of a search's filter set: unset filters are
+    dropped and case-insensitive (ILIKE) substrings are case-folded.
+    """
+    key = [(name, "~", value.lower()) for name, value in substring.items() if value]
+    key += [(name, "=", value) for name, value in exact.items() if value is not None and value != ""]
+    return tuple(sorted(key))
+
+
+def _column(attr):
+    return attr.property.columns[0] if hasattr(attr, "property") else attr
+
+
+class FacetCache:
+    """Version-checked cache of distinct values and facet counts."""
+
+    def __init__(self, maxsize: int = 512):
+        self._lock = threading.Lock()
+        self._entries: LRUCache = LRUCache(maxsize=maxsize)
+
+    def _cached(self, table_name: str, key: Hashable, compute):
+        # Read the version before computing: a write that lands meanwhile
+        # bumps it again, so the stored entry is simply stale next time.
+        version = get_version(table_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                return entry[1]
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = (version, value)
+        return value
+
+    def _get(self, db: Session, attr, with_counts: bool):
+        column = _column(attr)
+        table_name = column.table.name
+
+        def compute():
+            if with_counts:
+                return _grouped_counts(db, column)
+            if _is_indexed(column):
+                return _loose_index_scan(db, column)
+            return _plain_distinct(db, column)
+
+        return self._cached(table_name, ("distinct", table_name, column.name, with_counts), compute)
+
+    def values(self, db: Session, attr) -> List[Any]:
+        """Distinct non-NULL values of a model column, e.g. models.Item.floor."""
+        return list(self._get(db, attr, with_counts=False))
+
+    def counts(self, db: Session, attr) -> Dict[Any, int]:
+        """Row count per distinct non-NULL value of a model column."""
+        return dict(self._get(db, attr, with_counts=True))
+
+    def search_counts(
+        self,
+        db: Session,
+        model,
+        filter_key: Hashable,
+        criteria: Sequence,
+        facets: Dict[str, Any],
+    ) -> Dict[str, Dict[Any, int]]:
+        """
+        Counts per value of each facet column for rows of `model` matching
+        `criteria`. `filter_key` must identify the filter set (normalised, so
+        equivalent searches share an entry).
+        """
+        table = model.__table__
+        columns = {name: _column(attr) for name, attr in facets.items()}
+        key = ("search", table.name, filter_key, tuple(columns))
+        result = self._cached(
+            table.name, key, lambda: _grouping_set_counts(db, table, criteria, columns)
+        )
+        return {name: dict(counts) for name, counts in result.items()}
+
+
+facet_cache = FacetCache()
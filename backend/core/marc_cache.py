@@ -0,0 +1,104 @@
+# backend/core/marc_cache.py
+#
+# Two-tier cache in front of core.sudoc.get_marc_by_id:
+#
+#   bytes tier    the resolved MARC bytes (edited overlay, created record or
+#                 original), LRU bounded by total size
+#   record tier   the parsed, Alma-fixed pymarc Record, LRU bounded by count;
+#                 every hit returns a copy, so callers may mutate freely
+#
+# Entries are keyed (record_id, include_edits, overlay version, source). The
+# overlay version is an in-process counter per record that
+# crud.save_edited_record and crud.create_new_marc_record bump through
+# invalidate(), so an edit is visible on the very next read while every other
+# record stays cached. Like db/versions.py this relies on the single uvicorn
+# worker seeing every write. `source` is the caller's identity for where
+# originals come from (core.sudoc passes the SQLite index and packed-store
+# identities), so a rebuilt index or repack stops old entries from matching.
+
+import copy
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Hashable, Optional
+
+from cachetools import LRUCache
+
+DEFAULT_MAX_BYTES = 64 << 20
+DEFAULT_MAX_RECORDS = 2048
+
+
+def copy_record(record):
+    """Copy of a pymarc Record whose fields can be edited without touching the original."""
+    dup = copy.copy(record)
+    dup.leader = copy.copy(record.leader)
+    dup.fields = []
+    for field in record.fields:
+        f = copy.copy(field)
+        if not field.is_control_field():
+            f.subfields = list(field.subfields)   # Subfield tuples are immutable
+        dup.fields.append(f)
+    return dup
+
+
+class MarcCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_records: int = DEFAULT_MAX_RECORDS):
+        self._lock = threading.Lock()
+        self._bytes: LRUCache = LRUCache(maxsize=max_bytes, getsizeof=len)
+        self._records: LRUCache = LRUCache(maxsize=max_records)
+        self._versions: Dict[int, int] = defaultdict(int)
+        self._stats: Dict[str, int] = defaultdict(int)
+
+    def key(self, record_id: int, include_edits: bool, source: Hashable = None) -> Hashable:
+        with self._lock:
+            return (record_id, include_edits, self._versions[record_id], source)
+
+    def get_record(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            record = self._records.get(key)
+            self._stats["record_hits" if record is not None else "record_misses"] += 1
+        return copy_record(record) if record is not None else None
+
+    def put_record(self, key: Hashable, record) -> None:
+        stored = copy_record(record)
+        with self._lock:
+            self._records[key] = stored
+
+    def get_bytes(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            data = self._bytes.get(key)
+            self._stats["bytes_hits" if data is not None else "bytes_misses"] += 1
+        return data
+
+    def put_bytes(self, key: Hashable, data: bytes) -> None:
+        with self._lock:
+            if len(data) <= self._bytes.maxsize:
+                self._bytes[key] = data
+
+    def invalidate(self, record_id: int) -> None:
+        """Drop every cached form of record_id; call after its overlay changes."""
+        with self._lock:
+            self._versions[record_id] += 1
+            for cache in (self._bytes, self._records):
+                for key in [k for k in cache if k[0] == record_id]:
+                    del cache[key]
+            self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._bytes.clear()
+            self._records.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            return {
+                **{k: stats.get(k, 0) for k in ("record_hits", "record_misses", "bytes_hits",
+                                                "bytes_misses", "invalidations")},
+                "records_cached": len(self._records),
+                "records_max": self._records.maxsize,
+                "bytes_cached": self._bytes.currsize,
+                "bytes_max": self._bytes.maxsize,
+            }
+
+
+marc_cache = MarcCache()
@@ -0,0 +1,90 @@
+# backend/core/marc_store.py
+#
+# Random access to the original MARC records by (zip_file, marc_file,
+# byte_offset, record_length) from the SQLite index.
+#
+# A ZIP member is one deflate stream, so seeking into it means inflating
+# everything before the offset, on every lookup. scripts/repack_marc.py
+# extracts each member once into Record_sets/packed/<zip stem>/<member>, an
+# uncompressed copy whose byte offsets are the same ones the index already
+# stores. Lookups then slice a memory-mapped file: no decompression, and the
+# OS page cache keeps hot records in memory. Members that have not been
+# repacked yet are still read from the ZIP.
+#
+# repack_marc.py replaces REPACK_STAMP after every run that changed a member,
+# so identity() tells callers caching record bytes when to drop them.
+
+import mmap
+import os
+import threading
+import zipfile
+from typing import Dict, Optional, Tuple
+
+BASE_DIR    = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RECORDS_DIR = os.path.join(BASE_DIR, "Record_sets")
+PACKED_DIR  = os.path.join(RECORDS_DIR, "packed")
+REPACK_STAMP = os.path.join(PACKED_DIR, ".repacked")
+
+
+def packed_path(zip_file: str, marc_file: str) -> str:
+    stem = zip_file[:-4] if zip_file.lower().endswith(".zip") else zip_file
+    return os.path.join(PACKED_DIR, stem, marc_file)
+
+
+class MarcStore:
+    """Memory-mapped packed members, with the ZIP as fallback."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # packed path -> ((st_ino, st_mtime_ns), mmap)
+        self._maps: Dict[str, Tuple[Tuple[int, int], mmap.mmap]] = {}
+
+    def _mapped(self, path: str) -> Optional[mmap.mmap]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        identity = (st.st_ino, st.st_mtime_ns)
+        with self._lock:
+            entry = self._maps.get(path)
+            if entry and entry[0] == identity:
+                return entry[1]
+            # Repacked since it was mapped (or never mapped). The old map is
+            # dropped, not closed: another thread may be slicing it outside
+            # the lock, and refcounting unmaps it once the last reader is done.
+            self._maps.pop(path, None)
+            if st.st_size == 0:
+                return None
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[path] = (identity, mapped)
+            return mapped
+
+    def identity(self) -> Optional[Tuple[int, int]]:
+        """(inode, mtime) of the repack stamp, None before the first repack."""
+        try:
+            st = os.stat(REPACK_STAMP)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns)
+
+    def read(self, zip_file: str, marc_file: str, byte_offset: int, record_length: int) -> Optional[bytes]:
+        """Raw bytes of one record, or None if its file is missing."""
+        mapped = self._mapped(packed_path(zip_file, marc_file))
+        if mapped is not None:
+            return mapped[byte_offset:byte_offset + record_length]
+        return self._read_zip(zip_file, marc_file, byte_offset, record_length)
+
+    @staticmethod
+    def _read_zip(zip_file: str, marc_file: str, byte_offset: int, record_length: int) -> Optional[bytes]:
+        zip_path = os.path.join(RECORDS_DIR, zip_file)
+        if not os.path.exists(zip_path):
+            print(f"ZIP file not found: {zip_path}")
+            return None
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            with zf.open(marc_file) as member:
+                member.seek(byte_offset)
+                return member.read(record_length)
+
+
+marc_store = MarcStore()
@@ -0,0 +1,48 @@
+# backend/core/pagination.py
+
+import base64
+import json
+from typing import Any, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, tuple_
+
+
+def encode_cursor(*values: Any) -> str:
+    """Pack the sort-key values of the last row on a page into an opaque token."""
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """Unpack a token from encode_cursor, or raise a 400 if it was tampered with."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_after(sort_col, id_col, after: List[Any], descending: bool = False):
+    """
+    Rows strictly after the cursor in ORDER BY sort_col, id (both ASC or both
+    DESC); `after` is [id] when sorting by id alone, else [sort value, id].
+    Postgres sorts NULLs last ascending and first descending, so a NULL sort
+    value only has its own id tie-break left to walk (ascending) or precedes
+    every non-NULL value (descending).
+    """
+    if len(after) == 1:
+        return id_col < after[0] if descending else id_col > after[0]
+    value, last_id = after
+    if value is None:
+        if descending:
+            return or_(sort_col.isnot(None), and_(sort_col.is_(None), id_col < last_id))
+        return and_(sort_col.is_(None), id_col > last_id)
+    if descending:
+        return tuple_(sort_col, id_col) < tuple_(value, last_id)
+    return or_(tuple_(sort_col, id_col) > tuple_(value, last_id), sort_col.is_(None))
@@ -0,0 +1,263 @@
+# backend/core/reconciliation.py
+#
+# Reconciliation rules as vectorised operations over columnar snapshots of
+# items, analytics and weeded items. A Snapshot reads each table once (only
+# the columns the rules use, optionally limited to a set of shelves); every
+# registered rule then runs over those frames and returns its error rows as a
+# DataFrame. A new rule is one @rule function: it shares the snapshot, so it
+# never adds a table scan.
+#
+# reconcile() diffs the rules' output against the errors they own in
+# analytics_errors (by reason prefix) and writes the difference in bulk:
+# one DELETE per chunk of stale ids, one multi-row INSERT per chunk of new
+# rows.
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from core.shelf_range import SHELF_KEY_PATTERN, AccessionedShelves
+from db import models
+
+ERROR_COLUMNS = ["barcode", "alternative_call_number", "title", "call_number", "status", "error_reason"]
+
+WRITE_CHUNK_SIZE = 1000
+SCOPE_CHUNK_SIZE = 500
+BARCODE_CHUNK_SIZE = 5000
+
+
+# ── Snapshot ─────────────────────────────────────────────────────────────────
+
+def _chunks(values: Iterable, size: int) -> Iterable[List]:
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _on_shelves(column, shelves: Sequence[str]):
+    # OR of prefix LIKEs: each one is a range scan on the text_pattern_ops index
+    return or_(*(column.like(f"{s}-%") for s in shelves))
+
+
+def _read(db: Session, stmt, columns: List[str]) -> pd.DataFrame:
+    rows = db.execute(stmt).all()
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+class Snapshot:
+    """
+    Column frames the rules run over:
+      items     id, barcode, alternative_call_number
+      analytics barcode, alternative_call_number, title, call_number, status
+      weeded    barcode, alternative_call_number, is_weeded
+
+    With `shelves`, each frame holds the rows on those shelves plus every row
+    (of any table) sharing a barcode with them, so rules that compare a
+    barcode across locations still see both sides.
+    """
+
+    ITEM_COLUMNS = ["id", "barcode", "alternative_call_number"]
+    ANALYTICS_COLUMNS = ["barcode", "alternative_call_number", "title", "call_number", "status"]
+    WEEDED_COLUMNS = ["barcode", "alternative_call_number", "is_weeded"]
+
+    def __init__(self, db: Session, accessioned: AccessionedShelves, shelves: Optional[Sequence[str]] = None):
+        self.accessioned = accessioned
+        self.shelves = sorted(shelves) if shelves is not None else None
+        self.items = self._load(db, models.Item, self.ITEM_COLUMNS)
+        self.analytics = self._load(db, models.Analytics, self.ANALYTICS_COLUMNS)
+        self.weeded = self._load(db, models.WeededItem, self.WEEDED_COLUMNS)
+
+        if self.shelves is not None:
+            barcodes = set(self.items.barcode) | set(self.analytics.barcode) | set(self.weeded.barcode)
+            self.items = self._with_barcodes(db, models.Item, self.ITEM_COLUMNS, self.items, barcodes)
+            self.analytics = self._with_barcodes(db, models.Analytics, self.ANALYTICS_COLUMNS, self.analytics, barcodes)
+            self.weeded = self._with_barcodes(db, models.WeededItem, self.WEEDED_COLUMNS, self.weeded, barcodes)
+
+    def _load(self, db: Session, Model, columns: List[str]) -> pd.DataFrame:
+        cols = [getattr(Model, c) for c in columns]
+        if self.shelves is None:
+            return _read(db, select(*cols), columns)
+        frames = [
+            _read(db, select(*cols).where(_on_shelves(Model.alternative_call_number, chunk)), columns)
+            for chunk in _chunks(self.shelves, SCOPE_CHUNK_SIZE)
+        ]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+    @staticmethod
+    def _with_barcodes(db: Session, Model, columns: List[str], frame: pd.DataFrame, barcodes) -> pd.DataFrame:
+        cols = [getattr(Model, c) for c in columns]
+        extra = [
+            _read(db, select(*cols).where(Model.barcode.in_(chunk)), columns)
+            for chunk in _chunks(barcodes, BARCODE_CHUNK_SIZE)
+        ]
+        return pd.concat([frame, *extra], ignore_index=True).drop_duplicates(ignore_index=True)
+
+
+def shelf_keys(acn: pd.Series) -> pd.Series:
+    """'S-3-01A-02-03-07' -> '3-01A-02-03' (NaN when it is not a shelf call number)."""
+    return acn.str.extract(SHELF_KEY_PATTERN, expand=False)
+
+
+def shelf_bases(acn: pd.Series) -> pd.Series:
+    """'S-3-01A-02-03-07' -> 'S-3-01A-02-03'."""
+    return "S-" + shelf_keys(acn)
+
+
+# ── Rules ────────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class Rule:
+    kind: str
+    prefix: str
+    evaluate: Callable[[Snapshot], pd.DataFrame]
+
+
+RULES: Dict[str, Rule] = {}
+
+
+def rule(kind: str, prefix: str):
+    """Register a rule; `prefix` starts every error_reason it produces."""
+    def register(fn: Callable[[Snapshot], pd.DataFrame]):
+        RULES[kind] = Rule(kind, prefix, fn)
+        return fn
+    return register
+
+
+def _errors(frame: pd.DataFrame, reason: pd.Series) -> pd.DataFrame:
+    out = frame.reindex(columns=ERROR_COLUMNS[:-1]).copy()
+    out["error_reason"] = reason.values
+    return out
+
+
+def _analytics_fields(snapshot: Snapshot) -> pd.DataFrame:
+    """title / call_number / status per barcode, for errors raised from items."""
+    return snapshot.analytics.drop_duplicates("barcode")[["barcode", "title", "call_number", "status"]]
+
+
+@rule("barcode_mismatch", "Barcode mismatch: ")
+def barcode_mismatch(snapshot: Snapshot) -> pd.DataFrame:
+    """The first item at an analytics row's call number carries a different barcode."""
+    first_item = (
+        snapshot.items.sort_values("id")
+        .drop_duplicates("alternative_call_number")[["alternative_call_number", "barcode"]]
+        .rename(columns={"barcode": "item_barcode"})
+    )
+    hits = snapshot.analytics.merge(first_item, on="alternative_call_number")
+    hits = hits[hits.item_barcode != hits.barcode]
+    return _errors(hits, "Barcode mismatch: Item at location has barcode " + hits.item_barcode)
+
+
+@rule("missing_item", "Within accessioned range (")
+def missing_item(snapshot: Snapshot) -> pd.DataFrame:
+    """Analytics shelf inside the accessioned range, but no item has the barcode."""
+    accessioned = snapshot.accessioned
+    if not accessioned.shelves:
+        return _errors(snapshot.analytics.iloc[:0], pd.Series([], dtype=object))
+    keys = shelf_keys(snapshot.analytics.alternative_call_number)
+    in_range = keys.notna() & (keys >= accessioned.min_shelf) & (keys <= accessioned.max_shelf)
+    hits = snapshot.analytics[in_range & ~snapshot.analytics.barcode.isin(snapshot.items.barcode)]
+    reason = (f"Within accessioned range ({accessioned.min_shelf} to {accessioned.max_shelf}) "
+              "but no matching physical item")
+    return _errors(hits, pd.Series(reason, index=hits.index, dtype=object))
+
+
+@rule("duplicate_position", "Duplicate position: ")
+def duplicate_position(snapshot: Snapshot) -> pd.DataFrame:
+    """More than one item shelved at the same call number; one error per item."""
+    items = snapshot.items
+    counts = items.groupby("alternative_call_number").barcode.transform("size")
+    hits = items[counts > 1].assign(n=counts[counts > 1])
+    hits = hits.merge(_analytics_fields(snapshot), on="barcode", how="left")
+    return _errors(hits, "Duplicate position: " + hits.n.astype(str) + " items share this location")
+
+
+@rule("multiple_locations", "Barcode at two locations: ")
+def multiple_locations(snapshot: Snapshot) -> pd.DataFrame:
+    """An analytics row places a barcode somewhere other than its item does."""
+    items = snapshot.items[["barcode", "alternative_call_number"]].rename(
+        columns={"alternative_call_number": "item_location"}
+    )
+    hits = snapshot.analytics.merge(items, on="barcode")
+    hits = hits[
+        shelf_keys(hits.alternative_call_number).notna()
+        & (hits.alternative_call_number != hits.item_location)
+    ]
+    return _errors(hits, "Barcode at two locations: item is shelved at " + hits.item_location)
+
+
+@rule("weeded_in_analytics", "Weeded but still in analytics: ")
+def weeded_in_analytics(snapshot: Snapshot) -> pd.DataFrame:
+    """A weeded barcode still has an analytics record."""
+    weeded = (
+        snapshot.weeded[snapshot.weeded.is_weeded.astype(bool)]
+        .drop_duplicates("barcode")[["barcode", "alternative_call_number"]]
+        .rename(columns={"alternative_call_number": "weeded_from"})
+    )
+    hits = snapshot.analytics.merge(weeded, on="barcode")
+    return _errors(hits, "Weeded but still in analytics: weeded from " + hits.weeded_from)
+
+
+# ── Diff and bulk write ──────────────────────────────────────────────────────
+
+def _error_keys(frame: pd.DataFrame) -> set:
+    # NaN/None both become None so keys compare equal to rows read back
+    clean = frame[ERROR_COLUMNS].astype(object).where(frame[ERROR_COLUMNS].notna(), None)
+    return set(map(tuple, clean.itertuples(index=False, name=None)))
+
+
+def reconcile(
+    db: Session,
+    accessioned: AccessionedShelves,
+    shelves: Optional[Sequence[str]] = None,
+    kinds: Optional[Sequence[str]] = None,
+) -> Dict[str, int]:
+    """
+    Run the rules (all registered ones, or `kinds`) over one snapshot and
+    bring the errors they own in line. With `shelves`, only errors located on
+    those shelves are compared and written. Does not commit.
+    """
+    rules = [RULES[k] for k in (kinds or RULES)]
+    snapshot = Snapshot(db, accessioned, shelves)
+
+    frames = [r.evaluate(snapshot) for r in rules]
+    desired = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ERROR_COLUMNS)
+    if snapshot.shelves is not None:
+        desired = desired[shelf_bases(desired.alternative_call_number).isin(snapshot.shelves)]
+    desired_keys = _error_keys(desired)
+
+    E = models.AnalyticsError
+    owned = or_(*(E.error_reason.startswith(r.prefix) for r in rules))
+    existing_query = select(E.id, *(getattr(E, c) for c in ERROR_COLUMNS)).where(owned)
+    # Every id per key: duplicate rows (NULL fields escape the unique
+    # constraint) keep their lowest id and the rest are deleted
+    existing: Dict[tuple, List[int]] = defaultdict(list)
+    scopes = _chunks(snapshot.shelves, SCOPE_CHUNK_SIZE) if snapshot.shelves is not None else [None]
+    for chunk in scopes:
+        stmt = existing_query if chunk is None else existing_query.where(_on_shelves(E.alternative_call_number, chunk))
+        for row in db.execute(stmt):
+            existing[tuple(row[1:])].append(row[0])
+
+    stale = []
+    for key, error_ids in existing.items():
+        error_ids = sorted(set(error_ids))
+        stale.extend(error_ids if key not in desired_keys else error_ids[1:])
+    deleted = 0
+    for chunk in _chunks(stale, WRITE_CHUNK_SIZE):
+        deleted += db.query(E).filter(E.id.in_(chunk)).delete(synchronize_session=False)
+
+    created = 0
+    new_rows = [dict(zip(ERROR_COLUMNS, key)) for key in desired_keys - existing.keys()]
+    for chunk in _chunks(new_rows, WRITE_CHUNK_SIZE):
+        result = db.execute(
+            insert(E).values(chunk)
+            .on_conflict_do_nothing(constraint="uq_analytics_error_all_fields")
+            .returning(E.id)
+        )
+        created += len(result.fetchall())
+
+    return {"errors_created": created, "errors_deleted": deleted}
@@ -0,0 +1,88 @@
+# backend/core/shelf_range.py
+#
+# The "accessioned range": the span of shelves that hold at least one
+# physical item, keyed "floor-range-ladder-shelf" and compared as strings the
+# way the shelf viewer and missing-item detection always have. It is derived
+# from the whole items table, so it is computed with one aggregate and cached
+# in-process against the items write version (db/versions.py); any committed
+# item write makes the next lookup recompute it.
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from db import models
+from db.versions import get_version
+
+# Same prefix the shelf viewer matches: S-floor-range-ladder-shelf
+SHELF_KEY_PATTERN = r'^S-([^-]+-[^-]+-[0-9]+-[0-9]+)'
+
+
+def range_key(shelf_key: str) -> str:
+    """'3-01A-02-03' -> '3-01A' (floor and range)."""
+    return "-".join(shelf_key.split("-")[:2])
+
+
+class AccessionedShelves:
+    """Sorted shelf keys that hold items, with per-(floor, range) bounds."""
+
+    def __init__(self, shelf_counts: Dict[str, int], total_items: int):
+        self.shelf_counts = shelf_counts
+        self.total_items = total_items
+        self.shelves: List[str] = sorted(shelf_counts)
+        self.ranges: Dict[str, Tuple[str, str]] = {}
+        for key in self.shelves:
+            r = range_key(key)
+            lo, _ = self.ranges.get(r, (key, key))
+            self.ranges[r] = (lo, key)
+
+    @property
+    def min_shelf(self) -> Optional[str]:
+        return self.shelves[0] if self.shelves else None
+
+    @property
+    def max_shelf(self) -> Optional[str]:
+        return self.shelves[-1] if self.shelves else None
+
+    def contains(self, shelf_key: str) -> bool:
+        """True when shelf_key lies within the global accessioned range."""
+        return bool(self.shelves) and self.min_shelf <= shelf_key <= self.max_shelf
+
+    def range_bounds(self, shelf_key: str) -> Optional[Tuple[str, str]]:
+        """(min, max) accessioned shelf of shelf_key's own floor and range."""
+        return self.ranges.get(range_key(shelf_key))
+
+
+def _load(db: Session) -> AccessionedShelves:
+    shelf_key = func.substring(models.Item.alternative_call_number, SHELF_KEY_PATTERN)
+    rows = (
+        db.query(shelf_key, func.count())
+        .filter(models.Item.alternative_call_number.isnot(None))
+        .group_by(shelf_key)
+        .all()
+    )
+    counts = {key: n for key, n in rows if key is not None}
+    return AccessionedShelves(counts, total_items=sum(n for _, n in rows))
+
+
+class ShelfRangeCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entry: Optional[Tuple[int, AccessionedShelves]] = None
+
+    def get(self, db: Session) -> AccessionedShelves:
+        version = get_version(models.Item.__tablename__)
+        with self._lock:
+            if self._entry and self._entry[0] == version:
+                return self._entry[1]
+
+        value = _load(db)
+
+        with self._lock:
+            self._entry = (version, value)
+        return value
+
+
+shelf_ranges = ShelfRangeCache()
@@ -0,0 +1,66 @@
+# backend/core/streaming.py
+#
+# Helpers for export-style responses that must not hold a whole result set in
+# memory. Each stream opens its own session (the request-scoped one from
+# get_db may be closed before the body finishes) and reads through a
+# server-side cursor in fixed-size batches.
+
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, Iterator, List
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Query, Session
+
+from db.session import SessionLocal
+
+STREAM_BATCH_SIZE = 2000
+
+
+def _stream_rows(build_query: Callable[[Session], Query]) -> Iterator[Any]:
+    with SessionLocal() as db:
+        yield from build_query(db).yield_per(STREAM_BATCH_SIZE)
+
+
+def ndjson_response(
+    build_query: Callable[[Session], Query],
+    serialize: Callable[[Any], Dict[str, Any]],
+    filename: str,
+) -> StreamingResponse:
+    """Stream every row of build_query(db) as one JSON object per line."""
+    def generate():
+        for row in _stream_rows(build_query):
+            yield json.dumps(serialize(row), default=str) + "\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.ndjson"'},
+    )
+
+
+def csv_response(
+    build_query: Callable[[Session], Query],
+    serialize: Callable[[Any], Dict[str, Any]],
+    columns: List[str],
+    filename: str,
+) -> StreamingResponse:
+    """Stream every row of build_query(db) as CSV with the given header."""
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for i, row in enumerate(_stream_rows(build_query), start=1):
+            writer.writerow(serialize(row))
+            if i % STREAM_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'},
+    )
@@ -2,66 +2,142 @@
 
 import io
 import os
-import sqlite3
 import re  # Add this import
 import zipfile
 from io import BytesIO
 from typing import Optional, List, Dict, Union, Any
 from pymarc import MARCReader, Record, MARCWriter, Field, Subfield
-from cachetools import LRUCache
 from sqlalchemy.orm import Session
 from db import crud
 from db.session import SessionLocal
+from core.marc_cache import marc_cache
+from core.marc_store import marc_store
+from core.sudoc_index import sudoc_index
+from core.sudoc_key import sudoc_sort_key
 import re
 import itertools
 
 BASE_DIR    = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-SQLITE_PATH = os.path.join(BASE_DIR, "cgp_sudoc_index.db")
 RECORDS_DIR = os.path.join(BASE_DIR, "Record_sets")
 
-# Create a cache for MARC records
-marc_record_cache = LRUCache(maxsize=100)
+FTS_TABLE = "records_fts"
 
-def _connect():
-    return sqlite3.connect(SQLITE_PATH)
+def _fts_expression(column: str, text: str, mode: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression for one column. Input is reduced to word tokens
+    (the same split the unicode61 tokenizer applies to SuDocs and titles), so
+    user punctuation can never be read as query syntax.
+      prefix  column starts with the tokens, last one a prefix: ^"y 4 ap"*
+      token   every token, any order: "hearing" "senate"
+      phrase  tokens adjacent and in order: "y 4 ap 6"
+    """
+    tokens = re.findall(r"\w+", text.lower())
+    if not tokens:
+        return None
+    if mode == "token":
+        return f"{column} : (" + " ".join(f'"{t}"' for t in tokens) + ")"
+    phrase = '"' + " ".join(tokens) + '"'
+    if mode == "prefix":
+        # ^ anchors the phrase to the column's first token, so "ap 6" does
+        # not match inside "y 4 ap 6 1"
+        return f"{column} : ^{phrase}*"
+    return f"{column} : {phrase}"
+
+def _summary(r) -> dict:
+    return {
+        "id":       r[0],
+        "sudoc":    r[1],
+        "title":    r[2],
+        "zip_file": r[3],
+        "oclc":     r[4],
+    }
 
 def search_records(
     query: str,
     title: Optional[str] = None,
     limit: int = 20,
-    offset: int = 0
-) -> List[dict]:
-
-    sql = """
-    SELECT
-      rowid,
-      sudoc,
-      title,
-      zip_file,
-      oclc
-    FROM records
-    WHERE sudoc LIKE ?
-      AND (? IS NULL OR title LIKE ?)
-    LIMIT ? OFFSET ?
+    offset: int = 0,
+    mode: str = "prefix",
+) -> Dict[str, Any]:
+    """
+    Search the SuDoc index. Returns {"total": n, "items": [...]}.
+
+    With the FTS5 table built, prefix/token/phrase queries run against it and
+    results are ranked by bm25 (SuDoc matches weigh more than title matches).
+    mode="substring", or an index built before FTS existed, falls back to the
+    LIKE '%q%' scan.
+    """
+    use_fts = mode != "substring" and sudoc_index.has_table(FTS_TABLE)
+    conn = sudoc_index.connection()
+    if use_fts:
+        clauses = [e for e in (
+            _fts_expression("sudoc", query or "", mode),
+            _fts_expression("title", title or "", mode),
+        ) if e]
+        if not clauses:
+            return {"total": 0, "items": []}
+        match = " AND ".join(clauses)
+
+        # Records without a SuDoc are left out, as the LIKE scan always did
+        total = conn.execute(f"""
+            SELECT count(*)
+            FROM {FTS_TABLE}
+            JOIN records r ON r.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH ? AND r.sudoc IS NOT NULL
+        """, (match,)).fetchone()[0]
+        rows = conn.execute(f"""
+            SELECT r.id, r.sudoc, r.title, r.zip_file, r.oclc
+            FROM {FTS_TABLE}
+            JOIN records r ON r.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH ? AND r.sudoc IS NOT NULL
+            ORDER BY bm25({FTS_TABLE}, 1.0, 4.0), r.sudoc
+            LIMIT ? OFFSET ?
+        """, (match, limit, offset)).fetchall()
+    else:
+        where = """
+        WHERE sudoc LIKE ?
+          AND (? IS NULL OR title LIKE ?)
+        """
+        args = [f"%{query}%", title, f"%{title}%"]
+        total = conn.execute(f"SELECT count(*) FROM records {where}", args).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT rowid, sudoc, title, zip_file, oclc FROM records {where} LIMIT ? OFFSET ?",
+            args + [limit, offset],
+        ).fetchall()
+
+    return {"total": total, "items": [_summary(r) for r in rows]}
+
+def browse_records(sudoc: str, before: int = 10, after: int = 10) -> Optional[Dict[str, Any]]:
+    """
+    Shelf-list neighbours of a SuDoc: the `before` records filing ahead of it
+    and the `after` records from it onwards (an exact match comes first), both
+    in shelf order. The SuDoc need not exist in the index. Each side is one
+    range scan on idx_sudoc_key. Returns None if the index has no sort keys
+    yet (scripts/build_index.py --sort-keys).
     """
-    args = [f"%{query}%", title, f"%{title}%", limit, offset]
-
-    conn = _connect()
-    cur  = conn.cursor()
-    cur.execute(sql, args)
-    rows = cur.fetchall()
-    conn.close()
-
-    return [
-        {
-          "id":       r[0],
-          "sudoc":    r[1],
-          "title":    r[2],
-          "zip_file": r[3],
-          "oclc":     r[4],
-        }
-        for r in rows
-    ]
+    if not sudoc_index.has_column("records", "sudoc_key"):
+        return None
+    key = sudoc_sort_key(sudoc)
+    if key is None:
+        return {"sudoc": sudoc, "before": [], "after": []}
+    earlier = sudoc_index.execute("""
+        SELECT id, sudoc, title, zip_file, oclc FROM records
+        WHERE sudoc_key < ?
+        ORDER BY sudoc_key DESC, id DESC
+        LIMIT ?
+    """, (key, before)).fetchall() if before else []
+    later = sudoc_index.execute("""
+        SELECT id, sudoc, title, zip_file, oclc FROM records
+        WHERE sudoc_key >= ?
+        ORDER BY sudoc_key, id
+        LIMIT ?
+    """, (key, after)).fetchall() if after else []
+
+    return {
+        "sudoc":  sudoc,
+        "before": [_summary(r) for r in reversed(earlier)],
+        "after":  [_summary(r) for r in later],
+    }
 
 def get_record_fields(record_id: int, preserve_order: bool = False) -> List[dict]:
     """Get MARC fields for a record"""
@@ -184,66 +260,53 @@ def get_marc_by_id(record_id: int, include_edits: bool = True):
     
     return sqlite_record
 
-def _get_original_marc_by_id(record_id: int):
-    """Get MARC record using byte offset for direct access"""
+def _get_original_marc_bytes(record_id: int) -> Optional[bytes]:
+    """Raw bytes of the original record, located by its byte offset in the index"""
     
-    with sqlite3.connect(SQLITE_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        
-        # Get the zip file and byte offset
-        cur.execute("""
-            SELECT zip_file, marc_file, byte_offset, record_length 
-            FROM records WHERE id = ?
-        """, (record_id,))
-        row = cur.fetchone()
+    # Get the zip file and byte offset
+    row = sudoc_index.execute("""
+        SELECT zip_file, marc_file, byte_offset, record_length
+        FROM records WHERE id = ?
+    """, (record_id,)).fetchone()
+    
+    if not row:
+        print(f"Record {record_id} not found in index")
+        return None
         
-        if not row:
-            print(f"Record {record_id} not found in index")
-            return None
-            
-        zip_filename = row['zip_file']
-        marc_filename = row['marc_file']
-        byte_offset = row['byte_offset']
-        record_length = row['record_length']
+    zip_filename = row['zip_file']
+    marc_filename = row['marc_file']
+    byte_offset = row['byte_offset']
+    record_length = row['record_length']
     
     print(f"[SUDOC] id={record_id} -> zip={zip_filename}, byte_offset={byte_offset}")
     
-    zip_path = os.path.join(RECORDS_DIR, zip_filename)
-    if not os.path.exists(zip_path):
-        print(f"ZIP file not found: {zip_path}")
-        return None
-    
     try:
-        with zipfile.ZipFile(zip_path, 'r') as zf:
-            with zf.open(marc_filename) as marc_file:
-                # Seek directly to the byte offset
-                marc_file.seek(byte_offset)
-                
-                # Read exactly the record length
-                record_data = marc_file.read(record_length)
-                
-                # Parse the record
-                from io import BytesIO
-                reader = MARCReader(BytesIO(record_data), to_unicode=True, force_utf8=True)
-                try:
-                    record = next(reader)
-                    return record
-                except StopIteration:
-                    print(f"Failed to parse record at offset {byte_offset}")
-                    return None
-                
+        # Memory-mapped slice of the repacked member (ZIP fallback if not repacked)
+        return marc_store.read(zip_filename, marc_filename, byte_offset, record_length)
     except Exception as e:
         print(f"Error reading MARC file: {e}")
         return None
 
+def _parse_marc(data: bytes):
+    reader = MARCReader(BytesIO(data), to_unicode=True, force_utf8=True)
+    try:
+        return next(reader)
+    except StopIteration:
+        return None
+
+def _get_original_marc_by_id(record_id: int):
+    """Get MARC record using byte offset for direct access"""
+    data = _get_original_marc_bytes(record_id)
+    if data is None:
+        return None
+    record = _parse_marc(data)
+    if record is None:
+        print(f"Failed to parse original record {record_id}")
+    return record
+
 def save_marc_record(record_id: int, record: Record) -> bool:
     """Save an updated MARC record back to its ZIP file"""
-    conn = _connect()
-    cur = conn.cursor()
-    cur.execute("SELECT zip_file FROM records WHERE rowid = ?", (record_id,))
-    row = cur.fetchone()
-    conn.close()
+    row = sudoc_index.execute("SELECT zip_file FROM records WHERE rowid = ?", (record_id,)).fetchone()
     
     if not row:
         return False
@@ -1258,17 +1321,13 @@ def get_record_by_oclc(oclc_number: str):
     
     # Then check SQLite
     try:
-        with sqlite3.connect(SQLITE_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM records WHERE oclc = ?", (oclc_number,))
-            row = cursor.fetchone()
-            if row:
-                record_id = row['id']
-                record = _get_original_marc_by_id(record_id)
-                if record:
-                    print(f"DEBUG: Found SQLite record with OCLC {oclc_number}, ID={record_id}")
-                    return record, record_id
+        row = sudoc_index.execute("SELECT id FROM records WHERE oclc = ?", (oclc_number,)).fetchone()
+        if row:
+            record_id = row['id']
+            record = _get_original_marc_by_id(record_id)
+            if record:
+                print(f"DEBUG: Found SQLite record with OCLC {oclc_number}, ID={record_id}")
+                return record, record_id
     except Exception as e:
         print(f"DEBUG: Error checking SQLite for OCLC {oclc_number}: {e}")
         
@@ -1514,46 +1573,72 @@ def get_record_by_oclc(oclc_number: str):
     
     # Then check SQLite
     try:
-        with sqlite3.connect(SQLITE_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM records WHERE oclc = ?", (oclc_number,))
-            row = cursor.fetchone()
-            if row:
-                record_id = row['id']
-                record = _get_original_marc_by_id(record_id)
-                if record:
-                    return record, record_id
+        row = sudoc_index.execute("SELECT id FROM records WHERE oclc = ?", (oclc_number,)).fetchone()
+        if row:
+            record_id = row['id']
+            record = _get_original_marc_by_id(record_id)
+            if record:
+                return record, record_id
     except Exception:
         pass
         
     return None, None
 
-def get_marc_by_id(record_id: int, include_edits: bool = True):
-    """Get MARC record by ID, checking PostgreSQL first, then SQLite"""
-    # Check PostgreSQL if edits should be included
+def _candidate_marc_bytes(record_id: int, include_edits: bool):
+    """MARC bytes for a record in order of preference: latest edit overlay, created record, original"""
     with SessionLocal() as db:
         if include_edits:
             ov = crud.get_latest_edited_overlay(db, record_id)
             if ov:
-                rec = next(MARCReader(BytesIO(ov.marc_data), to_unicode=True, force_utf8=True), None)
-                if rec:
-                    # Apply Alma validation fixes to edited records
-                    rec = fix_alma_validation_issues(rec)
-                    return rec
+                yield bytes(ov.marc_data)
         
-        # Check for created record
         created = crud.get_created_record(db, record_id)
         if created:
-            rec = next(MARCReader(BytesIO(created.marc_data), to_unicode=True, force_utf8=True), None)
-            if rec:
-                # Apply Alma validation fixes to created records
-                rec = fix_alma_validation_issues(rec)
-                return rec
+            yield bytes(created.marc_data)
     
-    # Check SQLite as fallback
-    sqlite_record = _get_original_marc_by_id(record_id)
-    if sqlite_record:
-        # Apply Alma validation fixes to original records too
-        sqlite_record = fix_alma_validation_issues(sqlite_record)
-    return sqlite_record
\ No newline at end of file
+    yield _get_original_marc_bytes(record_id)
+
+def _load_marc(record_id: int, include_edits: bool):
+    """(bytes, Record) from the first source that parses, or (None, None)"""
+    candidates = _candidate_marc_bytes(record_id, include_edits)
+    try:
+        for data in candidates:
+            if data is None:
+                continue
+            rec = _parse_marc(data)
+            if rec is not None:
+                return data, rec
+            print(f"Unparseable MARC for record {record_id}; trying the next source")
+    finally:
+        candidates.close()   # releases the Postgres session if we stopped early
+    return None, None
+
+def _marc_source():
+    """Where original records currently come from; part of the marc_cache key"""
+    return (sudoc_index.identity(), marc_store.identity())
+
+def get_marc_by_id(record_id: int, include_edits: bool = True):
+    """
+    Get MARC record by ID: edited overlay, created record or the original from
+    SQLite, with Alma validation fixes applied. Served from marc_cache when
+    possible; the caller always gets its own copy.
+    """
+    key = marc_cache.key(record_id, include_edits, _marc_source())
+    cached = marc_cache.get_record(key)
+    if cached is not None:
+        return cached
+    
+    # Cached bytes always parsed when they were stored
+    data = marc_cache.get_bytes(key)
+    rec = _parse_marc(data) if data is not None else None
+    if rec is None:
+        # An overlay or created record that fails to parse falls through to
+        # the next source, as before caching
+        data, rec = _load_marc(record_id, include_edits)
+        if rec is None:
+            return None
+        marc_cache.put_bytes(key, data)
+    
+    rec = fix_alma_validation_issues(rec)
+    marc_cache.put_record(key, rec)
+    return rec
@@ -0,0 +1,140 @@
+# backend/core/sudoc_index.py
+#
+# Read-only access to cgp_sudoc_index.db, the SQLite index of the original
+# MARC records that scripts/build_index.py writes.
+#
+# The app never writes to the index, so each worker thread keeps one
+# connection open for the life of the process instead of connecting per
+# request. Connections are opened mode=ro&immutable=1 (no file locking, no
+# change detection on every statement) with query_only set, a private page
+# cache and the file memory-mapped, so hot index pages are shared through
+# the OS page cache. Statements keep their SQL text constant and are
+# compiled once per connection by sqlite3's statement cache.
+#
+# immutable=1 means SQLite trusts the file never changes under it; instead a
+# connection is reopened when the file's (inode, mtime) differs from the one
+# it was opened on, the same check core/marc_store.py makes for its maps.
+# A rebuild therefore becomes visible on the next query in each thread.
+
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+BASE_DIR   = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+INDEX_PATH = os.path.join(BASE_DIR, "cgp_sudoc_index.db")
+
+MMAP_SIZE = 512 << 20          # bytes of the file mapped per connection
+CACHE_SIZE_KIB = 16 << 10      # private page cache per connection
+STATEMENT_CACHE = 256          # compiled statements kept per connection
+
+PRAGMAS = (
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+    f"PRAGMA cache_size = -{CACHE_SIZE_KIB}",
+    "PRAGMA query_only = ON",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class SudocIndex:
+    """Thread-local read-only connections to the SuDoc index."""
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # file identity -> cached schema facts (has FTS table, has sort keys)
+        self._schema: Tuple[Optional[Tuple[int, int]], Dict[str, bool]] = (None, {})
+
+    def _identity(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return (st.st_ino, st.st_mtime_ns)
+
+    def identity(self) -> Optional[Tuple[int, int]]:
+        """(inode, mtime) of the index file, None if it is missing; changes on every rebuild."""
+        try:
+            return self._identity()
+        except FileNotFoundError:
+            return None
+
+    def _open(self) -> sqlite3.Connection:
+        uri = f"file:{quote(self.path)}?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True, cached_statements=STATEMENT_CACHE)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        This thread's connection, opened on first use and reopened if the
+        index file has been replaced. Do not close it.
+        """
+        identity = self._identity()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.identity == identity:
+            return conn
+        # A superseded connection is dropped, not closed: a caller further up
+        # this thread's stack may still hold it (or a cursor on it) mid-query,
+        # and it closes itself once the last reference goes
+        self._local.conn = self._open()
+        self._local.identity = identity
+        return self._local.conn
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        return self.connection().execute(sql, params)
+
+    def _schema_fact(self, name: str, sql: str, params=()) -> bool:
+        identity = self._identity()
+        with self._lock:
+            if self._schema[0] != identity:
+                self._schema = (identity, {})
+            facts = self._schema[1]
+            if name in facts:
+                return facts[name]
+        value = self.execute(sql, params).fetchone() is not None
+        with self._lock:
+            if self._schema[0] == identity:
+                self._schema[1][name] = value
+        return value
+
+    def has_table(self, table: str) -> bool:
+        return self._schema_fact(
+            f"table:{table}", "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        )
+
+    def has_column(self, table: str, column: str) -> bool:
+        return self._schema_fact(
+            f"column:{table}.{column}", "SELECT 1 FROM pragma_table_info(?) WHERE name = ?", (table, column)
+        )
+
+    # ── warm-up ───────────────────────────────────────────────────────────
+
+    def warm(self):
+        """
+        Read every index on `records` once so their pages are in the OS page
+        cache (and so in every connection's memory map) before the first
+        lookup needs them.
+        """
+        conn = self._open()
+        try:
+            names = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'records'"
+            )]
+            for name in names:
+                conn.execute(f'SELECT count(*) FROM records INDEXED BY "{name}"').fetchone()
+        finally:
+            conn.close()
+
+    def warm_in_background(self):
+        threading.Thread(target=self._safe_warm, name="sudoc-index-warm", daemon=True).start()
+
+    def _safe_warm(self):
+        try:
+            self.warm()
+        except Exception as e:
+            print(f"SuDoc index warm-up failed: {e}")
+
+
+sudoc_index = SudocIndex()
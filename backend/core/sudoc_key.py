@@ -0,0 +1,59 @@
+# backend/core/sudoc_key.py
+#
+# Sort keys for SuDoc classification numbers. As plain strings SuDocs file
+# wrongly ("Y 4.10" before "Y 4.2", "A 1.1/2:" before "A 1.1:"), so
+# scripts/build_index.py stores sudoc_sort_key(sudoc) in records.sudoc_key
+# and the shelf-list browse range-scans that column's index.
+#
+# A SuDoc is read as a run of components: agency letters, subagency and
+# series numbers, cutters and item numbers ("Y 4.AP 6/1:H 81/2" is
+# Y | 4 | AP | 6 | 1 | H | 81 | 2). Each component is encoded so the key
+# compares correctly byte by byte (SQLite's BINARY collation):
+#
+#   - numbers compare as whole numbers (length-prefixed, leading zeros off)
+#   - numbers file before letters in the same position
+#   - letters compare case-insensitively
+#   - a shorter class files before its extensions ("nothing before
+#     something"), and at a break the punctuation ranks the extensions:
+#     ':' (stem ends, book number follows) < '/' < '-' < '.' < space
+#
+# So "A 1.1:" < "A 1.1/2:" < "A 1.2:" < "A 1.10:", which is GPO shelf order.
+
+import re
+from typing import Optional
+
+_COMPONENT = re.compile(r"[0-9]+|[A-Za-z]+|[:/.\-]")
+
+# Break characters, strongest first; anything else (spaces, commas,
+# parentheses, a letter running into a digit) is the weakest break
+_BREAKS = {":": "1", "/": "2", "-": "3", ".": "4"}
+_WEAK_BREAK = "5"
+
+_NUMBER = "D"
+_LETTERS = "L"
+
+
+def _number(digits: str) -> str:
+    digits = digits.lstrip("0") or "0"
+    return _NUMBER + chr(ord("0") + len(digits)) + digits
+
+
+def sudoc_sort_key(sudoc: Optional[str]) -> Optional[str]:
+    """
+    Byte-comparable shelf-order key for a SuDoc, or None when it has no
+    letters or digits.
+    """
+    if not sudoc:
+        return None
+
+    parts = []
+    pending = _WEAK_BREAK
+    for token in _COMPONENT.findall(sudoc):
+        if token in _BREAKS:
+            pending = min(pending, _BREAKS[token])
+            continue
+        parts.append(pending)
+        parts.append(_number(token) if token[0].isdigit() else _LETTERS + token.upper())
+        pending = _WEAK_BREAK
+
+    return "".join(parts) or None
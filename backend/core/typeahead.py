@@ -0,0 +1,231 @@
+# backend/core/typeahead.py
+#
+# As-you-type completion for barcodes and alternative call numbers.
+#
+# Keys from items and analytics are held in memory as sorted, upper-cased
+# arrays and looked up with bisect, so a prefix query costs O(log n + limit)
+# with no database round trip. The index is built once at startup and then
+# kept current from session events: ORM inserts/updates/deletes of Item and
+# Analytics rows are applied incrementally when their transaction commits;
+# bulk statements (query.delete(), insert().values(...)) can't be seen row by
+# row, so they mark the index stale and it is rebuilt in the background while
+# the previous snapshot keeps serving. That includes the bulk update/delete
+# endpoints in api/record_management.py: each one on items or analytics
+# costs a full reload of both tables' keys.
+
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from db import models
+from db.session import SessionLocal
+
+FIELDS = ("barcode", "alternative_call_number")
+TRACKED_MODELS = (models.Item, models.Analytics)
+TRACKED_TABLES = {m.__tablename__ for m in TRACKED_MODELS}
+
+_PENDING = "typeahead_pending"
+
+# Snapshot attempts before serving a snapshot that writes kept overlapping
+MAX_BUILD_ATTEMPTS = 3
+
+
+def _norm(value) -> str:
+    return str(value).strip().upper() if value is not None else ""
+
+
+class _SortedKeys:
+    """Sorted unique keys with reference counts (a key may come from several rows)."""
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self.refs: Dict[str, int] = defaultdict(int)
+        for k in keys:
+            if k:
+                self.refs[k] += 1
+        self.keys: List[str] = sorted(self.refs)
+
+    def add(self, key: str):
+        if not key:
+            return
+        self.refs[key] += 1
+        if self.refs[key] == 1:
+            insort(self.keys, key)
+
+    def remove(self, key: str):
+        if not key or key not in self.refs:
+            return
+        self.refs[key] -= 1
+        if self.refs[key] <= 0:
+            del self.refs[key]
+            i = bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                del self.keys[i]
+
+    def prefix(self, prefix: str, limit: int) -> List[str]:
+        keys = self.keys
+        i = bisect_left(keys, prefix)
+        out = []
+        while i < len(keys) and len(out) < limit and keys[i].startswith(prefix):
+            out.append(keys[i])
+            i += 1
+        return out
+
+
+class TypeaheadIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._fields: Dict[str, _SortedKeys] = {f: _SortedKeys() for f in FIELDS}
+        self._built = False
+        self._stale = False
+        self._journal = None
+
+    # ── building ──────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _snapshot() -> Dict[str, _SortedKeys]:
+        collected = {f: [] for f in FIELDS}
+        with SessionLocal() as db:
+            for model in TRACKED_MODELS:
+                rows = db.query(model.barcode, model.alternative_call_number).yield_per(10000)
+                for barcode, acn in rows:
+                    collected["barcode"].append(_norm(barcode))
+                    collected["alternative_call_number"].append(_norm(acn))
+        return {f: _SortedKeys(keys) for f, keys in collected.items()}
+
+    def build(self):
+        """Load every barcode/ACN from items and analytics into fresh arrays."""
+        with self._build_lock:
+            for attempt in range(1, MAX_BUILD_ATTEMPTS + 1):
+                with self._lock:
+                    # Record whether any commit lands while the snapshot is
+                    # read. Such a commit may or may not be in the snapshot,
+                    # so it can't be replayed onto it safely (an add the
+                    # snapshot already holds would count twice); the
+                    # snapshot is thrown away and read again instead.
+                    self._stale = False
+                    self._journal = []
+                fresh = self._snapshot()
+                with self._lock:
+                    overlapped = bool(self._journal)
+                    if overlapped and attempt < MAX_BUILD_ATTEMPTS:
+                        continue
+                    self._journal = None
+                    self._fields = fresh
+                    self._built = True
+                    if overlapped:
+                        # Writes kept overlapping: serve this snapshot, and
+                        # rebuild on the next lookup
+                        self._stale = True
+                    return
+
+    def build_in_background(self):
+        threading.Thread(target=self._safe_build, name="typeahead-build", daemon=True).start()
+
+    def _safe_build(self):
+        try:
+            self.build()
+        except Exception as e:
+            print(f"Typeahead index build failed: {e}")
+            with self._lock:
+                self._journal = None
+                self._stale = True
+
+    # ── maintenance ───────────────────────────────────────────────────────
+
+    @staticmethod
+    def _apply(fields: Dict[str, _SortedKeys], changes: List[Tuple[str, str, str]]):
+        for op, field, key in changes:
+            if op == "add":
+                fields[field].add(key)
+            else:
+                fields[field].remove(key)
+
+    def apply(self, changes: List[Tuple[str, str, str]]):
+        """changes: (op, field, key) with op in {"add", "remove"}."""
+        with self._lock:
+            self._apply(self._fields, changes)
+            if self._journal is not None:
+                self._journal.extend(changes)
+
+    def mark_stale(self):
+        with self._lock:
+            if self._stale:
+                return
+            self._stale = True
+        if not self._build_lock.locked():
+            self.build_in_background()
+
+    # ── lookup ────────────────────────────────────────────────────────────
+
+    def lookup(self, prefix: str, field: str, limit: int) -> List[str]:
+        if not self._built:
+            # First request before the startup build finished: wait for it.
+            with self._build_lock:
+                pass
+            if not self._built:
+                self.build()
+        elif self._stale and not self._build_lock.locked():
+            self.build_in_background()
+        with self._lock:
+            return self._fields[field].prefix(_norm(prefix), limit)
+
+
+typeahead_index = TypeaheadIndex()
+
+
+# ── session hooks ─────────────────────────────────────────────────────────
+
+def _row_changes(obj, op: str):
+    # Read loaded state only: touching an expired attribute on a row deleted
+    # in this flush would try to reload it.
+    loaded = inspect(obj).dict
+    return [(op, f, _norm(loaded.get(f))) for f in FIELDS]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    pending = session.info.setdefault(_PENDING, [])
+    for obj in session.new:
+        if isinstance(obj, TRACKED_MODELS):
+            pending.extend(_row_changes(obj, "add"))
+    for obj in session.deleted:
+        if isinstance(obj, TRACKED_MODELS):
+            pending.extend(_row_changes(obj, "remove"))
+    for obj in session.dirty:
+        if not isinstance(obj, TRACKED_MODELS):
+            continue
+        state = inspect(obj)
+        for f in FIELDS:
+            hist = state.attrs[f].history
+            if hist.has_changes():
+                pending.extend(("remove", f, _norm(v)) for v in hist.deleted)
+                pending.extend(("add", f, _norm(v)) for v in hist.added)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and table.name in TRACKED_TABLES:
+            orm_execute_state.session.info.setdefault(_PENDING, []).append(("stale", None, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session):
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    if any(op == "stale" for op, _, _ in pending):
+        typeahead_index.mark_stale()
+    else:
+        typeahead_index.apply(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(_PENDING, None)
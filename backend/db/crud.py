@@ -5,6 +5,7 @@ from typing import List, Optional
 from datetime import datetime
 from sqlalchemy import or_, func, desc
 from . import models
+from core.marc_cache import marc_cache
 from .models import User
 from schemas.item import ItemCreate
 from schemas.analytics import AnalyticsCreate, AnalyticsErrorCreate
@@ -386,6 +387,7 @@ def save_edited_record(db: Session, record_id: int, marc_data: bytes, user_id: i
     )
     db.add(overlay)
     db.commit()
+    marc_cache.invalidate(record_id)
 
 def get_latest_edited_overlay(db: Session, record_id: int):
     return (
@@ -400,6 +402,7 @@ def create_new_marc_record(db: Session, marc_data: bytes, user_id: int | None) -
     db.add(rec)
     db.commit()
     db.refresh(rec)
+    marc_cache.invalidate(rec.id)
     return rec.id
 
 def get_created_record(db: Session, record_id: int):
@@ -1,11 +1,17 @@
 # backend/db/models.py
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, UniqueConstraint, Index, LargeBinary
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, UniqueConstraint, Index, LargeBinary, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from datetime import datetime  # Import the datetime class directly
 from .base import Base
 
+ANALYTICS_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B')"
+)
+
 class Item(Base):
     __tablename__ = "items"
 
@@ -17,10 +23,19 @@ class Item(Base):
     location   = Column(String, index=True, nullable=True)
     floor      = Column(String, index=True, nullable=True)
     range_code = Column(String, index=True, nullable=True)
-    ladder     = Column(String, nullable=True)
-    shelf      = Column(String, nullable=True)
+    ladder     = Column(String, index=True, nullable=True)
+    shelf      = Column(String, index=True, nullable=True)
     position   = Column(String, nullable=True)
 
+    # Per-shelf lookups are LIKE 'S-floor-range-ladder-shelf-%' prefix scans,
+    # which need pattern ops to use a btree under a non-C collation.
+    __table_args__ = (
+        Index('ix_items_acn_pattern', 'alternative_call_number',
+              postgresql_ops={'alternative_call_number': 'text_pattern_ops'}),
+        # Duplicate-position report: GROUP BY call number as an index-only scan
+        Index('ix_items_acn_barcode', 'alternative_call_number', 'barcode'),
+    )
+
 
 class Analytics(Base):
     __tablename__ = "analytics"
@@ -29,13 +44,27 @@ class Analytics(Base):
     barcode                 = Column(String, index=True, nullable=False)
     alternative_call_number = Column(String, index=True, nullable=True)
     title                   = Column(String, nullable=True)
-    location_code           = Column(String, nullable=True)
-    item_policy             = Column(String, nullable=True)
+    location_code           = Column(String, index=True, nullable=True)
+    item_policy             = Column(String, index=True, nullable=True)
     call_number             = Column(String, nullable=True)
     description             = Column(String, nullable=True)
-    status                  = Column(String, nullable=True)
+    status                  = Column(String, index=True, nullable=True)
     has_item_link           = Column(Boolean, default=False, nullable=False, index=True)
 
+    # Weighted full-text vector over title (A) and description (B). Postgres
+    # keeps it current on every INSERT/UPDATE, so every ingest path maintains it.
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(ANALYTICS_SEARCH_VECTOR_SQL, persisted=True),
+    ))
+
+    __table_args__ = (
+        Index('ix_analytics_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_analytics_acn_pattern', 'alternative_call_number',
+              postgresql_ops={'alternative_call_number': 'text_pattern_ops'}),
+        # Multi-location barcode report: barcode order with the location alongside
+        Index('ix_analytics_barcode_acn', 'barcode', 'alternative_call_number'),
+    )
 
 
 class AnalyticsError(Base):
@@ -50,6 +79,8 @@ class AnalyticsError(Base):
             'error_reason',
             name='uq_analytics_error_all_fields'
         ),
+        Index('ix_analytics_errors_acn_pattern', 'alternative_call_number',
+              postgresql_ops={'alternative_call_number': 'text_pattern_ops'}),
     )
 
     id                      = Column(Integer, primary_key=True, index=True)
@@ -70,6 +101,11 @@ class WeededItem(Base):
     is_weeded               = Column(Boolean, default=False, nullable=False)
     created_at              = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index('ix_weeded_items_acn_pattern', 'alternative_call_number',
+              postgresql_ops={'alternative_call_number': 'text_pattern_ops'}),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from . import versions  # noqa: F401  (registers per-table write counters)
+
 load_dotenv()  # looks for a .env file in the backend
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -0,0 +1,71 @@
+# backend/db/versions.py
+#
+# In-process write counters per table. Every Session that commits changes to
+# a table bumps that table's version, whether the write went through the ORM
+# unit of work (add/delete/dirty attributes) or a bulk statement passed to
+# session.execute (insert(...), query.delete(), update(...)).
+#
+# Caches key their entries on these versions instead of timing out. The
+# counters live in this process only, which matches the single uvicorn worker
+# the backend runs as. Raw text() writes are not seen; callers issuing those
+# must call bump() themselves.
+
+import threading
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = defaultdict(int)
+
+_TOUCHED = "touched_tables"
+
+
+def get_version(table: str) -> int:
+    with _lock:
+        return _versions[table]
+
+
+def get_versions(*tables: str) -> Tuple[int, ...]:
+    with _lock:
+        return tuple(_versions[t] for t in tables)
+
+
+def bump(*tables: str) -> None:
+    with _lock:
+        for t in tables:
+            _versions[t] += 1
+
+
+def _touch(session: Session, table_name: str) -> None:
+    session.info.setdefault(_TOUCHED, set()).add(table_name)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            _touch(session, table.name)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _touch(orm_execute_state.session, table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session):
+    touched = session.info.pop(_TOUCHED, None)
+    if touched:
+        bump(*touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(_TOUCHED, None)
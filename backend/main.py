@@ -2,6 +2,7 @@
 
 import os
 import sys
+from contextlib import asynccontextmanager
 # Add the backend directory itself to sys.path so "db", "api", etc. resolve correctly
 sys.path.insert(0, os.path.dirname(__file__))
 
@@ -32,14 +33,25 @@ from core.auth import (
     require_cataloger,
     require_admin,
 )
+from core.sudoc_index import sudoc_index
+from core.typeahead import typeahead_index
 from middleware.logging import LoggingMiddleware
 
 # Create tables (development only—use Alembic in prod)
 if os.getenv("ENV", "dev") == "dev":
     Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load barcode/call-number typeahead keys without delaying startup
+    typeahead_index.build_in_background()
+    # Pull the SuDoc index's b-trees into the page cache before the first search
+    sudoc_index.warm_in_background()
+    yield
+
 app = FastAPI(
     title="Shelf Catalog API",
+    lifespan=lifespan,
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
@@ -1,7 +1,7 @@
 # backend/schemas/analytics.py
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 # ───── Analytics Models ─────
 
@@ -25,6 +25,15 @@ class AnalyticsRead(AnalyticsBase):
     class Config:
         from_attributes = True
 
+class AnalyticsSearchHit(AnalyticsRead):
+    rank: float
+    title_snippet: Optional[str] = None
+    description_snippet: Optional[str] = None
+
+class AnalyticsSearchPage(BaseModel):
+    items: List[AnalyticsSearchHit]
+    next_cursor: Optional[str] = None
+
 # ───── Analytics Error Models ─────
 
 class AnalyticsErrorBase(BaseModel):
@@ -43,3 +52,8 @@ class AnalyticsErrorRead(AnalyticsErrorBase):
 
     class Config:
         from_attributes = True
+
+class AnalyticsErrorPage(BaseModel):
+    items: List[AnalyticsErrorRead]
+    next_cursor: Optional[str] = None
+    facets: Optional[Dict[str, Dict[str, int]]] = None
@@ -0,0 +1,22 @@
+# backend/schemas/record_management.py
+
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+# ───── Bulk Edit / Delete ─────
+
+class BulkSelection(BaseModel):
+    # Rows are selected by id list, by search filters (same names as
+    # GET /{table}/search, but every filter matches its value exactly), or
+    # both (intersection). A filter-only write must echo the `matched` count
+    # from its preview as expected_count.
+    ids: Optional[List[int]] = None
+    filters: Optional[Dict[str, Any]] = None
+    preview: bool = False
+    expected_count: Optional[int] = None
+
+class BulkUpdateRequest(BulkSelection):
+    patch: Dict[str, Any] = Field(..., min_length=1)
+
+class BulkDeleteRequest(BulkSelection):
+    pass
@@ -11,6 +11,15 @@ class SudocSummary(BaseModel):
     zip_file:  str
     oclc:      Optional[str]
 
+class SudocSearchPage(BaseModel):
+    total:     int
+    items:     List[SudocSummary]
+
+class SudocBrowsePage(BaseModel):
+    sudoc:     str
+    before:    List[SudocSummary]
+    after:     List[SudocSummary]
+
 class MarcFieldOut(BaseModel):
     tag:       str
     ind1:      str
@@ -0,0 +1,29 @@
+# backend/scripts/add_analytics_search_vector.py
+#
+# Adds the generated `analytics.search_vector` tsvector column and its GIN
+# index to an existing database (create_all only runs in dev).
+
+import os, sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text
+from db.session import engine
+from db.models import ANALYTICS_SEARCH_VECTOR_SQL
+
+def main():
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            ALTER TABLE analytics
+            ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS ({ANALYTICS_SEARCH_VECTOR_SQL}) STORED
+        """))
+        print("✅ search_vector column present.")
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_analytics_search_vector
+            ON analytics USING gin (search_vector)
+        """))
+        print("✅ ix_analytics_search_vector index present.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# backend/scripts/add_conflict_report_indexes.py
+#
+# Creates the composite indexes behind the building-wide conflict report
+# (/catalog/analytics-errors/conflicts/...) on an existing database.
+
+import os, sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text
+from db.session import engine
+
+INDEXES = {
+    "ix_items_acn_barcode":     "items (alternative_call_number, barcode)",
+    "ix_analytics_barcode_acn": "analytics (barcode, alternative_call_number)",
+}
+
+def main():
+    with engine.begin() as conn:
+        for name, target in INDEXES.items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+            print(f"✅ {name} present.")
+
+if __name__ == "__main__":
+    main()
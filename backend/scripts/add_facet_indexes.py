@@ -0,0 +1,28 @@
+# backend/scripts/add_facet_indexes.py
+#
+# Creates the btree indexes the filter dropdowns rely on for loose index
+# scans (see core/facets.py) on an existing database.
+
+import os, sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text
+from db.session import engine
+
+INDEXES = {
+    "ix_items_ladder":              ("items", "ladder"),
+    "ix_items_shelf":               ("items", "shelf"),
+    "ix_analytics_location_code":   ("analytics", "location_code"),
+    "ix_analytics_item_policy":     ("analytics", "item_policy"),
+    "ix_analytics_status":          ("analytics", "status"),
+}
+
+def main():
+    with engine.begin() as conn:
+        for name, (table, column) in INDEXES.items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})"))
+            print(f"✅ {name} present.")
+
+if __name__ == "__main__":
+    main()
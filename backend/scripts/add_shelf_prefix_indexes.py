@@ -0,0 +1,31 @@
+# backend/scripts/add_shelf_prefix_indexes.py
+#
+# Creates the text_pattern_ops indexes on alternative_call_number that let
+# the shelf viewer's LIKE 'S-floor-range-ladder-shelf-%' lookups use an index
+# on an existing database.
+
+import os, sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text
+from db.session import engine
+
+INDEXES = {
+    "ix_items_acn_pattern":            "items",
+    "ix_analytics_acn_pattern":        "analytics",
+    "ix_weeded_items_acn_pattern":     "weeded_items",
+    "ix_analytics_errors_acn_pattern": "analytics_errors",
+}
+
+def main():
+    with engine.begin() as conn:
+        for name, table in INDEXES.items():
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {name} "
+                f"ON {table} (alternative_call_number text_pattern_ops)"
+            ))
+            print(f"✅ {name} present.")
+
+if __name__ == "__main__":
+    main()
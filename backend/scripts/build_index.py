@@ -1,162 +1,437 @@
 # build_index.py — Create the SQLite SuDoc index for Streamlit lookup
 # ---------------------------------------------------------------
+#
+# Records are indexed straight from the raw MARC bytes: each record is split
+# off the stream by the 5-byte length at the start of its leader, and only
+# the 086, 245 and 035 fields are read, through the record directory. The
+# byte offsets stored are therefore exactly where each record sits in the
+# member (what core/marc_store.py slices), with no parse-and-reserialise.
+#
+# ZIPs are indexed in parallel, one per worker process; the parent inserts
+# their rows in ZIP order.
+#
+# records.id is what Postgres edit overlays, created-record lookups and cart
+# items refer to, so a rebuild keeps the ids of the index it replaces
+# (IdCarrier): each ZIP's new rows are aligned with the old index's rows for
+# that ZIP, in order, by (sudoc, title, oclc). A matched record keeps its id;
+# a record the old index lacked (the pymarc builder dropped records it could
+# not parse) gets a fresh id above every old one; an old id with no record
+# left is retired, never reused. A build with no previous index numbers
+# records 1..n in ZIP order.
+# The index is built in cgp_sudoc_index.db.tmp and swapped in at the end,
+# because the app reads the live file with immutable=1 (core/sudoc_index.py).
+#
+#   python scripts/build_index.py [--workers N]   full rebuild
+#   python scripts/build_index.py --sort-keys     add sudoc_key to the current index
+#   python scripts/build_index.py --fts-only      add the FTS table to the current index
 
 import os
+import shutil
 import sqlite3
 import zipfile
-from pymarc import MARCReader
 import sys
 import traceback  # Added for better error reporting
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
 
 # Add project root to path if needed
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from core.sudoc_key import sudoc_sort_key
+
 # Constants
 BASE_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
 RECORDS_DIR = os.path.join(BASE_DIR, "Record_sets")
 INDEX_DB = os.path.join(BASE_DIR, "cgp_sudoc_index.db")
 
-def build_index_with_byte_offsets():
-    """Build an index of MARC records with byte offsets for direct access"""
-    print(f"Building index with byte offsets - output: {INDEX_DB}")
-    print(f"Reading MARC files from: {RECORDS_DIR}")
-    
-    conn = sqlite3.connect(INDEX_DB)
-    
-    # Drop existing table if it exists
-    conn.execute("DROP TABLE IF EXISTS records")
-    
+READ_SIZE = 4 << 20
+INSERT_BATCH = 10000
+
+LEADER_LENGTH = 24
+FIELD_TERMINATOR = 0x1E
+RECORD_TERMINATOR = 0x1D
+SUBFIELD_DELIMITER = b"\x1f"
+
+INDEXED_TAGS = {b"086", b"245", b"035"}
+
+# Stored when a record has no 245 $a/$b/$c, as the pymarc builder did
+UNKNOWN_TITLE = "Unknown title"
+
+# Bulk-load settings for the build connection only; the file is not live
+# until it is swapped in, so durability during the build buys nothing
+BUILD_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+)
+
+INSERT_SQL = """
+    INSERT INTO records (id, sudoc, title, zip_file, marc_file, byte_offset, record_length, oclc, sudoc_key)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# How far ahead alignment looks for the next match after a mismatch
+ALIGN_WINDOW = 50
+
+# ── Raw MARC ─────────────────────────────────────────────────────────────────
+
+def iter_raw_records(stream, stats: Dict[str, int]) -> Iterator[Tuple[int, bytes]]:
+    """
+    (byte_offset, record bytes) for each record in a MARC stream, split on
+    the record length in the leader. Bytes that don't start a well-formed
+    record are skipped up to the next record terminator and counted in
+    stats["skipped"].
+    """
+    buffer = b""
+    pos = 0        # start of the next record in buffer
+    offset = 0     # stream offset of buffer[0]
+    while True:
+        avail = len(buffer) - pos
+        if avail >= 5:
+            head = buffer[pos:pos + 5]
+            length = int(head) if head.isdigit() else 0
+            if length <= LEADER_LENGTH:
+                # Not a leader: resynchronise after the next record terminator
+                end = buffer.find(RECORD_TERMINATOR, pos)
+                if end != -1:
+                    stats["skipped"] += 1
+                    pos = end + 1
+                    continue
+            elif avail >= length:
+                if buffer[pos + length - 1] == RECORD_TERMINATOR:
+                    yield offset + pos, buffer[pos:pos + length]
+                    pos += length
+                else:
+                    # Length disagrees with the terminator
+                    end = buffer.find(RECORD_TERMINATOR, pos)
+                    stats["skipped"] += 1
+                    pos = end + 1 if end != -1 else len(buffer)
+                continue
+
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            if len(buffer) > pos:
+                stats["skipped"] += 1
+            return
+        offset += pos
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_fields(record: bytes, tags) -> Iterator[Tuple[bytes, bytes]]:
+    """(tag, field data without its terminator) for each directory entry in `tags`."""
+    base = int(record[12:17])
+    directory_end = record.find(FIELD_TERMINATOR, LEADER_LENGTH)
+    if directory_end == -1:
+        directory_end = base - 1
+    for i in range(LEADER_LENGTH, directory_end - 11, 12):
+        tag = record[i:i + 3]
+        if tag in tags:
+            length = int(record[i + 3:i + 7])
+            start = base + int(record[i + 7:i + 12])
+            yield tag, record[start:start + length - 1]
+
+
+def subfields(data: bytes, code: bytes) -> List[str]:
+    """Values of subfield `code` in a data field, in order."""
+    return [
+        part[1:].decode("utf-8", "replace")
+        for part in data[2:].split(SUBFIELD_DELIMITER)[1:]
+        if part[:1] == code
+    ]
+
+
+def extract_index_fields(record: bytes) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    SuDoc (first 086 with ind1 0, $a), title (245 $a $b $c, else
+    UNKNOWN_TITLE) and OCLC number (035 $a).
+    """
+    sudoc = title = oclc = None
+    for tag, data in iter_fields(record, INDEXED_TAGS):
+        if tag == b"086":
+            if sudoc is None and data[:1] == b"0":
+                values = subfields(data, b"a")
+                if values:
+                    sudoc = values[0]
+        elif tag == b"245":
+            if title is None:
+                parts = [values[0] for values in (subfields(data, c) for c in (b"a", b"b", b"c")) if values]
+                if parts:
+                    title = " ".join(parts)
+        elif oclc is None:
+            for value in subfields(data, b"a"):
+                if "(OCoLC)" in value:
+                    # Just the number: drop the prefix and any "ocm"/"ocn"
+                    oclc = value.replace("(OCoLC)", "").strip().replace("ocm", "").replace("ocn", "")
+                    break
+    return sudoc, title or UNKNOWN_TITLE, oclc
+
+
+# ── Workers ──────────────────────────────────────────────────────────────────
+
+def index_zip(zip_file: str) -> Tuple[str, Optional[str], List[tuple], Dict[str, int]]:
+    """
+    Runs in a worker process: the index rows for the first MARC member of one
+    ZIP. Returns (zip_file, member, rows, stats).
+    """
+    stats = {"records": 0, "skipped": 0, "errors": 0}
+    rows: List[tuple] = []
+    with zipfile.ZipFile(os.path.join(RECORDS_DIR, zip_file), "r") as zf:
+        marc_files = [f for f in zf.namelist() if f.endswith(".mrc")]
+        if not marc_files:
+            return zip_file, None, rows, stats
+        # Only the first member, as ever, so records line up with the previous index
+        marc_filename = marc_files[0]
+        with zf.open(marc_filename) as member:
+            for byte_offset, record in iter_raw_records(member, stats):
+                try:
+                    sudoc, title, oclc = extract_index_fields(record)
+                except ValueError:
+                    # Malformed directory: still indexed, so its bytes stay reachable
+                    stats["errors"] += 1
+                    sudoc, title, oclc = None, UNKNOWN_TITLE, None
+                rows.append((sudoc, title, zip_file, marc_filename, byte_offset, len(record), oclc,
+                             sudoc_sort_key(sudoc)))
+                stats["records"] += 1
+    return zip_file, marc_filename, rows, stats
+
+
+# ── Record ids ───────────────────────────────────────────────────────────────
+
+def _record_key(sudoc, title, oclc) -> tuple:
+    return (sudoc, title or UNKNOWN_TITLE, oclc)
+
+
+def align(old: Sequence[tuple], new: Sequence[tuple], window: int = ALIGN_WINDOW) -> List[Optional[int]]:
+    """
+    For each key in `new`, the index of the same record in `old`, or None.
+    Both are in file order. On a mismatch, whichever side reaches the other's
+    key in fewer steps (within `window`) is skipped: records only in `new`
+    are new, records only in `old` are gone. With no match either way the
+    two are taken as the same record whose fields changed.
+    """
+    matches: List[Optional[int]] = [None] * len(new)
+    i = j = 0
+    while i < len(old) and j < len(new):
+        if old[i] != new[j]:
+            skip_new = next((k for k in range(1, window + 1)
+                             if j + k < len(new) and new[j + k] == old[i]), None)
+            skip_old = next((k for k in range(1, window + 1)
+                             if i + k < len(old) and old[i + k] == new[j]), None)
+            if skip_new is not None and (skip_old is None or skip_new <= skip_old):
+                j += skip_new
+                continue
+            if skip_old is not None:
+                i += skip_old
+                continue
+        matches[j] = i
+        i += 1
+        j += 1
+    return matches
+
+
+class IdCarrier:
+    """Assigns record ids, carrying them over from the index being replaced."""
+
+    def __init__(self, path: str):
+        self.conn: Optional[sqlite3.Connection] = None
+        self.next_id = 1
+        self.carried = self.fresh = self.retired = 0
+        if os.path.exists(path):
+            conn = sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True)
+            try:
+                self.next_id = (conn.execute("SELECT max(id) FROM records").fetchone()[0] or 0) + 1
+                self.conn = conn
+            except sqlite3.OperationalError:
+                conn.close()
+
+    def assign(self, zip_file: str, rows: List[tuple]) -> List[tuple]:
+        """rows with their id prepended."""
+        old_ids: List[int] = []
+        old_keys: List[tuple] = []
+        if self.conn is not None:
+            for record_id, sudoc, title, oclc in self.conn.execute(
+                "SELECT id, sudoc, title, oclc FROM records WHERE zip_file = ? ORDER BY id", (zip_file,)
+            ):
+                old_ids.append(record_id)
+                old_keys.append(_record_key(sudoc, title, oclc))
+
+        matches = align(old_keys, [_record_key(r[0], r[1], r[6]) for r in rows])
+        out = []
+        for row, match in zip(rows, matches):
+            if match is None:
+                record_id = self.next_id
+                self.next_id += 1
+                self.fresh += 1
+            else:
+                record_id = old_ids[match]
+                self.carried += 1
+            out.append((record_id, *row))
+        self.retired += len(old_ids) - sum(m is not None for m in matches)
+        return out
+
+    def retire_missing(self, zip_files: Sequence[str]):
+        """Count the old ids of ZIPs that are no longer there."""
+        if self.conn is None:
+            return
+        placeholders = ",".join("?" for _ in zip_files) or "''"
+        self.retired += self.conn.execute(
+            f"SELECT count(*) FROM records WHERE zip_file NOT IN ({placeholders})", list(zip_files)
+        ).fetchone()[0]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+# ── Index database ───────────────────────────────────────────────────────────
+
+@contextmanager
+def staged_index(copy_current: bool):
+    """
+    Connection to cgp_sudoc_index.db.tmp (a copy of the current index, or
+    empty), swapped in over cgp_sudoc_index.db when the block succeeds.
+    """
+    staging = INDEX_DB + ".tmp"
+    if os.path.exists(staging):
+        os.remove(staging)
+    if copy_current:
+        shutil.copyfile(INDEX_DB, staging)
+    conn = sqlite3.connect(staging)
+    try:
+        for pragma in BUILD_PRAGMAS:
+            conn.execute(pragma)
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.close()
+        os.remove(staging)
+        raise
+    conn.close()
+    os.replace(staging, INDEX_DB)
+
+
+def build_fts_index(conn):
+    """
+    FTS5 index over title and SuDoc for core.sudoc.search_records. It is an
+    external-content table (the text stays only in `records`); the unicode61
+    tokenizer splits SuDocs on their punctuation, so "Y 4.AP 6/1:H 81/2"
+    indexes as y 4 ap 6 1 h 81 2 and prefix queries match from the stem down.
+    """
+    print("Building full-text index...")
+    conn.execute("DROP TABLE IF EXISTS records_fts")
     conn.execute("""
-        CREATE TABLE records (
-            id INTEGER PRIMARY KEY,
-            sudoc TEXT,
-            title TEXT,
-            zip_file TEXT,
-            marc_file TEXT,
-            byte_offset INTEGER,
-            record_length INTEGER,
-            oclc TEXT
+        CREATE VIRTUAL TABLE records_fts USING fts5(
+            title,
+            sudoc,
+            content='records',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='1 2 3'
         )
     """)
-    
+    conn.execute("INSERT INTO records_fts(records_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO records_fts(records_fts) VALUES ('optimize')")
+    conn.commit()
+    print("Full-text index complete.")
+
+def build_sort_keys(conn):
+    """
+    Add records.sudoc_key (core/sudoc_key.py) to an index built before the
+    column existed, and index it for the shelf-list browse.
+    """
+    print("Computing SuDoc sort keys...")
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(records)")}
+    if "sudoc_key" not in columns:
+        conn.execute("ALTER TABLE records ADD COLUMN sudoc_key TEXT")
+    conn.create_function("sudoc_sort_key", 1, sudoc_sort_key, deterministic=True)
+    conn.execute("UPDATE records SET sudoc_key = sudoc_sort_key(sudoc)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sudoc_key ON records (sudoc_key)")
+    conn.commit()
+    print("Sort keys complete.")
+
+def build_index_with_byte_offsets(workers: Optional[int] = None):
+    """Build an index of MARC records with byte offsets for direct access"""
+    workers = workers or os.cpu_count() or 1
+    print(f"Building index with byte offsets - output: {INDEX_DB}")
+    print(f"Reading MARC files from: {RECORDS_DIR} ({workers} worker(s))")
+
+    zip_files = sorted(f for f in os.listdir(RECORDS_DIR) if f.endswith('.zip'))
     record_count = 0
-    
-    # Process each ZIP file
-    for zip_file in sorted(os.listdir(RECORDS_DIR)):
-        if not zip_file.endswith('.zip'):
-            continue
-            
-        print(f"Processing {zip_file}...")
-        zip_path = os.path.join(RECORDS_DIR, zip_file)
-        
-        try:
-            with zipfile.ZipFile(zip_path, 'r') as zf:
-                marc_files = [f for f in zf.namelist() if f.endswith('.mrc')]
-                if not marc_files:
+    ids = IdCarrier(INDEX_DB)
+
+    with staged_index(copy_current=False) as conn:
+        conn.execute("""
+            CREATE TABLE records (
+                id INTEGER PRIMARY KEY,
+                sudoc TEXT,
+                title TEXT,
+                zip_file TEXT,
+                marc_file TEXT,
+                byte_offset INTEGER,
+                record_length INTEGER,
+                oclc TEXT,
+                sudoc_key TEXT
+            )
+        """)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() yields in submission order, so fresh ids follow ZIP order
+            results = pool.map(index_zip, zip_files)
+            for zip_file in zip_files:
+                try:
+                    _, marc_filename, rows, stats = next(results)
+                except Exception as e:
+                    # map() cannot continue past a failed task
+                    print(f"Error processing zip file {zip_file}: {e}")
+                    print(traceback.format_exc())  # Print full traceback
+                    raise
+                if marc_filename is None:
                     print(f"  No MARC files found in {zip_file}")
                     continue
-                    
-                marc_filename = marc_files[0]
-                print(f"  Reading {marc_filename}")
-                
-                with zf.open(marc_filename) as marc_file:
-                    # Track byte position
-                    byte_pos = 0
-                    file_record_count = 0
-                    
-                    try:
-                        # Make sure MARCReader is imported correctly
-                        reader = MARCReader(marc_file, to_unicode=True, force_utf8=True)
-                        
-                        # Iterate through each record
-                        for record in reader:
-                            try:
-                                # Get record length from the record itself
-                                record_data = record.as_marc()
-                                record_length = len(record_data)
-                                
-                                # Extract SuDoc from 086 field
-                                sudoc = None
-                                for field in record.get_fields('086'):
-                                    if field.indicator1 == '0':
-                                        subfields_a = field.get_subfields('a')
-                                        if subfields_a:
-                                            sudoc = subfields_a[0]
-                                            break
-                                
-                                # Get title
-                                title = None
-                                for field in record.get_fields('245'):
-                                    title_parts = []
-                                    for subfield_code in ('a', 'b', 'c'):
-                                        subfield_values = field.get_subfields(subfield_code)
-                                        if subfield_values:
-                                            title_parts.append(subfield_values[0])
-                                    if title_parts:
-                                        title = ' '.join(title_parts)
-                                        break
-                                
-                                # If no title found via fields, try the built-in method
-                                if not title:
-                                    try:
-                                        title = record.title()
-                                    except:
-                                        title = "Unknown title"
-                                
-                                # Extract OCLC number from 035 field only
-                                oclc = None
-                                for field in record.get_fields('035'):
-                                    subfields_a = field.get_subfields('a')
-                                    for value in subfields_a:
-                                        if '(OCoLC)' in value:
-                                            # Extract just the number portion
-                                            oclc = value.replace('(OCoLC)', '').strip()
-                                            # Also remove any "ocm" or "ocn" prefixes if present
-                                            oclc = oclc.replace('ocm', '').replace('ocn', '')
-                                            break
-                                    if oclc:
-                                        break
-                                
-                                # Store in database with byte offset
-                                conn.execute(
-                                    "INSERT INTO records VALUES (NULL, ?, ?, ?, ?, ?, ?, ?)",
-                                    (sudoc, title, zip_file, marc_filename, byte_pos, record_length, oclc)
-                                )
-                                
-                                # Update byte position for next record
-                                byte_pos += record_length
-                                file_record_count += 1
-                                record_count += 1
-                                
-                                # Commit every 1000 records
-                                if record_count % 1000 == 0:
-                                    conn.commit()
-                                    print(f"  Processed {record_count} records...")
-                                    
-                            except Exception as e:
-                                print(f"  Error processing record: {e}")
-                                # Still need to increment byte_pos based on record length
-                                byte_pos += record_length if 'record_length' in locals() else 5000
-                        
-                    except Exception as e:
-                        print(f"  Error reading MARC file: {e}")
-                        print(traceback.format_exc())  # Print full traceback
-                    
-                    print(f"  Added {file_record_count} records from {marc_filename}")
-                    conn.commit()
-        except Exception as e:
-            print(f"Error processing zip file {zip_file}: {e}")
-            print(traceback.format_exc())  # Print full traceback
-    
-    # Create indexes for faster lookup
-    print("Creating database indexes...")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_sudoc ON records (sudoc)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_title ON records (title)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_oclc ON records (oclc)")
-    conn.commit()
-    
+                rows = ids.assign(zip_file, rows)
+                for i in range(0, len(rows), INSERT_BATCH):
+                    conn.executemany(INSERT_SQL, rows[i:i + INSERT_BATCH])
+                conn.commit()
+                record_count += len(rows)
+                print(f"  {zip_file}: added {stats['records']} records from {marc_filename}"
+                      + (f", skipped {stats['skipped']} malformed" if stats["skipped"] else "")
+                      + (f", {stats['errors']} without readable fields" if stats["errors"] else ""))
+
+        ids.retire_missing(zip_files)
+        ids.close()
+        print(f"Record ids: {ids.carried} kept, {ids.fresh} new, {ids.retired} retired")
+
+        # Create indexes for faster lookup
+        print("Creating database indexes...")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sudoc ON records (sudoc)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_title ON records (title)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_oclc ON records (oclc)")
+        # Shelf-list browse: range scans in SuDoc shelf order (rowid rides along
+        # in the index, so ORDER BY sudoc_key, id needs no sort)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sudoc_key ON records (sudoc_key)")
+        conn.commit()
+
+        build_fts_index(conn)
+        conn.execute("ANALYZE")
+
     print(f"Index build complete. Total records indexed: {record_count}")
-    conn.close()
 
 if __name__ == "__main__":
-    build_index_with_byte_offsets()
+    if "--fts-only" in sys.argv or "--sort-keys" in sys.argv:
+        # Add the full-text index and/or sort keys to a copy of the current
+        # cgp_sudoc_index.db, then swap it in
+        with staged_index(copy_current=True) as conn:
+            if "--sort-keys" in sys.argv:
+                build_sort_keys(conn)
+            if "--fts-only" in sys.argv:
+                build_fts_index(conn)
+    else:
+        workers = None
+        if "--workers" in sys.argv:
+            workers = int(sys.argv[sys.argv.index("--workers") + 1])
+        build_index_with_byte_offsets(workers)
@@ -0,0 +1,64 @@
+# backend/scripts/repack_marc.py
+#
+# Extracts every .mrc member of the Record_sets ZIPs into
+# Record_sets/packed/<zip stem>/<member> as plain files, so core/marc_store.py
+# can serve records by memory-mapped slice instead of inflating the ZIP
+# member up to each record's offset. The byte offsets in cgp_sudoc_index.db
+# refer to the uncompressed member, so the index needs no rebuild.
+#
+# Re-running skips members whose packed copy is already current.
+
+import os, sys, shutil, zipfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.marc_store import REPACK_STAMP, RECORDS_DIR, packed_path
+
+COPY_BUFFER = 4 << 20
+
+
+def repack_member(zf: zipfile.ZipFile, zip_path: str, info: zipfile.ZipInfo) -> bool:
+    target = packed_path(os.path.basename(zip_path), info.filename)
+    if (os.path.exists(target)
+            and os.path.getsize(target) == info.file_size
+            and os.path.getmtime(target) >= os.path.getmtime(zip_path)):
+        return False
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = target + ".tmp"
+    with zf.open(info) as src, open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFFER)
+    if os.path.getsize(tmp) != info.file_size:
+        os.remove(tmp)
+        raise IOError(f"size mismatch extracting {info.filename}")
+    # Atomic swap: a reader that has the old file mapped keeps a valid view
+    os.replace(tmp, target)
+    return True
+
+
+def main():
+    packed = skipped = 0
+    for zip_file in sorted(os.listdir(RECORDS_DIR)):
+        if not zip_file.endswith(".zip"):
+            continue
+        zip_path = os.path.join(RECORDS_DIR, zip_file)
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            for info in zf.infolist():
+                if not info.filename.endswith(".mrc"):
+                    continue
+                if repack_member(zf, zip_path, info):
+                    packed += 1
+                    print(f"✅ {zip_file}:{info.filename} ({info.file_size:,} bytes)")
+                else:
+                    skipped += 1
+    if packed:
+        # New stamp inode: the app's MARC cache drops bytes read before this run
+        os.makedirs(os.path.dirname(REPACK_STAMP), exist_ok=True)
+        with open(REPACK_STAMP + ".tmp", "w") as f:
+            f.write(f"{packed}\n")
+        os.replace(REPACK_STAMP + ".tmp", REPACK_STAMP)
+    print(f"Repacked {packed} member(s), {skipped} already current.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,23 @@
 import React, { useEffect, useState, useMemo } from "react";
 import apiFetch from '../api/client';
 
+const PAGE_SIZE = 200;
+
+const REASON_KIND_LABELS = {
+  barcode_mismatch: "Barcode mismatch",
+  missing_item: "Missing item in accessioned range",
+  duplicate_position: "Duplicate position",
+  multiple_locations: "Barcode at two locations",
+  weeded_in_analytics: "Weeded but still in analytics",
+  other: "Other",
+};
+
 export default function AnalyticsErrors() {
   const [errors, setErrors] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [facets, setFacets] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [errorMsg, setErrorMsg] = useState(null);
   const [statusFilter, setStatusFilter] = useState("All");
   const [typeFilter, setTypeFilter] = useState("All");
@@ -14,63 +28,52 @@ export default function AnalyticsErrors() {
   const [locationItems, setLocationItems] = useState([]);
   const [loadingLocationItems, setLoadingLocationItems] = useState(false);
 
-  useEffect(() => {
-    const token = localStorage.getItem("token");
-    apiFetch("/catalog/analytics-errors/", {
-      headers: {
-        Authorization: `Bearer ${token}`,
-      },
-    })
-      .then((res) => {
-        if (!res.ok) throw new Error(`HTTP ${res.status}`);
-        return res.json();
-      })
-      .then((data) => {
-        setErrors(data);
-        setLoading(false);
-      })
-      .catch((err) => {
-        console.error("Failed to load analytics errors:", err);
-        setErrorMsg("Could not load analytics errors.");
-        setLoading(false);
-      });
-  }, []);
-
-  const errorTypes = useMemo(() => {
-    return Array.from(new Set(errors.map((err) => err.error_reason)));
-  }, [errors]);
+  // Filters are applied server-side; the list arrives a page at a time
+  const filterParams = useMemo(() => {
+    const params = new URLSearchParams();
+    if (statusFilter !== "All") params.append("status", statusFilter);
+    if (typeFilter !== "All") params.append("kind", typeFilter);
+    if (barcodeSearch) params.append("barcode", barcodeSearch);
+    if (altCallSearch) params.append("alternative_call_number", altCallSearch);
+    if (callNumberSearch) params.append("call_number", callNumberSearch);
+    return params;
+  }, [statusFilter, typeFilter, barcodeSearch, altCallSearch, callNumberSearch]);
 
-  const filteredErrors = useMemo(() => {
-    let result = errors;
-    if (statusFilter !== "All") {
-      result = result.filter((err) => err.status.toLowerCase() === statusFilter.toLowerCase());
-    }
-    if (typeFilter !== "All") {
-      result = result.filter((err) => err.error_reason === typeFilter);
+  const loadErrors = async (cursor = null) => {
+    const params = new URLSearchParams(filterParams);
+    params.append("limit", PAGE_SIZE);
+    if (cursor) {
+      params.append("cursor", cursor);
+      setLoadingMore(true);
+    } else {
+      params.append("facets", "true");
     }
-    if (barcodeSearch) {
-      result = result.filter((err) => 
-        err.barcode && err.barcode.toLowerCase().includes(barcodeSearch.toLowerCase())
-      );
-    }
-    if (altCallSearch) {
-      result = result.filter((err) => 
-        err.alternative_call_number && err.alternative_call_number.toLowerCase().includes(altCallSearch.toLowerCase())
-      );
-    }
-    if (callNumberSearch) {
-      result = result.filter((err) => 
-        err.analytics_call_number && err.analytics_call_number.toLowerCase().includes(callNumberSearch.toLowerCase())
-      );
+    try {
+      const res = await apiFetch(`/catalog/analytics-errors/?${params}`);
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      const data = await res.json();
+      setErrors((prev) => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
+      if (!cursor) setFacets(data.facets);
+      setErrorMsg(null);
+    } catch (err) {
+      console.error("Failed to load analytics errors:", err);
+      setErrorMsg("Could not load analytics errors.");
+    } finally {
+      setLoading(false);
+      setLoadingMore(false);
     }
-    // Sort by alternative_call_number
-    result.sort((a, b) => {
-      const aCall = a.alternative_call_number || "";
-      const bCall = b.alternative_call_number || "";
-      return aCall.localeCompare(bCall);
-    });
-    return result;
-  }, [errors, statusFilter, typeFilter, barcodeSearch, altCallSearch, callNumberSearch]);
+  };
+
+  useEffect(() => {
+    const timer = setTimeout(() => loadErrors(), 300);
+    return () => clearTimeout(timer);
+  }, [filterParams]);
+
+  const totalErrors = useMemo(() => {
+    if (!facets) return errors.length;
+    return Object.values(facets.reason_kind || {}).reduce((sum, n) => sum + n, 0);
+  }, [facets, errors]);
 
   const fetchLocationItems = async (error) => {
     setLoadingLocationItems(true);
@@ -105,42 +108,25 @@ export default function AnalyticsErrors() {
     fetchLocationItems(error);
   };
 
-  const handleExportCsv = () => {
-    if (!filteredErrors.length) return;
-    const headers = [
-      'ID',
-      'Barcode',
-      'Alt Call #',
-      'Title',
-      'Call No.',
-      'Status',
-      'Error Reason'
-    ];
-    const rows = filteredErrors.map(err => [
-      err.id,
-      err.barcode,
-      err.alternative_call_number,
-      err.title,
-      err.call_number,
-      err.status,
-      err.error_reason
-    ]);
-
-    const csvContent = [headers, ...rows]
-      .map(row => row
-        .map(cell => `"${String(cell).replace(/"/g, '""')}"`)
-        .join(',')
-      )
-      .join("\n");
-
-    const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-    const url = URL.createObjectURL(blob);
-    const link = document.createElement('a');
-    link.href = url;
-    link.setAttribute('download', 'analytics_errors.csv');
-    document.body.appendChild(link);
-    link.click();
-    document.body.removeChild(link);
+  const handleExportCsv = async () => {
+    const params = new URLSearchParams(filterParams);
+    params.append("format", "csv");
+    try {
+      const res = await apiFetch(`/catalog/analytics-errors/?${params}`);
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      const blob = await res.blob();
+      const url = URL.createObjectURL(blob);
+      const link = document.createElement('a');
+      link.href = url;
+      link.setAttribute('download', 'analytics_errors.csv');
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      URL.revokeObjectURL(url);
+    } catch (err) {
+      console.error("Export failed:", err);
+      alert("Export failed: " + err.message);
+    }
   };
 
   if (loading) {
@@ -168,18 +154,13 @@ export default function AnalyticsErrors() {
         const result = await response.json();
         alert(`Error detection complete!\n\n` +
               `Errors created: ${result.errors_created}\n` +
+              `Errors removed: ${result.errors_deleted || 0}\n` +
               `Skipped (outside range): ${result.skipped_outside_range}\n` +
               `Skipped (has item): ${result.skipped_has_item}\n` +
               `Range: ${result.min_shelf} to ${result.max_shelf}`);
         
         // Reload errors
-        const errorsResponse = await apiFetch("/catalog/analytics-errors/", {
-          headers: { Authorization: `Bearer ${token}` }
-        });
-        if (errorsResponse.ok) {
-          const data = await errorsResponse.json();
-          setErrors(data);
-        }
+        await loadErrors();
       } else {
         alert("Failed to detect errors");
       }
@@ -212,7 +193,7 @@ export default function AnalyticsErrors() {
             Detect Errors
           </button>
           <div className="text-sm text-gray-500">
-            {filteredErrors.length} error{filteredErrors.length !== 1 ? 's' : ''}
+            {totalErrors} error{totalErrors !== 1 ? 's' : ''}
           </div>
         </div>
       </div>
@@ -239,9 +220,11 @@ export default function AnalyticsErrors() {
               onChange={(e) => setTypeFilter(e.target.value)}
               className="border border-gray-300 rounded-md px-3 py-2 bg-white focus:ring-2 focus:ring-blue-500 focus:border-blue-500"
             >
-              <option>All</option>
-              {errorTypes.map((type) => (
-                <option key={type}>{type}</option>
+              <option value="All">All</option>
+              {Object.entries(REASON_KIND_LABELS).map(([kind, label]) => (
+                <option key={kind} value={kind}>
+                  {label}{facets?.reason_kind ? ` (${facets.reason_kind[kind] || 0})` : ""}
+                </option>
               ))}
             </select>
           </div>
@@ -293,7 +276,7 @@ export default function AnalyticsErrors() {
         </div>
       </div>
 
-      {filteredErrors.length === 0 ? (
+      {errors.length === 0 ? (
         <div className="text-center py-12">
           <svg className="mx-auto h-12 w-12 text-gray-400" fill="none" stroke="currentColor" viewBox="0 0 24 24">
             <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M9 12h6m-6 4h6m2 5H7a2 2 0 01-2-2V5a2 2 0 012-2h5.586a1 1 0 01.707.293l5.414 5.414a1 1 0 01.293.707V19a2 2 0 01-2 2z" />
@@ -303,7 +286,7 @@ export default function AnalyticsErrors() {
         </div>
       ) : (
         <div className="space-y-4">
-          {filteredErrors.map((err) => (
+          {errors.map((err) => (
             <div key={err.id} className="bg-white rounded-lg shadow-sm border border-gray-200 hover:shadow-md transition-shadow duration-200">
               <div className="p-6">
                 <div className="flex items-start justify-between">
@@ -361,6 +344,17 @@ export default function AnalyticsErrors() {
               </div>
             </div>
           ))}
+          {nextCursor && (
+            <div className="flex justify-center mt-4">
+              <button
+                onClick={() => loadErrors(nextCursor)}
+                disabled={loadingMore}
+                className="bg-gray-200 text-gray-800 font-medium px-6 py-2 rounded hover:bg-gray-300 transition"
+              >
+                {loadingMore ? 'Loading...' : `Load more (${errors.length} of ${totalErrors} shown)`}
+              </button>
+            </div>
+          )}
         </div>
       )}
 
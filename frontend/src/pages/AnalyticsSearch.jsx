@@ -44,6 +44,7 @@ export default function AnalyticsSearch() {
   const [locationFilter, setLocationFilter] = useState("");
   const [statusFilter, setStatusFilter] = useState("");
   const [results, setResults] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [searched, setSearched] = useState(false);
   const [error, setError] = useState("");
 
@@ -102,8 +103,13 @@ export default function AnalyticsSearch() {
     e.preventDefault();
     setError("");
     setResults([]);
+    setNextCursor(null);
     setSearched(false);
+    await fetchPage(null);
+  };
 
+  // Fetch one page of results; a cursor appends to the current list
+  const fetchPage = async (cursor) => {
     let qs = "?";
     if (titleQ.trim()) qs += `title=${encodeURIComponent(titleQ.trim())}&`;
     if (barcodeQ.trim()) qs += `barcode=${encodeURIComponent(barcodeQ.trim())}&`;
@@ -115,6 +121,7 @@ export default function AnalyticsSearch() {
     if (locationFilter)
       qs += `location_code=${encodeURIComponent(locationFilter)}&`;
     if (statusFilter) qs += `status=${encodeURIComponent(statusFilter)}&`;
+    if (cursor) qs += `cursor=${encodeURIComponent(cursor)}&`;
     if (qs.endsWith("&")) qs = qs.slice(0, -1);
 
     try {
@@ -123,7 +130,9 @@ export default function AnalyticsSearch() {
         headers: { Authorization: `Bearer ${token}` },
       });
       if (resp.ok) {
-        setResults(await resp.json());
+        const data = await resp.json();
+        setResults(cursor ? [...results, ...data.items] : data.items);
+        setNextCursor(data.next_cursor);
       } else {
         const { detail } = await resp.json();
         setError(detail || "No matching analytics records found.");
@@ -310,6 +319,17 @@ export default function AnalyticsSearch() {
               </div>
             ))}
           </div>
+
+          {nextCursor && (
+            <div className="flex justify-center mt-6">
+              <button
+                onClick={() => fetchPage(nextCursor)}
+                className="bg-gray-200 text-gray-800 font-medium px-6 py-2 rounded hover:bg-gray-300 transition"
+              >
+                Load more
+              </button>
+            </div>
+          )}
         </>
       )}
 
@@ -9,6 +9,7 @@ export default function ItemSearch() {
   const [ladderFilter, setLadderFilter] = useState("");
   const [shelfFilter, setShelfFilter] = useState("");
   const [results, setResults] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [searched, setSearched] = useState(false);
 
   const [floors, setFloors] = useState([]);
@@ -67,8 +68,8 @@ export default function ItemSearch() {
     fetchFilters();
   }, []);
 
-  // ✅ Perform search
-  const handleSearch = async () => {
+  // ✅ Perform search (pass the previous page's cursor to load more)
+  const handleSearch = async (cursor = null) => {
     if (
       !query.trim() &&
       !floorFilter &&
@@ -77,6 +78,7 @@ export default function ItemSearch() {
       !shelfFilter
     ) {
       setResults([]);
+      setNextCursor(null);
       setSearched(true);
       return;
     }
@@ -90,6 +92,7 @@ export default function ItemSearch() {
       if (rangeFilter) qs += `range_code=${encodeURIComponent(rangeFilter)}&`;
       if (ladderFilter) qs += `ladder=${encodeURIComponent(ladderFilter)}&`;
       if (shelfFilter) qs += `shelf=${encodeURIComponent(shelfFilter)}&`;
+      if (cursor) qs += `cursor=${encodeURIComponent(cursor)}&`;
       if (qs.endsWith("&")) qs = qs.slice(0, -1);
 
       const token = localStorage.getItem('token');
@@ -101,15 +104,18 @@ export default function ItemSearch() {
 
       if (!resp.ok) {
         setResults([]);
+        setNextCursor(null);
         setSearched(true);
         return;
       }
       const data = await resp.json();
-      setResults(data);
+      setResults(cursor ? [...results, ...data.items] : data.items);
+      setNextCursor(data.next_cursor);
       setSearched(true);
     } catch (error) {
       console.error("Search error:", error);
       setResults([]);
+      setNextCursor(null);
       setSearched(true);
     }
   };
@@ -278,6 +284,17 @@ export default function ItemSearch() {
               </div>
             ))}
           </div>
+
+          {nextCursor && (
+            <div className="flex justify-center mt-6">
+              <button
+                onClick={() => handleSearch(nextCursor)}
+                className="bg-gray-200 text-gray-800 font-medium px-6 py-2 rounded hover:bg-gray-300 transition"
+              >
+                Load more
+              </button>
+            </div>
+          )}
         </>
       )}
 
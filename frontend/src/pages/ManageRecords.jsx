@@ -61,6 +61,7 @@ export default function ManageRecords() {
   const [searchParams, setSearchParams] = useState({});
   const [options, setOptions] = useState({});
   const [results, setResults] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [success, setSuccess] = useState('');
@@ -82,6 +83,7 @@ export default function ManageRecords() {
     cfg.fields.forEach(f => initParams[f.name] = f.type === 'checkbox' ? false : '');
     setSearchParams(initParams);
     setResults([]);
+    setNextCursor(null);
     setError('');
     setSuccess('');
 
@@ -116,7 +118,7 @@ export default function ManageRecords() {
     setCurrentRecord(p => ({ ...p, [name]: val }));
   };
 
-  const doSearch = async e => {
+  const doSearch = async (e, cursor = null) => {
     e.preventDefault();
     setLoading(true);
     setError('');
@@ -126,6 +128,7 @@ export default function ManageRecords() {
     Object.entries(searchParams).forEach(([k, v]) => {
       if (v !== '' && v !== false) qs.append(k, v);
     });
+    if (cursor) qs.append('cursor', cursor);
     
     try {
       const res = await apiFetch(
@@ -134,7 +137,8 @@ export default function ManageRecords() {
       );
       if (!res.ok) throw new Error('Failed to fetch records');
       const data = await res.json();
-      setResults(data);
+      setResults(prev => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
     } catch {
       setError('Error loading records');
     }
@@ -414,6 +418,18 @@ export default function ManageRecords() {
         </div>
       </div>
 
+      {nextCursor && (
+        <div className="flex justify-center mt-4">
+          <button
+            onClick={() => doSearch({ preventDefault: () => {} }, nextCursor)}
+            disabled={loading}
+            className="bg-gray-200 text-gray-800 font-medium px-6 py-2 rounded hover:bg-gray-300 transition"
+          >
+            {loading ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
+
       {/* Modal for Create/Edit */}
       {showModal && (
         <div className="fixed inset-0 bg-gray-600 bg-opacity-50 overflow-y-auto h-full w-full z-50">
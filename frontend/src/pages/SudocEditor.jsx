@@ -362,9 +362,9 @@ function BoundwithModal({ isOpen, onClose, currentRecord, onBoundwithCreated })
   const handleSearch = async () => {
     setLoading(true);
     try {
-      const res = await apiFetch(`/catalog/sudoc/search?query=${searchQuery}`);
+      const res = await apiFetch(`/catalog/sudoc/search?query=${encodeURIComponent(searchQuery)}`);
       const data = await res.json();
-      setSearchResults(data.filter(r => r.id !== currentRecord.id));
+      setSearchResults(data.items.filter(r => r.id !== currentRecord.id));
     } catch (error) {
       console.error("Error searching records:", error);
     } finally {
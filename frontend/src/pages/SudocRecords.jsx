@@ -6,7 +6,9 @@ import { useSudocCarts } from '../hooks/useSudocCarts';
 export default function SudocRecords() {
   const [query, setQuery] = useState("");
   const [titleQuery, setTitleQuery] = useState("");
+  const [mode, setMode] = useState("token");
   const [results, setResults] = useState([]);
+  const [total, setTotal] = useState(0);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
   const [checkedOutIds, setCheckedOutIds] = useState(new Set());
@@ -29,6 +31,7 @@ export default function SudocRecords() {
   const fetchResults = async (newPage = 1) => {
     if (!query && !titleQuery) {
       setResults([]);
+      setTotal(0);
       return;
     }
     setLoading(true);
@@ -39,6 +42,7 @@ export default function SudocRecords() {
       const qs = new URLSearchParams({
         query,
         title: titleQuery,
+        mode,
         limit: limit.toString(),
         page: newPage.toString(),
       }).toString();
@@ -53,7 +57,8 @@ export default function SudocRecords() {
       }
 
       const data = await res.json();
-      setResults(data);
+      setResults(data.items);
+      setTotal(data.total);
       setPage(newPage);
     } catch (e) {
       setError(e.message);
@@ -93,10 +98,11 @@ export default function SudocRecords() {
 
   // Pagination helpers
   const hasPrev = page > 1;
-  const hasNext = results.length === limit;
+  const lastPage = Math.max(1, Math.ceil(total / limit));
+  const hasNext = page < lastPage;
   const delta = 2; // how many pages to show on either side
   const startPage = Math.max(1, page - delta);
-  const endPage   = page + delta;
+  const endPage   = Math.min(lastPage, page + delta);
 
   // Add cart selector component
   const CartSelector = () => (
@@ -133,7 +139,7 @@ export default function SudocRecords() {
       <div className="bg-white rounded-lg shadow p-6">
         <h2 className="text-2xl font-semibold mb-4">SuDoc Search</h2>
         <CartSelector />
-        <div className="grid grid-cols-1 md:grid-cols-3 gap-4">
+        <div className="grid grid-cols-1 md:grid-cols-4 gap-4">
           <input
             value={query}
             onChange={e => setQuery(e.target.value)}
@@ -143,9 +149,20 @@ export default function SudocRecords() {
           <input
             value={titleQuery}
             onChange={e => setTitleQuery(e.target.value)}
-            placeholder="Title contains..."
+            placeholder="Title words..."
             className="border p-2 rounded"
           />
+          <select
+            value={mode}
+            onChange={e => setMode(e.target.value)}
+            className="border p-2 rounded"
+            title="How both boxes are matched"
+          >
+            <option value="token">All words, any order</option>
+            <option value="prefix">Starts with</option>
+            <option value="phrase">Exact phrase</option>
+            <option value="substring">Contains text (slow)</option>
+          </select>
           <button
             onClick={() => fetchResults(1)}
             disabled={loading}
@@ -163,7 +180,9 @@ export default function SudocRecords() {
 
       {results.length > 0 && (
         <div className="bg-white rounded-lg shadow p-6 space-y-4">
-          <h3 className="text-xl font-semibold">Results (Page {page})</h3>
+          <h3 className="text-xl font-semibold">
+            {total.toLocaleString()} result{total !== 1 ? "s" : ""} (Page {page} of {lastPage})
+          </h3>
           <table className="w-full table-auto">
             <thead className="bg-gray-50">
               <tr>